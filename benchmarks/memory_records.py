@@ -0,0 +1,81 @@
+"""Compare memory used by dict and slotted-record positions.
+
+Usage:
+    python -m benchmarks.memory_records [--positions N] [--accounts N]
+"""
+import argparse
+import gc
+import json
+import random
+import tracemalloc
+
+from stock_aggregator.records import RawPosition
+from stock_aggregator.services.aggregation import aggregate_positions_python
+
+
+def make_raw_positions(count: int, accounts: int, seed: int = 1):
+    """Build raw positions as broker dicts, spread over symbols and accounts"""
+    rng = random.Random(seed)
+    symbols = [f'SYM{i}' for i in range(max(1, count // accounts))]
+    return [
+        {
+            'symbol': rng.choice(symbols),
+            'name': 'Synthetic Holding',
+            'quantity': float(rng.randint(1, 500)),
+            'average_price': rng.uniform(5, 500),
+            'current_price': rng.uniform(5, 500),
+            'market_value': rng.uniform(100, 100000),
+            'unrealized_pl': rng.uniform(-1000, 1000),
+            'asset_type': 'equity',
+            'connection_id': 'bench',
+            'account_id': f'acct-{i % accounts}',
+            'sector': ''
+        }
+        for i in range(count)
+    ]
+
+
+def measure(build):
+    """Return (result, bytes allocated and still held by result)"""
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, current
+
+
+def as_dicts(aggregated):
+    return [position.to_dict() for position in aggregated]
+
+
+def run(count: int, accounts: int):
+    raw_dicts = make_raw_positions(count, accounts)
+    quotes = {}
+
+    # Each representation is measured on its own copy of the data
+    _, raw_dict_bytes = measure(lambda: [dict(position) for position in raw_dicts])
+    raw_records, raw_record_bytes = measure(lambda: [RawPosition(**position) for position in raw_dicts])
+    aggregated_records, aggregated_record_bytes = measure(lambda: aggregate_positions_python(raw_records, quotes))
+    _, aggregated_dict_bytes = measure(lambda: as_dicts(aggregated_records))
+
+    return {
+        'positions': count,
+        'accounts': accounts,
+        'raw': {'dict_bytes': raw_dict_bytes, 'record_bytes': raw_record_bytes,
+                'ratio': round(raw_record_bytes / raw_dict_bytes, 3)},
+        'aggregated': {'dict_bytes': aggregated_dict_bytes, 'record_bytes': aggregated_record_bytes,
+                       'ratio': round(aggregated_record_bytes / aggregated_dict_bytes, 3)}
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--positions', type=int, default=100000)
+    parser.add_argument('--accounts', type=int, default=20)
+    args = parser.parse_args()
+    print(json.dumps(run(args.positions, args.accounts), indent=2))
+
+
+if __name__ == '__main__':
+    main()
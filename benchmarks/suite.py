@@ -0,0 +1,240 @@
+"""Time the refresh -> aggregate -> render path on synthetic books.
+
+Every size runs against a synthetic broker connection with market data
+offline, so nothing touches the network. Quote cache misses are served
+from prices recorded from the synthetic book instead of yfinance.
+
+Usage:
+    python -m benchmarks.suite [--sizes 10,1000,10000,100000] [--output FILE]
+                               [--compare BASELINE] [--threshold 0.25]
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import yaml
+
+DEFAULT_SIZES = (10, 1000, 10000, 100000)
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+
+def write_config(directory: str, positions: int) -> str:
+    """Write a config with one synthetic connection holding about ``positions`` positions"""
+    accounts = max(1, min(20, positions // 50))
+    config_data = {
+        'brokers': [{
+            'type': 'synthetic',
+            'id': 'bench',
+            'enabled': True,
+            'accounts': accounts,
+            'positions_per_account': max(1, positions // accounts),
+            'symbols': max(10, positions // 10),
+            'seed': 42
+        }],
+        'market_data': {
+            'offline': True,
+            'cache_max_entries': max(5000, positions)
+        },
+        'app': {'broker_workers': 2, 'broker_timeout_seconds': 600}
+    }
+    path = os.path.join(directory, f'config-{positions}.yml')
+    with open(path, 'w') as f:
+        yaml.dump(config_data, f)
+    return path
+
+
+# The package builds its Flask app on import, which needs a config file
+_WORK_DIR = tempfile.TemporaryDirectory(prefix='stock_aggregator_bench_')
+os.environ['STOCK_AGGREGATOR_CONFIG'] = write_config(_WORK_DIR.name, DEFAULT_SIZES[0])
+
+from flask import render_template  # noqa: E402
+
+from stock_aggregator.main import app, fragment_cache, render_position_tables  # noqa: E402
+from stock_aggregator.services.brokers_data import BrokersDataService  # noqa: E402
+from stock_aggregator.services.cache import NegativeCache, TTLCache  # noqa: E402
+from stock_aggregator.services.market_data import MarketDataService, set_offline  # noqa: E402
+from stock_aggregator.services.snapshot import PortfolioSnapshot  # noqa: E402
+
+
+class RecordedMarketData(MarketDataService):
+    """Market data whose downloads replay recorded prices instead of calling yfinance"""
+
+    def __init__(self, recorded_prices, **kwargs):
+        super().__init__(**kwargs)
+        self.recorded_prices = recorded_prices
+
+    def _download_prices(self, symbols):
+        return {symbol: self.recorded_prices[symbol] for symbol in symbols if symbol in self.recorded_prices}, None
+
+
+def timed(function, repeat: int):
+    """Run function repeat times and summarize the wall time of each run in milliseconds"""
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        samples.append((time.perf_counter() - started) * 1000)
+    return {
+        'runs': repeat,
+        'min_ms': round(min(samples), 3),
+        'median_ms': round(statistics.median(samples), 3),
+        'mean_ms': round(statistics.fmean(samples), 3),
+        'max_ms': round(max(samples), 3)
+    }
+
+
+def repeats_for(positions: int) -> int:
+    """Fewer runs for big books so every size takes roughly the same time"""
+    return max(3, min(50, 100000 // max(1, positions)))
+
+
+def run_size(positions: int):
+    """Benchmark every stage for one book size"""
+    os.environ['STOCK_AGGREGATOR_CONFIG'] = write_config(_WORK_DIR.name, positions)
+    repeat = repeats_for(positions)
+    service = BrokersDataService()
+    results = {}
+    try:
+        # Cold: the synthetic book is generated; warm: broker results and caches are reused
+        results['get_positions_cold'] = timed(service.get_positions, 1)
+        results['get_positions'] = timed(service.get_positions, repeat)
+        accounts = service.get_accounts()
+
+        raw = service.brokers['bench'].get_all_positions()
+        held = [position for asset_type, rows in raw.items() if asset_type != 'cash' for position in rows]
+        symbols = [position['symbol'] for position in held]
+        recorded_prices = {position['symbol']: position['current_price'] for position in held}
+        quotes = dict(recorded_prices)
+        results['aggregate_positions'] = timed(lambda: service._aggregate_positions(held, quotes), repeat)
+
+        # Miss: every quote goes through the (replayed) download; hit: every quote is cached.
+        # Only plain tickers, since option prices come from option chains rather than quote downloads
+        tickers = [position['symbol'] for position in held if position['asset_type'] in ('equity', 'collective_investment')]
+        set_offline(False)
+        cache = TTLCache(max_entries=len(tickers) + 1, ttl=None)
+        market_data = RecordedMarketData(recorded_prices, cache=TTLCache(), price_cache=cache,
+                                         chain_cache=TTLCache(), negative_cache=NegativeCache())
+
+        def quotes_miss():
+            cache.clear()
+            market_data.get_quotes(tickers)
+
+        results['quotes_cache_miss'] = timed(quotes_miss, repeat)
+        market_data.get_quotes(tickers)
+        results['quotes_cache_hit'] = timed(lambda: market_data.get_quotes(tickers), repeat)
+        set_offline(True)
+
+        option_symbols = [position['symbol'] for position in raw['option']] or ['SPY   300118C00500000']
+        option_symbols = (option_symbols * (positions // len(option_symbols) + 1))[:positions]
+        results['parse_option_symbols'] = timed(
+            lambda: [market_data._parse_option_symbol(symbol) for symbol in option_symbols], repeat)
+
+        summary = service.get_positions()
+
+        snapshot = PortfolioSnapshot(version=1, created_at=time.time(), positions=summary, accounts=accounts,
+                                     duration_ms=0.0, epoch='bench')
+
+        def render():
+            with app.test_request_context('/'):
+                render_template('index.html',
+                                position_tables=render_position_tables(snapshot),
+                                totals=summary['totals'],
+                                total_market_value=summary['total_market_value'],
+                                total_unrealized_pl=summary['total_unrealized_pl'],
+                                accounts=accounts,
+                                last_updated='',
+                                snapshot_age=0,
+                                snapshot_version=snapshot.version,
+                                snapshot_epoch=snapshot.epoch)
+
+        def render_cold():
+            fragment_cache.clear()
+            render()
+
+        # Cold: every position table is rendered; warm: tables come from the fragment cache
+        results['render_index_cold'] = timed(render_cold, repeat)
+        results['render_index'] = timed(render, repeat)
+    finally:
+        set_offline(False)
+        service.close()
+
+    return {
+        'positions': len(held),
+        'symbols': len(set(symbols)),
+        'accounts': len(accounts),
+        'results': results
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(sizes):
+    return {
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'sizes': {str(size): run_size(size) for size in sizes}
+    }
+
+
+def compare(current, baseline, threshold: float):
+    """List stages whose median time grew by more than threshold over the baseline"""
+    regressions = []
+    for size, measured in current['sizes'].items():
+        previous = baseline.get('sizes', {}).get(size)
+        if previous is None:
+            continue
+        for stage, stats in measured['results'].items():
+            before = previous['results'].get(stage)
+            if not before or before['median_ms'] <= 0:
+                continue
+            change = stats['median_ms'] / before['median_ms'] - 1
+            if change > threshold:
+                regressions.append({'size': int(size), 'stage': stage, 'baseline_ms': before['median_ms'],
+                                    'median_ms': stats['median_ms'], 'change': round(change, 3)})
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default=','.join(str(size) for size in DEFAULT_SIZES),
+                        help='Comma-separated position counts')
+    parser.add_argument('--output', help='Results file (default: benchmarks/results/<revision>.json)')
+    parser.add_argument('--compare', help='Earlier results file to check for regressions')
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help='Median slowdown that counts as a regression (0.25 = 25%%)')
+    args = parser.parse_args()
+
+    results = run([int(size) for size in args.sizes.split(',') if size])
+    output = args.output or os.path.join(RESULTS_DIR, f"{results['revision'] or results['created_at']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(json.dumps(results, indent=2))
+    print(f"Wrote {output}", file=sys.stderr)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        for regression in regressions:
+            print(f"Regression at {regression['size']} positions in {regression['stage']}: "
+                  f"{regression['baseline_ms']} ms -> {regression['median_ms']} ms", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -16,8 +16,13 @@ setup(
         "Flask-SQLAlchemy==2.5.1",
         "PyYAML==6.0.1",
         "click==8.1.7",
+        "numpy>=1.21",
         "yfinance>=0.2.36"
     ],
+    extras_require={
+        "async": ["httpx>=0.24"],
+        "brotli": ["brotli>=1.0"],
+    },
     entry_points={
         'console_scripts': [
             'stock-aggregator=stock_aggregator.cli:cli',
@@ -0,0 +1,282 @@
+"""JSON API over the latest portfolio snapshot.
+
+Every response carries a strong ETag built from the snapshot's epoch and
+version, so a poll that sends it back in If-None-Match gets an empty 304
+until the next snapshot is published. Bodies are serialized (and
+compressed) once per snapshot and served from a small cache afterwards.
+"""
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    BROTLI_AVAILABLE = False
+from collections.abc import Mapping
+from datetime import date, datetime
+from typing import Any, Callable, Dict, Optional, Tuple
+import gzip
+import hashlib
+import json
+import re
+
+from flask import Blueprint, abort, current_app, request
+
+from .metrics import count, timed
+from .services.cache import TTLCache
+from .services.position_index import DEFAULT_PAGE_SIZE, SORT_FIELDS, PositionIndex
+
+api = Blueprint('api', __name__, url_prefix='/api')
+
+# Bodies smaller than this are sent uncompressed
+COMPRESS_MIN_BYTES = 1024
+
+# Seconds a request waits for the first snapshot, overridable with snapshot_wait_seconds
+# in the app section of config.yml
+DEFAULT_SNAPSHOT_WAIT = 10.0
+
+# Seconds clients are asked to wait before retrying while no snapshot exists
+SNAPSHOT_RETRY_AFTER = 5
+
+# Event streams open at once per worker, overridable with max_streams in the app section
+# of config.yml. Each open stream holds a request thread, so keep this below the thread count.
+DEFAULT_MAX_STREAMS = 8
+
+# Snapshot epochs are short lowercase hex strings
+EPOCH_PATTERN = re.compile(r'[0-9a-f]{1,32}')
+
+# Largest page a position query may ask for
+MAX_PAGE_SIZE = 500
+
+# Serialized bodies kept per worker, keyed by snapshot, resource and encoding
+_bodies = TTLCache(max_entries=32, ttl=None)
+
+# Position indexes of the latest snapshots, keyed by epoch and version
+_indexes = TTLCache(max_entries=4, ttl=None)
+
+
+def get_snapshot():
+    """Get the latest snapshot, starting the background refresher on first use.
+
+    Only requests arriving before the first snapshot wait, for at most
+    snapshot_wait_seconds; if none is published by then the request is
+    answered with a 503 and a Retry-After header.
+    """
+    snapshots = current_app.extensions['snapshots']
+    snapshots.start()
+    app_settings = snapshots.brokers_data.config.config.get('app') or {}
+    snapshot = snapshots.latest(timeout=float(app_settings.get('snapshot_wait_seconds', DEFAULT_SNAPSHOT_WAIT)))
+    if snapshot is None:
+        count('errors_total', stage='snapshot_unavailable')
+        retry_later('Portfolio is still loading, please retry shortly')
+    return snapshot
+
+
+def retry_later(message: str) -> None:
+    """Abort with a plain-text 503 asking the client to retry after SNAPSHOT_RETRY_AFTER seconds"""
+    response = current_app.response_class(f'{message}\n', status=503, mimetype='text/plain')
+    response.headers['Retry-After'] = str(SNAPSHOT_RETRY_AFTER)
+    abort(response)
+
+
+def get_position_index(snapshot) -> PositionIndex:
+    """Get the query index of a snapshot's positions, building it on first use"""
+    key = (snapshot.epoch, snapshot.version)
+    index = _indexes.get(key)
+    if index is None:
+        with timed('position_index'):
+            index = PositionIndex(snapshot.positions['positions_by_type'])
+        _indexes.set(key, index)
+    return index
+
+
+def _json_default(value: Any) -> Any:
+    # Position records are read-only mappings
+    if isinstance(value, Mapping):
+        return dict(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def to_json(payload: Any) -> bytes:
+    """Serialize an API payload, converting position records to objects"""
+    return json.dumps(payload, default=_json_default, separators=(',', ':')).encode('utf-8')
+
+
+def _choose_encoding() -> Optional[str]:
+    """Pick the best compression the client accepts"""
+    accepted = request.accept_encodings
+    if BROTLI_AVAILABLE and accepted['br']:
+        return 'br'
+    if accepted['gzip']:
+        return 'gzip'
+    return None
+
+
+def _compress(body: bytes, encoding: Optional[str]) -> Tuple[bytes, Optional[str]]:
+    if encoding is None or len(body) < COMPRESS_MIN_BYTES:
+        return body, None
+    with timed('api_compress'):
+        if encoding == 'br':
+            return brotli.compress(body, quality=5), 'br'
+        return gzip.compress(body, compresslevel=6), 'gzip'
+
+
+def snapshot_response(resource: str, build: Callable[[Any], Dict[str, Any]]):
+    """Answer a GET for one view of the latest snapshot, honouring If-None-Match.
+
+    Args:
+        resource: Name of the view, part of the ETag and cache key.
+        build: Builds the JSON payload from the snapshot.
+    """
+    snapshot = get_snapshot()
+    etag = f"{snapshot.epoch}-{snapshot.version}-{resource}"
+    encoding = _choose_encoding()
+
+    # Compressed variants get their own strong ETag; any variant of this version is a match
+    matched = next((etag + suffix for suffix in ('', '-gzip', '-br')
+                    if request.if_none_match.contains(etag + suffix)), None)
+    if matched is not None:
+        response = current_app.response_class(status=304)
+        response.set_etag(matched)
+    else:
+        key = (etag, encoding)
+        cached = _bodies.get(key)
+        if cached is None:
+            with timed('api_serialize'):
+                body = to_json(dict(build(snapshot), version=snapshot.version, epoch=snapshot.epoch,
+                                    created_at=snapshot.created_at))
+            cached = _compress(body, encoding)
+            _bodies.set(key, cached)
+        body, applied = cached
+        response = current_app.response_class(body, mimetype='application/json')
+        if applied:
+            response.headers['Content-Encoding'] = applied
+        response.set_etag(etag if applied is None else f"{etag}-{applied}")
+
+    response.headers['Cache-Control'] = 'no-cache'
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+@api.route('/positions')
+def positions():
+    """Aggregated positions by asset type"""
+    return snapshot_response('positions', lambda snapshot: {
+        'positions_by_type': snapshot.positions['positions_by_type'],
+        'stale_connections': snapshot.positions.get('stale_connections', [])
+    })
+
+
+@api.route('/positions/changes')
+def position_changes():
+    """Rows added, changed or removed since the version in ?since=, with the new totals.
+
+    Versions from a different epoch (another worker or a restart), or old
+    enough to have left the change history, get the full positions instead,
+    marked with 'full': true.
+    """
+    since = request.args.get('since', type=int)
+    if since is None or since < 0:
+        abort(400, 'since must be a snapshot version')
+    epoch = request.args.get('epoch')
+    # The epoch ends up in the ETag, so only accept what snapshots emit
+    if epoch is not None and not EPOCH_PATTERN.fullmatch(epoch):
+        abort(400, 'epoch must be a snapshot epoch')
+
+    def build(snapshot):
+        payload = {
+            'since': since,
+            'totals': snapshot.positions['totals'],
+            'total_market_value': snapshot.positions['total_market_value'],
+            'total_unrealized_pl': snapshot.positions['total_unrealized_pl']
+        }
+        changes = None
+        if epoch in (None, snapshot.epoch):
+            history = current_app.extensions['snapshots'].brokers_data.history
+            changes = history.changes_since(since, until=snapshot.positions.get('version', snapshot.version))
+        if changes is None:
+            return dict(payload, full=True, positions_by_type=snapshot.positions['positions_by_type'])
+        return dict(
+            payload,
+            full=False,
+            added=[{'asset_type': key[0], 'key': key[1], 'position': row} for key, row in changes['added'].items()],
+            changed=[{'asset_type': key[0], 'key': key[1], 'position': row} for key, row in changes['changed'].items()],
+            removed=[{'asset_type': key[0], 'key': key[1]} for key in changes['removed']]
+        )
+
+    return snapshot_response(f"changes-{since}-{epoch or ''}", build)
+
+
+@api.route('/positions/query')
+def position_query():
+    """One page of positions, filtered and sorted on the server.
+
+    Query parameters: asset_type, symbol (prefix), sector, account_id,
+    sort (one of SORT_FIELDS, default symbol), order (asc or desc),
+    page (from 1) and page_size (up to MAX_PAGE_SIZE).
+    """
+    params = {name: request.args.get(name) or None for name in ('asset_type', 'symbol', 'sector', 'account_id')}
+    sort = request.args.get('sort', 'symbol')
+    order = request.args.get('order', 'asc')
+    page = request.args.get('page', 1, type=int)
+    page_size = request.args.get('page_size', DEFAULT_PAGE_SIZE, type=int)
+    if sort not in SORT_FIELDS:
+        abort(400, f"sort must be one of {', '.join(SORT_FIELDS)}")
+    if order not in ('asc', 'desc'):
+        abort(400, 'order must be asc or desc')
+    if page < 1 or not 1 <= page_size <= MAX_PAGE_SIZE:
+        abort(400, f'page must be at least 1 and page_size between 1 and {MAX_PAGE_SIZE}')
+
+    def build(snapshot):
+        index = get_position_index(snapshot)
+        with timed('position_query'):
+            result = index.query(sort=sort, descending=order == 'desc', page=page, page_size=page_size, **params)
+        return dict(result, sort=sort, order=order, facets=index.facets(params['asset_type']), **params)
+
+    # Filters are free text, so the resource name carries a digest of the query instead
+    query = repr(sorted(dict(params, sort=sort, order=order, page=page, page_size=page_size).items()))
+    return snapshot_response(f"query-{hashlib.sha1(query.encode('utf-8')).hexdigest()[:16]}", build)
+
+
+@api.route('/stream')
+def stream():
+    """Server-Sent Events with price and total updates as new snapshots are published.
+
+    Pass ?since=<version>&epoch=<epoch> of the data already shown so no
+    update published in between is missed; browsers resume with
+    Last-Event-ID on their own. Every open stream holds a request thread,
+    so past max_streams new clients get a 503 and retry later.
+    """
+    snapshot = get_snapshot()
+    price_stream = current_app.extensions['price_stream']
+    app_settings = current_app.extensions['snapshots'].brokers_data.config.config.get('app') or {}
+    if price_stream.clients >= int(app_settings.get('max_streams', DEFAULT_MAX_STREAMS)):
+        count('errors_total', stage='stream_limit')
+        retry_later('Too many open update streams, please retry shortly')
+    last_event_id = request.headers.get('Last-Event-ID')
+    if not last_event_id and request.args.get('since') and request.args.get('epoch'):
+        last_event_id = f"{request.args['epoch']}-{request.args['since']}"
+
+    count('stream_connections_total')
+    events = price_stream.events(snapshot.epoch, snapshot.version, last_event_id)
+    response = current_app.response_class(events, mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    # Keep reverse proxies from buffering the stream
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@api.route('/accounts')
+def accounts():
+    """Accounts from every connection"""
+    return snapshot_response('accounts', lambda snapshot: {'accounts': snapshot.accounts})
+
+
+@api.route('/totals')
+def totals():
+    """Market value and unrealized P/L by asset type and overall"""
+    return snapshot_response('totals', lambda snapshot: {
+        'totals': snapshot.positions['totals'],
+        'total_market_value': snapshot.positions['total_market_value'],
+        'total_unrealized_pl': snapshot.positions['total_unrealized_pl']
+    })
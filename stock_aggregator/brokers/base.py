@@ -1,5 +1,7 @@
+import asyncio
 from abc import ABC, abstractmethod
-from typing import List, Dict
+from concurrent.futures import Executor
+from typing import List, Dict, Optional
 from ..services.market_data import MarketDataService
 
 class Broker(ABC):
@@ -8,7 +10,11 @@ class Broker(ABC):
 
     @abstractmethod
     def get_accounts(self) -> List[Dict]:
-        """Get all accounts for this broker."""
+        """Get all accounts for this broker.
+
+        Raises on failure rather than returning an empty list, so callers can
+        fall back to the last good result instead of treating it as empty.
+        """
         pass
 
     @abstractmethod
@@ -18,7 +24,15 @@ class Broker(ABC):
 
     @abstractmethod
     def get_all_positions(self) -> Dict[str, List[Dict]]:
-        """Get all positions grouped by asset type."""
+        """Get all positions grouped by asset type. Raises on failure, like get_accounts()."""
+        pass
+
+    def invalidate_cache(self) -> None:
+        """Drop any data cached for the current refresh cycle."""
+        pass
+
+    def close(self) -> None:
+        """Stop background work of a connection that is removed or shut down."""
         pass
 
     def combine_all_positions(self) -> Dict:
@@ -33,15 +47,11 @@ class Broker(ABC):
         total_market_value = 0.0
         total_unrealized_pl = 0.0
 
-        # Get all positions from all accounts
-        all_positions = self.get_all_positions()
-        
-        # Combine positions by type
-        for asset_type, positions in all_positions.items():
-            positions_by_type[asset_type].extend(positions)
-            
-            # Calculate totals
+        # Combine positions by type and keep running totals in the same walk
+        for asset_type, positions in self.get_all_positions().items():
+            bucket = positions_by_type.setdefault(asset_type, [])
             for position in positions:
+                bucket.append(position)
                 total_market_value += position.get('market_value', 0)
                 total_unrealized_pl += position.get('unrealized_pl', 0)
 
@@ -55,4 +65,44 @@ class Broker(ABC):
 
     def get_option_chain(self, symbol: str, expiration: str = None) -> Dict:
         """Get option chain data for a symbol."""
-        return self.market_data.get_option_chain(symbol, expiration) 
\ No newline at end of file
+        return self.market_data.get_option_chain(symbol, expiration)
+
+
+class AsyncBroker(ABC):
+    """Async counterpart of Broker for connections served on an event loop."""
+
+    def __init__(self, broker: Broker):
+        self.broker = broker
+        self.connection_id = getattr(broker, 'connection_id', None)
+
+    @abstractmethod
+    async def get_accounts(self) -> List[Dict]:
+        """Get all accounts for this broker."""
+        pass
+
+    @abstractmethod
+    async def get_all_positions(self) -> Dict[str, List[Dict]]:
+        """Get all positions grouped by asset type."""
+        pass
+
+    async def aclose(self) -> None:
+        """Release connections held by this broker."""
+        pass
+
+
+class SyncBrokerAdapter(AsyncBroker):
+    """Run a synchronous Broker's calls on an executor so it can be awaited."""
+
+    def __init__(self, broker: Broker, executor: Optional[Executor] = None):
+        super().__init__(broker)
+        self.executor = executor
+
+    async def _run(self, method_name: str):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, getattr(self.broker, method_name))
+
+    async def get_accounts(self) -> List[Dict]:
+        return await self._run('get_accounts')
+
+    async def get_all_positions(self) -> Dict[str, List[Dict]]:
+        return await self._run('get_all_positions')
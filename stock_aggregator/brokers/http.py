@@ -0,0 +1,119 @@
+import random
+import logging
+from typing import Dict, Optional
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+# Defaults for broker HTTP sessions, overridable per connection in the http section of config.yml
+DEFAULT_HTTP_SETTINGS = {
+    'pool_connections': 2,     # Distinct hosts kept in the pool (API and OAuth)
+    'pool_maxsize': 4,         # Keep-alive connections per host
+    'connect_timeout': 5.0,
+    'read_timeout': 30.0,
+    'max_retries': 3,
+    'backoff_factor': 0.5,     # Retry n waits up to backoff_factor * 2 ** (n - 1) seconds
+    'backoff_max': 10.0
+}
+
+# Responses worth retrying: rate limiting and transient server errors
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class JitteredRetry(Retry):
+    """urllib3 Retry with full jitter on the exponential backoff.
+
+    Each retry is counted in the owning session's stats and logged, so
+    retry storms against a broker API show up in the logs.
+    """
+
+    def __init__(self, *args, session_stats: Optional[Dict] = None, backoff_cap: float = 10.0, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.session_stats = session_stats
+        self.backoff_cap = backoff_cap
+
+    def new(self, **kw):
+        retry = super().new(**kw)
+        retry.session_stats = self.session_stats
+        retry.backoff_cap = self.backoff_cap
+        return retry
+
+    def get_backoff_time(self) -> float:
+        backoff = min(super().get_backoff_time(), self.backoff_cap)
+        return random.uniform(0, backoff) if backoff > 0 else 0
+
+    def increment(self, method=None, url=None, response=None, error=None, _pool=None, _stacktrace=None):
+        retry = super().increment(method=method, url=url, response=response, error=error,
+                                  _pool=_pool, _stacktrace=_stacktrace)
+        if self.session_stats is not None:
+            self.session_stats['retries'] += 1
+        reason = f"status {response.status}" if response is not None else repr(error)
+        logger.warning(f"Retrying {method} {url} after {reason} (retry {len(retry.history)})")
+        return retry
+
+
+class BrokerSession(requests.Session):
+    """Keep-alive session with default timeouts and bounded, jittered retries."""
+
+    def __init__(self, settings: Optional[Dict] = None):
+        super().__init__()
+        self.settings = dict(DEFAULT_HTTP_SETTINGS, **(settings or {}))
+        self.timeout = (float(self.settings['connect_timeout']), float(self.settings['read_timeout']))
+        self.stats = {'requests': 0, 'retries': 0}
+
+        retry = JitteredRetry(
+            total=int(self.settings['max_retries']),
+            status_forcelist=RETRY_STATUSES,
+            backoff_factor=float(self.settings['backoff_factor']),
+            respect_retry_after_header=True,
+            raise_on_status=False,
+            session_stats=self.stats,
+            backoff_cap=float(self.settings['backoff_max'])
+        )
+        adapter = HTTPAdapter(
+            pool_connections=int(self.settings['pool_connections']),
+            pool_maxsize=int(self.settings['pool_maxsize']),
+            max_retries=retry
+        )
+        self.mount('https://', adapter)
+        self.mount('http://', adapter)
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        self.stats['requests'] += 1
+        response = super().request(method, url, **kwargs)
+        stats = self.connection_stats()
+        logger.debug(
+            f"{method} {url} -> {response.status_code} "
+            f"(requests: {stats['requests']}, connections opened: {stats['connections_opened']}, "
+            f"retries: {stats['retries']})"
+        )
+        return response
+
+    def connection_stats(self) -> Dict[str, int]:
+        """Get request, retry and connection counts for this session.
+
+        ``connections_opened`` well below ``requests`` means keep-alive
+        connections are being reused.
+        """
+        connections_opened = 0
+        for adapter in set(self.adapters.values()):
+            pools = getattr(getattr(adapter, 'poolmanager', None), 'pools', None)
+            if pools is None:
+                continue
+            for key in list(pools.keys()):
+                pool = pools.get(key)
+                if pool is not None:
+                    connections_opened += getattr(pool, 'num_connections', 0)
+        return {
+            'requests': self.stats['requests'],
+            'retries': self.stats['retries'],
+            'connections_opened': connections_opened
+        }
+
+
+def build_session(settings: Optional[Dict] = None) -> BrokerSession:
+    """Create a pooled session using a connection's http settings from config.yml."""
+    return BrokerSession(settings)
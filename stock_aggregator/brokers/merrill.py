@@ -2,7 +2,6 @@ try:
     import plaid
     from plaid.api import plaid_api
     from plaid.model.accounts_balance_get_request import AccountsBalanceGetRequest
-    from plaid.model.accounts_get_request import AccountsGetRequest
     from plaid.model.item_public_token_exchange_request import ItemPublicTokenExchangeRequest
     from plaid.model.link_token_create_request import LinkTokenCreateRequest
     from plaid.model.link_token_create_request_user import LinkTokenCreateRequestUser
@@ -10,20 +9,42 @@ try:
 except ImportError:
     PLAID_AVAILABLE = False
 from typing import List, Dict, Any
+from datetime import datetime, timedelta
 from .base import Broker
 from ..config import Config
+from ..metrics import count, timed
+from ..records import RawPosition
 import logging
+import threading
 
 logger = logging.getLogger(__name__)
 
+# How long one accounts_balance_get response serves accounts and positions
+DEFAULT_SNAPSHOT_TTL = 30
+
 class MerrillBroker(Broker):
     def __init__(self, connection_id=None):
         super().__init__()
         self.config = Config()
         self.connection_id = connection_id
-        self.connection = self.config.get_broker_connection(connection_id)
-        self.credentials = self.config.get_broker_credentials('merrill', connection_id)
+        self._snapshot = None
+        self._snapshot_at = None
+        self._snapshot_lock = threading.Lock()
+        self._config_generation = None
+        self._load_connection_settings()
+
+    def _load_connection_settings(self):
+        """Apply this connection's settings from config.yml"""
+        self._config_generation = self.config.generation
+        previous_credentials = getattr(self, 'credentials', None)
+        self.connection = self.config.get_broker_connection(self.connection_id)
+        self.credentials = self.config.get_broker_credentials('merrill', self.connection_id)
         self.use_mock = self.credentials.get('use_mock', False)
+        self.snapshot_ttl = timedelta(seconds=(self.connection or {}).get('snapshot_ttl_seconds', DEFAULT_SNAPSHOT_TTL))
+        
+        # Only rebuild the Plaid client when the credentials change
+        if self.credentials == previous_credentials and hasattr(self, 'client'):
+            return
         
         # Initialize Plaid client if available
         if not self.use_mock and PLAID_AVAILABLE:
@@ -48,8 +69,74 @@ class MerrillBroker(Broker):
 
     def is_enabled(self):
         """Check if the specific Merrill connection is enabled"""
+        # Pick up edits to config.yml without a restart
+        if self.config.generation != self._config_generation:
+            self._load_connection_settings()
         return self.config.is_broker_enabled(self.connection_id)
 
+    def invalidate_cache(self):
+        """Drop the cached balances snapshot so the next call refetches it"""
+        with self._snapshot_lock:
+            self._snapshot = None
+            self._snapshot_at = None
+
+    def _get_accounts_snapshot(self) -> Dict[str, Any]:
+        """Get investment accounts and their positions for the current refresh cycle.
+
+        One accounts_balance_get call is split by account in memory and
+        reused by get_accounts, get_positions and get_all_positions for
+        snapshot_ttl_seconds. Plaid errors are raised to the caller.
+
+        Returns:
+            Dict with 'accounts' (list of account summaries) and
+            'positions' (positions keyed by account ID).
+        """
+        with self._snapshot_lock:
+            now = datetime.now()
+            if self._snapshot is not None and now - self._snapshot_at < self.snapshot_ttl:
+                return self._snapshot
+
+            request = AccountsBalanceGetRequest(access_token=self.access_token)
+            count('outbound_calls_total', service='plaid', endpoint='accounts_balance_get')
+            with timed('plaid_accounts'):
+                response = self.client.accounts_balance_get(request)
+
+            accounts = []
+            positions_by_account = {}
+            for account in response.accounts:
+                if account.type != 'investment':
+                    continue
+                accounts.append({
+                    'id': account.account_id,
+                    'name': account.name,
+                    'type': account.subtype,
+                    'status': 'ACTIVE',
+                    'balance': account.balances.current,
+                    'connection_id': self.connection_id
+                })
+                positions_by_account[account.account_id] = [
+                    RawPosition(
+                        symbol=security.ticker_symbol,
+                        name=security.name,
+                        quantity=security.quantity,
+                        average_price=security.cost_basis,
+                        current_price=security.current_price,
+                        market_value=security.current_price * security.quantity,
+                        unrealized_pl=(security.current_price - security.cost_basis) * security.quantity,
+                        asset_type=self._get_asset_type(security.type),
+                        connection_id=self.connection_id,
+                        account_id=account.account_id
+                    )
+                    for security in account.securities
+                ]
+
+            self._snapshot = {
+                'accounts': accounts,
+                'positions': positions_by_account
+            }
+            self._snapshot_at = now
+            return self._snapshot
+
     def get_accounts(self) -> List[Dict]:
         """Get all accounts for Merrill through Plaid."""
         if not self.is_enabled():
@@ -59,24 +146,10 @@ class MerrillBroker(Broker):
             return self._generate_mock_accounts()
             
         try:
-            request = AccountsGetRequest(access_token=self.access_token)
-            response = self.client.accounts_get(request)
-            
-            accounts = []
-            for account in response.accounts:
-                if account.type == 'investment':
-                    accounts.append({
-                        'id': account.account_id,
-                        'name': account.name,
-                        'type': account.subtype,
-                        'status': 'ACTIVE',
-                        'balance': account.balances.current,
-                        'connection_id': self.connection_id
-                    })
-            return accounts
+            return list(self._get_accounts_snapshot()['accounts'])
         except Exception as e:
             logger.error(f"Error getting Merrill accounts: {str(e)}")
-            return []
+            raise
 
     def get_positions(self, account_id: str) -> List[Dict]:
         """Get positions for a specific Merrill account through Plaid."""
@@ -87,29 +160,10 @@ class MerrillBroker(Broker):
             return self._generate_mock_positions()
             
         try:
-            request = AccountsBalanceGetRequest(access_token=self.access_token)
-            response = self.client.accounts_balance_get(request)
-            
-            positions = []
-            for account in response.accounts:
-                if account.account_id == account_id and account.type == 'investment':
-                    for security in account.securities:
-                        positions.append({
-                            'symbol': security.ticker_symbol,
-                            'name': security.name,
-                            'quantity': security.quantity,
-                            'average_price': security.cost_basis,
-                            'current_price': security.current_price,
-                            'market_value': security.current_price * security.quantity,
-                            'unrealized_pl': (security.current_price - security.cost_basis) * security.quantity,
-                            'asset_type': self._get_asset_type(security.type),
-                            'connection_id': self.connection_id,
-                            'account_id': account_id
-                        })
-            return positions
+            return list(self._get_accounts_snapshot()['positions'].get(account_id, []))
         except Exception as e:
             logger.error(f"Error getting Merrill positions: {str(e)}")
-            return []
+            raise
     
     def get_all_positions(self) -> Dict[str, List[Dict]]:
         """Get all positions for Merrill through Plaid."""
@@ -144,12 +198,10 @@ class MerrillBroker(Broker):
                 'cash': []
             }
             
-            # Get all accounts
-            accounts = self.get_accounts()
-            for account in accounts:
-                # Get positions for each account
-                positions = self.get_positions(account['id'])
-                for position in positions:
+            snapshot = self._get_accounts_snapshot()
+            for account in snapshot['accounts']:
+                # Positions for each account come from the same snapshot
+                for position in snapshot['positions'].get(account['id'], []):
                     asset_type = position.get('asset_type', 'other')
                     positions_by_type[asset_type].append(position)
                 
@@ -176,14 +228,7 @@ class MerrillBroker(Broker):
             return positions_by_type
         except Exception as e:
             logger.error(f"Error getting Merrill positions: {str(e)}")
-            return {
-                'equity': [],
-                'option': [],
-                'collective_investment': [],
-                'fixed_income': [],
-                'other': [],
-                'cash': []
-            }
+            raise
 
     def _get_asset_type(self, security_type: str) -> str:
         """Convert Plaid security type to our asset type."""
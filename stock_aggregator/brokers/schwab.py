@@ -1,29 +1,82 @@
+try:
+    import httpx
+    HTTPX_AVAILABLE = True
+except ImportError:
+    HTTPX_AVAILABLE = False
+import asyncio
 import requests
 import json
 from datetime import datetime, timedelta
 from typing import List, Dict, Any
-from .base import Broker
+from .base import AsyncBroker, Broker
+from .http import DEFAULT_HTTP_SETTINGS, build_session
+from .token_store import FileTokenStore
 from ..config import Config
+from ..metrics import count, timed
+from ..records import RawPosition
 import base64
 import logging
+import threading
 
 logger = logging.getLogger(__name__)
 
+# How long one /accounts?fields=positions payload serves both accounts and positions
+DEFAULT_SNAPSHOT_TTL = 30
+
+# Refresh the access token this many seconds before it expires
+DEFAULT_TOKEN_REFRESH_MARGIN = 120
+
 class SchwabBroker(Broker):
     def __init__(self, connection_id=None):
         super().__init__()
         self.config = Config()
         self.connection_id = connection_id
-        self.connection = self.config.get_broker_connection(connection_id)
-        self.credentials = self.config.get_broker_credentials('schwab', connection_id)
         self.base_url = 'https://api.schwabapi.com/trader/v1'
         self.token_url ='https://api.schwabapi.com/v1/oauth/token'
         self.access_token = None
-        self.refresh_token = self.credentials.get('refresh_token')
+        self.refresh_token = None
         self.token_expires_at = None
         self.logger = logging.getLogger(__name__)
         self.broker_name = "Charles Schwab"
+        self.session = None
+        self._snapshot = None
+        self._snapshot_at = None
+        self._snapshot_lock = threading.Lock()
+        self._config_generation = None
+        self.token_store = None
+        self._refresher = None
+        self._refresher_stop = threading.Event()
+        self._load_connection_settings()
+
+    def _load_connection_settings(self):
+        """Apply this connection's settings from config.yml"""
+        self._config_generation = self.config.generation
+        previous_connection = getattr(self, 'connection', None) or {}
+        previous_credentials = getattr(self, 'credentials', None) or {}
+        self.connection = self.config.get_broker_connection(self.connection_id)
+        self.credentials = self.config.get_broker_credentials('schwab', self.connection_id)
         self.use_mock = self.credentials.get('use_mock', False)
+        self.snapshot_ttl = timedelta(seconds=(self.connection or {}).get('snapshot_ttl_seconds', DEFAULT_SNAPSHOT_TTL))
+        self.token_refresh_margin = (self.connection or {}).get('token_refresh_margin_seconds', DEFAULT_TOKEN_REFRESH_MARGIN)
+        
+        # Tokens are shared with the other worker processes through the token store
+        token_store_path = (self.connection or {}).get('token_store_path')
+        if self.token_store is None or token_store_path != previous_connection.get('token_store_path'):
+            self.token_store = FileTokenStore(token_store_path)
+        
+        # Keep a rotated refresh token unless the configured one was changed
+        if self.refresh_token is None or self.credentials.get('refresh_token') != previous_credentials.get('refresh_token'):
+            self.refresh_token = self.credentials.get('refresh_token')
+        if self.credentials != previous_credentials:
+            self.access_token = None
+            self.token_expires_at = None
+        
+        # Pooled keep-alive session with timeouts and retries, tuned by the connection's http settings
+        http_settings = (self.connection or {}).get('http')
+        if self.session is None or http_settings != previous_connection.get('http'):
+            if self.session is not None:
+                self.session.close()
+            self.session = build_session(http_settings)
         
         # Validate required credentials
         if not self.use_mock:
@@ -36,24 +89,57 @@ class SchwabBroker(Broker):
 
     def is_enabled(self):
         """Check if the specific Schwab connection is enabled"""
+        # Pick up edits to config.yml without a restart
+        if self.config.generation != self._config_generation:
+            self._load_connection_settings()
         return self.config.is_broker_enabled(self.connection_id)
     
     def get_access_token(self):
-        """Get or refresh access token using refresh token"""
+        """Get the access token, refreshing it through the shared token store when it expires"""
         if self.use_mock:
             return "mock_access_token"
             
-        if self.access_token and self.token_expires_at and datetime.now() < self.token_expires_at:
+        if self.has_valid_token():
             return self.access_token
             
         try:
-            # Create Basic Auth header
-            print(f"client_id: {self.credentials['client_id']} client_secret: {self.credentials['client_secret']}")
-            print(f"refresh_token: {self.refresh_token}")
-            auth_string = f"{self.credentials['client_id']}:{self.credentials['client_secret']}"
-            encoded_auth = base64.b64encode(auth_string.encode()).decode()
-            
-            response = requests.post(
+            self._acquire_token(margin=0)
+            self._start_token_refresher()
+            return self.access_token
+        except Exception as e:
+            self.logger.error(f"Error getting access token: {str(e)}")
+            raise
+
+    def has_valid_token(self) -> bool:
+        """Check whether the in-memory access token can be used without a refresh"""
+        return bool(self.access_token and self.token_expires_at and datetime.now() < self.token_expires_at)
+
+    def _acquire_token(self, margin: float):
+        """Load a token valid for at least margin seconds from the token store.
+
+        Only one process refreshes at a time; the others wait on the store's
+        lock and then use the token it wrote, so a rotated refresh token is
+        never spent twice.
+        """
+        record = self.token_store.get_or_refresh(
+            self.connection_id,
+            self._refresh_tokens,
+            margin=margin,
+            seed_refresh_token=self.credentials.get('refresh_token')
+        )
+        self.access_token = record['access_token']
+        self.refresh_token = record['refresh_token']
+        self.token_expires_at = datetime.fromtimestamp(record['expires_at'])
+
+    def _refresh_tokens(self, current: Dict = None) -> Dict:
+        """Exchange the latest refresh token for new tokens; called under the token store lock"""
+        refresh_token = (current or {}).get('refresh_token') or self.refresh_token
+        auth_string = f"{self.credentials['client_id']}:{self.credentials['client_secret']}"
+        encoded_auth = base64.b64encode(auth_string.encode()).decode()
+        
+        count('outbound_calls_total', service='schwab', endpoint='token')
+        with timed('schwab_token_refresh'):
+            response = self.session.post(
                 f"{self.token_url}",
                 headers={
                     'Authorization': f'Basic {encoded_auth}',
@@ -61,26 +147,102 @@ class SchwabBroker(Broker):
                 },
                 data={
                     'grant_type': 'refresh_token',
-                    'refresh_token': self.refresh_token
+                    'refresh_token': refresh_token
                 }
             )
             response.raise_for_status()
-            token_data = response.json()
-            
-            # Update tokens
-            self.access_token = token_data['access_token']
-            self.refresh_token = token_data.get('refresh_token', self.refresh_token)  # Keep existing if not provided
-            self.token_expires_at = datetime.now() + timedelta(seconds=token_data['expires_in'])
-            
-            return self.access_token
-        except Exception as e:
-            self.logger.error(f"Error getting access token: {str(e)}")
-            raise
+        token_data = response.json()
+        
+        return {
+            'access_token': token_data['access_token'],
+            'refresh_token': token_data.get('refresh_token', refresh_token),  # Keep existing if not provided
+            'expires_at': (datetime.now() + timedelta(seconds=token_data['expires_in'])).timestamp()
+        }
+
+    def _start_token_refresher(self):
+        """Start the background thread that refreshes the token before it expires"""
+        if self._refresher is not None and self._refresher.is_alive():
+            return
+        self._refresher_stop.clear()
+        self._refresher = threading.Thread(
+            target=self._run_token_refresher,
+            name=f"schwab-token-{self.connection_id}",
+            daemon=True
+        )
+        self._refresher.start()
+
+    def stop_token_refresher(self):
+        """Stop the background token refresh thread"""
+        self._refresher_stop.set()
+
+    def close(self):
+        """Stop refreshing tokens for a connection that was removed or shut down"""
+        self.stop_token_refresher()
+
+    def _run_token_refresher(self):
+        while not self._refresher_stop.is_set():
+            if self.token_expires_at is None:
+                delay = self.token_refresh_margin
+            else:
+                refresh_at = self.token_expires_at - timedelta(seconds=self.token_refresh_margin)
+                delay = max((refresh_at - datetime.now()).total_seconds(), 0)
+            if self._refresher_stop.wait(delay):
+                return
+            if self.use_mock or not self.is_enabled():
+                continue
+            try:
+                self._acquire_token(margin=self.token_refresh_margin)
+            except Exception as e:
+                self.logger.error(f"Error refreshing access token for {self.connection_id}: {str(e)}")
+                # Back off before trying again rather than spinning
+                if self._refresher_stop.wait(min(self.token_refresh_margin, 30)):
+                    return
 
     def get_positions(self, account_id: str) -> List[Dict]:
         """Get positions for a specific account."""
         return []
     
+    def get_http_stats(self) -> Dict[str, int]:
+        """Get request, retry and connection reuse counts for this connection's session"""
+        return self.session.connection_stats()
+    
+    def invalidate_cache(self):
+        """Drop the cached account snapshot so the next call refetches it"""
+        with self._snapshot_lock:
+            self._snapshot = None
+            self._snapshot_at = None
+    
+    def _get_accounts_snapshot(self) -> List[Dict]:
+        """Get the /accounts?fields=positions payload for the current refresh cycle.
+        
+        Positions and account balances are both derived from this payload,
+        so one request (and one token check) serves both for
+        snapshot_ttl_seconds. The lock makes concurrent callers share a
+        single fetch. Request errors are raised to the caller.
+        """
+        with self._snapshot_lock:
+            now = datetime.now()
+            if self._snapshot is not None and now - self._snapshot_at < self.snapshot_ttl:
+                return self._snapshot
+            
+            access_token = self.get_access_token()
+            headers = {
+                'Authorization': f'Bearer {access_token}',
+                'Accept': 'application/json'
+            }
+            
+            count('outbound_calls_total', service='schwab', endpoint='accounts')
+            with timed('schwab_accounts'):
+                response = self.session.get(
+                    f"{self.base_url}/accounts?fields=positions",
+                    headers=headers
+                )
+                response.raise_for_status()
+            
+            self._snapshot = response.json()
+            self._snapshot_at = now
+            return self._snapshot
+    
     def get_all_positions(self) -> Dict[str, List[Dict]]:
         """Get all positions from Schwab API"""
         if not self.is_enabled():
@@ -104,102 +266,85 @@ class SchwabBroker(Broker):
             }
             
         try:
-            access_token = self.get_access_token()
-            headers = {
-                'Authorization': f'Bearer {access_token}',
-                'Accept': 'application/json'
-            }
-            
-            print(f"request url: {f'{self.base_url}/accounts/?fields=positions'} token: {access_token}")
-            response = requests.get(
-                f"{self.base_url}/accounts?fields=positions",
-                headers=headers
-            )
-            response.raise_for_status()
-            
-            accounts_data = response.json()
-            positions_by_type = {
-                'equity': [],
-                'option': [],
-                'collective_investment': [],
-                'fixed_income': [],
-                'other': [],
-                'cash': []
-            }
-            
-            for account in accounts_data:
-                if 'securitiesAccount' in account and 'positions' in account['securitiesAccount']:
-                    for position in account['securitiesAccount']['positions']:
-                        instrument = position['instrument']
+            return self._build_positions(self._get_accounts_snapshot())
+        except Exception as e:
+            self.logger.error(f"Error getting positions: {str(e)}")
+            raise
+    
+    def _build_positions(self, accounts_data: List[Dict]) -> Dict[str, List[Dict]]:
+        """Convert an /accounts?fields=positions payload into positions by asset type"""
+        positions_by_type = {
+            'equity': [],
+            'option': [],
+            'collective_investment': [],
+            'fixed_income': [],
+            'other': [],
+            'cash': []
+        }
+        
+        for account in accounts_data:
+            if 'securitiesAccount' in account and 'positions' in account['securitiesAccount']:
+                for position in account['securitiesAccount']['positions']:
+                    instrument = position['instrument']
+                    
+                    # Calculate quantity (long - short)
+                    quantity = position['longQuantity'] - position['shortQuantity']
+                    if quantity == 0:
+                        continue
+                        
+                    # Multiply quantity by 10 for Fixed Income assets
+                    if instrument['assetType'] == 'FIXED_INCOME':
+                        quantity *= 10
                         
-                        # Calculate quantity (long - short)
-                        quantity = position['longQuantity'] - position['shortQuantity']
-                        if quantity == 0:
-                            continue
-                            
-                        # Multiply quantity by 10 for Fixed Income assets
-                        if instrument['assetType'] == 'FIXED_INCOME':
-                            quantity *= 10
-                            
-                        # Use averagePrice as cost basis
-                        cost_basis_price = position.get('averagePrice', 0)
-                        if cost_basis_price == 0:
-                            cost_basis_price = position.get('averageLongPrice', 0)
-                            
-                        position_data = {
-                            'symbol': instrument['symbol'],
-                            'name': instrument.get('description', ''),
-                            'quantity': quantity,
-                            'average_price': cost_basis_price,
-                            'current_price': position['marketValue'] / quantity if quantity != 0 else 0,
-                            'market_value': position['marketValue'],
-                            'unrealized_pl': position.get('unrealizedGainLoss', 0),
-                            'asset_type': instrument['assetType'],
-                            'connection_id': self.connection_id,
-                            'account_id': account['securitiesAccount']['accountNumber']
-                        }
+                    # Use averagePrice as cost basis
+                    cost_basis_price = position.get('averagePrice', 0)
+                    if cost_basis_price == 0:
+                        cost_basis_price = position.get('averageLongPrice', 0)
                         
-                        # Add to appropriate asset type list
-                        asset_type = instrument['assetType'].lower()
-                        if asset_type == 'equity':
-                            positions_by_type['equity'].append(position_data)
-                        elif asset_type == 'option':
-                            positions_by_type['option'].append(position_data)
-                        elif asset_type in ['mutual_fund', 'etf', 'collective_investment']:
-                            positions_by_type['collective_investment'].append(position_data)
-                        elif asset_type == 'fixed_income':
-                            positions_by_type['fixed_income'].append(position_data)
-                        else:
-                            positions_by_type['other'].append(position_data)
-                    positions_by_type['cash'].append({
-                        'symbol': 'CASH',
-                        'name': 'Cash',
+                    position_data = RawPosition(
+                        symbol=instrument['symbol'],
+                        name=instrument.get('description', ''),
+                        quantity=quantity,
+                        average_price=cost_basis_price,
+                        current_price=position['marketValue'] / quantity if quantity != 0 else 0,
+                        market_value=position['marketValue'],
+                        unrealized_pl=position.get('unrealizedGainLoss', 0),
+                        asset_type=instrument['assetType'],
+                        connection_id=self.connection_id,
+                        account_id=account['securitiesAccount']['accountNumber']
+                    )
+                    
+                    # Add to appropriate asset type list
+                    asset_type = instrument['assetType'].lower()
+                    if asset_type == 'equity':
+                        positions_by_type['equity'].append(position_data)
+                    elif asset_type == 'option':
+                        positions_by_type['option'].append(position_data)
+                    elif asset_type in ['mutual_fund', 'etf', 'collective_investment']:
+                        positions_by_type['collective_investment'].append(position_data)
+                    elif asset_type == 'fixed_income':
+                        positions_by_type['fixed_income'].append(position_data)
+                    else:
+                        positions_by_type['other'].append(position_data)
+                positions_by_type['cash'].append({
+                    'symbol': 'CASH',
+                    'name': 'Cash',
+                    'quantity': account['securitiesAccount']['currentBalances']['cashBalance'],
+                    'average_price': 1.0,
+                    'current_price': 1.0,
+                    'market_value': account['securitiesAccount']['currentBalances']['cashBalance'],
+                    'unrealized_pl': 0.0,
+                    'unrealized_pl_percent': 0.0,
+                    'accounts': [{
+                        'account_id': account['securitiesAccount']['accountNumber'],
                         'quantity': account['securitiesAccount']['currentBalances']['cashBalance'],
                         'average_price': 1.0,
-                        'current_price': 1.0,
                         'market_value': account['securitiesAccount']['currentBalances']['cashBalance'],
-                        'unrealized_pl': 0.0,
-                        'unrealized_pl_percent': 0.0,
-                        'accounts': [{
-                            'account_id': account['securitiesAccount']['accountNumber'],
-                            'quantity': account['securitiesAccount']['currentBalances']['cashBalance'],
-                            'average_price': 1.0,
-                            'market_value': account['securitiesAccount']['currentBalances']['cashBalance'],
-                            'unrealized_pl': 0.0
-                        }]
-                    })
-            
-            return positions_by_type
-        except Exception as e:
-            self.logger.error(f"Error getting positions: {str(e)}")
-            return {
-                'equity': [],
-                'option': [],
-                'collective_investment': [],
-                'fixed_income': [],
-                'other': [],
-                'cash': []
-            }
+                        'unrealized_pl': 0.0
+                    }]
+                })
+        
+        return positions_by_type
     
     def get_accounts(self):
         """Get accounts from Schwab API"""
@@ -210,39 +355,30 @@ class SchwabBroker(Broker):
             return self._generate_mock_accounts()
             
         try:
-            access_token = self.get_access_token()
-            headers = {
-                'Authorization': f'Bearer {access_token}',
-                'Accept': 'application/json'
-            }
-            
-            response = requests.get(
-                f"{self.base_url}/accounts",
-                headers=headers
-            )
-            response.raise_for_status()
-            
-            accounts_data = response.json()
-            accounts = []
-            
-            for account in accounts_data:
-                if 'securitiesAccount' in account:
-                    securities_account = account['securitiesAccount']
-                    current_balances = securities_account.get('currentBalances', {})
-                    
-                    accounts.append({
-                        'id': securities_account['accountNumber'],
-                        'name': f"Schwab {securities_account['type']} Account",
-                        'type': securities_account['type'],
-                        'status': securities_account.get('status', 'ACTIVE'),
-                        'balance': current_balances.get('liquidationValue', 0),
-                        'connection_id': self.connection_id
-                    })
-            
-            return accounts
+            return self._build_accounts(self._get_accounts_snapshot())
         except Exception as e:
             self.logger.error(f"Error getting accounts: {str(e)}")
-            return []
+            raise
+    
+    def _build_accounts(self, accounts_data: List[Dict]) -> List[Dict]:
+        """Convert an /accounts payload into account summaries"""
+        accounts = []
+        
+        for account in accounts_data:
+            if 'securitiesAccount' in account:
+                securities_account = account['securitiesAccount']
+                current_balances = securities_account.get('currentBalances', {})
+                
+                accounts.append({
+                    'id': securities_account['accountNumber'],
+                    'name': f"Schwab {securities_account['type']} Account",
+                    'type': securities_account['type'],
+                    'status': securities_account.get('status', 'ACTIVE'),
+                    'balance': current_balances.get('liquidationValue', 0),
+                    'connection_id': self.connection_id
+                })
+        
+        return accounts
 
     def get_token(self, auth_code: str = None) -> Dict[str, Any]:
         """Get access token using refresh token or authorization code."""
@@ -269,7 +405,8 @@ class SchwabBroker(Broker):
                 data['refresh_token'] = self.refresh_token
 
             # Make request to Schwab API
-            response = requests.post(
+            count('outbound_calls_total', service='schwab', endpoint='token')
+            response = self.session.post(
                 'https://api.schwabapi.com/v1/oauth/token',
                 headers={
                     'Authorization': auth_header,
@@ -280,10 +417,16 @@ class SchwabBroker(Broker):
             response.raise_for_status()
             token_data = response.json()
 
-            # Update instance variables with new tokens
+            # Update instance variables with new tokens and share them with other workers
             self.access_token = token_data['access_token']
             self.refresh_token = token_data['refresh_token']
             self.token_expires_at = datetime.now() + timedelta(seconds=token_data['expires_in'])
+            self.token_store.save(self.connection_id, {
+                'access_token': self.access_token,
+                'refresh_token': self.refresh_token,
+                'expires_at': self.token_expires_at.timestamp(),
+                'seed_refresh_token': self.credentials.get('refresh_token')
+            })
 
             return token_data
 
@@ -327,4 +470,97 @@ class SchwabBroker(Broker):
             }
             accounts.append(account)
         
-        return accounts 
\ No newline at end of file
+        return accounts
+
+
+class AsyncSchwabBroker(AsyncBroker):
+    """Serve a SchwabBroker's accounts and positions with an httpx.AsyncClient.
+
+    Settings, tokens, the snapshot and payload parsing are shared with the
+    wrapped SchwabBroker, so sync and async callers see the same refresh
+    cycle. Mock connections fall back to the sync broker on an executor.
+    """
+
+    def __init__(self, broker: SchwabBroker):
+        if not HTTPX_AVAILABLE:
+            raise RuntimeError("httpx is required for AsyncSchwabBroker")
+        super().__init__(broker)
+        self._client = None
+        self._client_settings = None
+        self._snapshot_lock = None
+
+    async def _get_client(self):
+        """Get the pooled async client, rebuilt when the connection's http settings change"""
+        settings = dict(DEFAULT_HTTP_SETTINGS, **((self.broker.connection or {}).get('http') or {}))
+        if self._client is None or settings != self._client_settings:
+            # Release the old pool's connections before replacing it
+            await self.aclose()
+            # httpx only retries failed connection attempts; status retries stay with the sync session
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(float(settings['read_timeout']), connect=float(settings['connect_timeout'])),
+                limits=httpx.Limits(max_connections=int(settings['pool_maxsize']),
+                                    max_keepalive_connections=int(settings['pool_maxsize'])),
+                transport=httpx.AsyncHTTPTransport(retries=int(settings['max_retries']))
+            )
+            self._client_settings = settings
+        return self._client
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def _get_accounts_snapshot(self) -> List[Dict]:
+        """Async variant of SchwabBroker._get_accounts_snapshot sharing its snapshot"""
+        broker = self.broker
+        if self._snapshot_lock is None:
+            self._snapshot_lock = asyncio.Lock()
+        async with self._snapshot_lock:
+            now = datetime.now()
+            with broker._snapshot_lock:
+                if broker._snapshot is not None and now - broker._snapshot_at < broker.snapshot_ttl:
+                    return broker._snapshot
+
+            # Token refreshes may block on the shared token store, so keep them off the loop
+            if broker.has_valid_token():
+                access_token = broker.access_token
+            else:
+                access_token = await asyncio.get_running_loop().run_in_executor(None, broker.get_access_token)
+
+            client = await self._get_client()
+            count('outbound_calls_total', service='schwab', endpoint='accounts')
+            with timed('schwab_accounts'):
+                response = await client.get(
+                    f"{broker.base_url}/accounts?fields=positions",
+                    headers={
+                        'Authorization': f'Bearer {access_token}',
+                        'Accept': 'application/json'
+                    }
+                )
+                response.raise_for_status()
+
+            snapshot = response.json()
+            with broker._snapshot_lock:
+                broker._snapshot = snapshot
+                broker._snapshot_at = now
+            return snapshot
+
+    async def get_accounts(self) -> List[Dict]:
+        broker = self.broker
+        if not broker.is_enabled() or broker.use_mock:
+            return await asyncio.get_running_loop().run_in_executor(None, broker.get_accounts)
+        try:
+            return broker._build_accounts(await self._get_accounts_snapshot())
+        except Exception as e:
+            logger.error(f"Error getting accounts: {str(e)}")
+            raise
+
+    async def get_all_positions(self) -> Dict[str, List[Dict]]:
+        broker = self.broker
+        if not broker.is_enabled() or broker.use_mock:
+            return await asyncio.get_running_loop().run_in_executor(None, broker.get_all_positions)
+        try:
+            return broker._build_positions(await self._get_accounts_snapshot())
+        except Exception as e:
+            logger.error(f"Error getting positions: {str(e)}")
+            raise
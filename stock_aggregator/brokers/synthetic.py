@@ -0,0 +1,273 @@
+from typing import List, Dict, Any
+from datetime import date, timedelta
+from .base import Broker
+from ..config import Config
+from ..records import RawPosition
+import logging
+import random
+import string
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Defaults for a synthetic connection, overridable on the connection in config.yml
+DEFAULT_SYNTHETIC_SETTINGS = {
+    'accounts': 5,
+    'positions_per_account': 50,
+    'symbols': 500,              # Size of the symbol universe shared by all accounts
+    'mix': {                     # Share of positions per asset type
+        'equity': 0.6,
+        'option': 0.15,
+        'fixed_income': 0.1,
+        'collective_investment': 0.15
+    },
+    'seed': 42,
+    'latency_ms': 0,             # Added to every call
+    'latency_jitter_ms': 0       # Uniform extra delay on top of latency_ms
+}
+
+# Asset types a mix may weight; cash is added once per account instead
+MIX_ASSET_TYPES = ('equity', 'option', 'collective_investment', 'fixed_income', 'other')
+
+# First expiration used for synthetic option contracts
+OPTION_BASE_EXPIRATION = date(2030, 1, 18)
+
+
+def _letters(index: int, width: int) -> str:
+    """Encode index as a fixed-width uppercase code, e.g. 0 -> 'AAA'"""
+    code = []
+    for _ in range(width):
+        index, remainder = divmod(index, 26)
+        code.append(string.ascii_uppercase[remainder])
+    return ''.join(reversed(code))
+
+
+class SyntheticBroker(Broker):
+    """Network-free broker that generates a large, deterministic book.
+
+    A connection of type 'synthetic' produces accounts x positions_per_account
+    positions drawn from a shared symbol universe in the configured asset
+    mix: equity tickers, OCC-format option contracts, CUSIP bonds and funds.
+    The same seed always yields the same book, and latency_ms /
+    latency_jitter_ms delay every call to mimic a slow broker. Set
+    market_data.offline so prices come from the generated data too.
+    """
+
+    def __init__(self, connection_id=None):
+        super().__init__()
+        self.config = Config()
+        self.connection_id = connection_id
+        self.broker_name = "Synthetic"
+        self.settings = None
+        self._book = None
+        self._book_lock = threading.Lock()
+        self._latency_rng = random.Random()
+        self._config_generation = None
+        self._load_connection_settings()
+
+    def _load_connection_settings(self):
+        """Apply this connection's settings from config.yml"""
+        self._config_generation = self.config.generation
+        connection = self.config.get_broker_connection(self.connection_id) or {}
+        settings = {key: connection.get(key, default) for key, default in DEFAULT_SYNTHETIC_SETTINGS.items()}
+        settings['mix'] = self._check_mix(settings['mix'])
+
+        # Only regenerate the book when its shape changes
+        if settings != self.settings:
+            with self._book_lock:
+                self.settings = settings
+                self._book = None
+                self._latency_rng = random.Random(settings['seed'])
+
+    def _check_mix(self, mix: Dict[str, float]) -> Dict[str, float]:
+        """Drop asset types positions cannot be grouped under, falling back to the default mix if none remain"""
+        unknown = sorted(set(mix) - set(MIX_ASSET_TYPES))
+        if unknown:
+            logger.error(f"Ignoring unknown asset types in the mix of synthetic connection {self.connection_id}: "
+                         f"{', '.join(unknown)} (expected {', '.join(MIX_ASSET_TYPES)})")
+            mix = {asset_type: weight for asset_type, weight in mix.items() if asset_type in MIX_ASSET_TYPES}
+        if not any(weight > 0 for weight in mix.values()):
+            logger.error(f"Mix of synthetic connection {self.connection_id} has no positive weight, using the default")
+            mix = DEFAULT_SYNTHETIC_SETTINGS['mix']
+        return mix
+
+    def is_enabled(self):
+        """Check if the specific synthetic connection is enabled"""
+        # Pick up edits to config.yml without a restart
+        if self.config.generation != self._config_generation:
+            self._load_connection_settings()
+        return self.config.is_broker_enabled(self.connection_id)
+
+    def _simulate_latency(self):
+        delay_ms = float(self.settings['latency_ms'])
+        if self.settings['latency_jitter_ms']:
+            delay_ms += self._latency_rng.uniform(0, float(self.settings['latency_jitter_ms']))
+        if delay_ms > 0:
+            time.sleep(delay_ms / 1000.0)
+
+    def _get_book(self) -> Dict[str, Any]:
+        """Get the generated accounts and positions, building them on first use"""
+        with self._book_lock:
+            if self._book is None:
+                started = time.monotonic()
+                self._book = self._generate_book(self.settings)
+                logger.info(
+                    f"Generated synthetic book for {self.connection_id}: "
+                    f"{sum(len(positions) for positions in self._book['positions'].values())} positions "
+                    f"in {(time.monotonic() - started) * 1000:.0f} ms"
+                )
+            return self._book
+
+    def _generate_universe(self, rng: random.Random, settings: Dict) -> Dict[str, List[Dict]]:
+        """Build the symbols each asset type draws from, with a base price per symbol"""
+        mix = settings['mix']
+        weight_total = sum(mix.values()) or 1.0
+        size = max(1, int(settings['symbols']))
+        counts = {asset_type: max(1, int(size * weight / weight_total)) for asset_type, weight in mix.items() if weight > 0}
+
+        equities = [
+            {'symbol': f"S{_letters(i, 3)}", 'price': round(rng.uniform(5, 500), 2)}
+            for i in range(counts.get('equity', 1))
+        ]
+        universe = {'equity': equities}
+
+        if 'option' in counts:
+            options = []
+            for i in range(counts['option']):
+                underlying = equities[i % len(equities)]
+                expiration = OPTION_BASE_EXPIRATION + timedelta(weeks=4 * (i // len(equities)))
+                strike = max(1, round(underlying['price'] * rng.uniform(0.8, 1.2)))
+                option_type = 'C' if i % 2 == 0 else 'P'
+                options.append({
+                    'symbol': f"{underlying['symbol']:<6}{expiration:%y%m%d}{option_type}{strike * 1000:08d}",
+                    'price': round(rng.uniform(0.5, 40), 2)
+                })
+            universe['option'] = options
+
+        if 'fixed_income' in counts:
+            # CUSIP shape: four digits, alphanumerics, trailing check digit; prices are percent of par
+            universe['fixed_income'] = [
+                {'symbol': f"{9000 + i % 1000:04d}{_letters(i, 4)}{i % 10}", 'price': round(rng.uniform(90, 105), 3)}
+                for i in range(counts['fixed_income'])
+            ]
+
+        if 'collective_investment' in counts:
+            universe['collective_investment'] = [
+                {'symbol': f"F{_letters(i, 3)}X", 'price': round(rng.uniform(10, 300), 2)}
+                for i in range(counts['collective_investment'])
+            ]
+
+        for asset_type in counts:
+            universe.setdefault(asset_type, equities)
+        return universe
+
+    def _generate_book(self, settings: Dict) -> Dict[str, Any]:
+        """Generate accounts and their positions from the connection's settings"""
+        rng = random.Random(settings['seed'])
+        universe = self._generate_universe(rng, settings)
+        asset_types = list(universe)
+        weights = [settings['mix'].get(asset_type, 0) for asset_type in asset_types]
+
+        accounts = []
+        positions_by_account = {}
+        for i in range(int(settings['accounts'])):
+            account_id = f"{self.connection_id}-{i + 1:04d}"
+            positions = []
+            for asset_type in rng.choices(asset_types, weights=weights, k=int(settings['positions_per_account'])):
+                holding = rng.choice(universe[asset_type])
+                if asset_type == 'fixed_income':
+                    quantity = float(rng.randint(1, 50) * 1000)
+                    scale = 0.01
+                elif asset_type == 'option':
+                    quantity = float(rng.randint(1, 20))
+                    scale = 1.0
+                else:
+                    quantity = float(rng.randint(1, 500))
+                    scale = 1.0
+                current_price = holding['price']
+                average_price = round(current_price * rng.uniform(0.7, 1.2), 4)
+                market_value = quantity * current_price * scale
+                positions.append(RawPosition(
+                    symbol=holding['symbol'],
+                    name=f"Synthetic {holding['symbol'].split()[0]}",
+                    quantity=quantity,
+                    average_price=average_price,
+                    current_price=current_price,
+                    market_value=market_value,
+                    unrealized_pl=market_value - quantity * average_price * scale,
+                    asset_type=asset_type,
+                    connection_id=self.connection_id,
+                    account_id=account_id
+                ))
+
+            cash = round(rng.uniform(0, 50000), 2)
+            positions_by_account[account_id] = positions
+            accounts.append({
+                'id': account_id,
+                'name': f"Synthetic Account {i + 1}",
+                'type': 'INDIVIDUAL',
+                'status': 'ACTIVE',
+                'balance': cash + sum(position.market_value for position in positions),
+                'cash': cash,
+                'connection_id': self.connection_id
+            })
+
+        return {'accounts': accounts, 'positions': positions_by_account}
+
+    def get_accounts(self) -> List[Dict]:
+        """Get the generated accounts"""
+        if not self.is_enabled():
+            return []
+        self._simulate_latency()
+        return [
+            {key: value for key, value in account.items() if key != 'cash'}
+            for account in self._get_book()['accounts']
+        ]
+
+    def get_positions(self, account_id: str) -> List[Dict]:
+        """Get the generated positions of one account"""
+        if not self.is_enabled():
+            return []
+        self._simulate_latency()
+        return list(self._get_book()['positions'].get(account_id, []))
+
+    def get_all_positions(self) -> Dict[str, List[Dict]]:
+        """Get all generated positions grouped by asset type"""
+        positions_by_type = {
+            'equity': [],
+            'option': [],
+            'collective_investment': [],
+            'fixed_income': [],
+            'other': [],
+            'cash': []
+        }
+        if not self.is_enabled():
+            return positions_by_type
+        self._simulate_latency()
+
+        book = self._get_book()
+        for account in book['accounts']:
+            for position in book['positions'][account['id']]:
+                positions_by_type[position.asset_type].append(position)
+
+            # Add cash position
+            positions_by_type['cash'].append({
+                'symbol': 'CASH',
+                'name': 'Cash',
+                'quantity': account['cash'],
+                'average_price': 1.0,
+                'current_price': 1.0,
+                'market_value': account['cash'],
+                'unrealized_pl': 0.0,
+                'unrealized_pl_percent': 0.0,
+                'accounts': [{
+                    'account_id': account['id'],
+                    'quantity': account['cash'],
+                    'average_price': 1.0,
+                    'market_value': account['cash'],
+                    'unrealized_pl': 0.0
+                }]
+            })
+
+        return positions_by_type
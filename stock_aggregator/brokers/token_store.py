@@ -0,0 +1,110 @@
+import fcntl
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Default location of the token file shared by all worker processes on a host
+DEFAULT_TOKEN_STORE_PATH = str(Path.home() / '.stock_aggregator' / 'tokens.json')
+
+
+class FileTokenStore:
+    """OAuth tokens shared across processes through a JSON file.
+
+    Each record holds ``access_token``, ``refresh_token``, ``expires_at``
+    (epoch seconds) and the ``seed_refresh_token`` it descends from. Reads
+    take a shared lock and refreshes take an exclusive lock on a sidecar
+    lock file, so only one process or thread refreshes a connection at a
+    time and the others wait and then reuse its result.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = os.path.expanduser(path or DEFAULT_TOKEN_STORE_PATH)
+        self.lock_path = self.path + '.lock'
+
+    def load(self, connection_id: str) -> Optional[Dict]:
+        """Get the stored token record for a connection."""
+        with self._locked(fcntl.LOCK_SH):
+            return self._read().get(connection_id)
+
+    def save(self, connection_id: str, record: Dict) -> None:
+        """Store a token record for a connection."""
+        with self._locked(fcntl.LOCK_EX):
+            tokens = self._read()
+            tokens[connection_id] = record
+            self._write(tokens)
+
+    def get_or_refresh(self, connection_id: str, refresh: Callable[[Optional[Dict]], Dict],
+                       margin: float = 0, seed_refresh_token: Optional[str] = None) -> Dict:
+        """Get a token record valid for at least ``margin`` seconds, refreshing it if needed.
+
+        Args:
+            connection_id: Broker connection the tokens belong to.
+            refresh: Called with the current record (or None) while holding the
+                exclusive lock; must return the new record.
+            margin: Seconds before expiry at which a token counts as stale.
+            seed_refresh_token: Refresh token from config.yml. A stored record
+                descended from a different seed is ignored, so pasting a new
+                token into config.yml takes effect.
+        """
+        record = self.load(connection_id)
+        if self._is_fresh(record, margin, seed_refresh_token):
+            return record
+
+        with self._locked(fcntl.LOCK_EX):
+            # Another process may have refreshed while we waited for the lock
+            tokens = self._read()
+            record = tokens.get(connection_id)
+            if self._is_fresh(record, margin, seed_refresh_token):
+                return record
+            if record is not None and seed_refresh_token and record.get('seed_refresh_token') != seed_refresh_token:
+                record = None
+
+            logger.info(f"Refreshing OAuth token for {connection_id}")
+            record = dict(refresh(record))
+            record.setdefault('seed_refresh_token', seed_refresh_token)
+            tokens[connection_id] = record
+            self._write(tokens)
+            return record
+
+    @staticmethod
+    def _is_fresh(record: Optional[Dict], margin: float, seed_refresh_token: Optional[str]) -> bool:
+        if not record or not record.get('access_token'):
+            return False
+        if seed_refresh_token and record.get('seed_refresh_token') != seed_refresh_token:
+            return False
+        return record.get('expires_at', 0) - margin > time.time()
+
+    @contextmanager
+    def _locked(self, operation):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, operation)
+            yield
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+
+    def _read(self) -> Dict:
+        try:
+            with open(self.path, 'r') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except ValueError as e:
+            logger.error(f"Ignoring unreadable token store {self.path}: {str(e)}")
+            return {}
+
+    def _write(self, tokens: Dict) -> None:
+        # Write to a temporary file and rename so readers never see a partial file
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'w') as f:
+            json.dump(tokens, f)
+        os.replace(tmp_path, self.path)
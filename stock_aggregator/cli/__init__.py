@@ -7,6 +7,7 @@ from urllib.parse import urlencode, unquote
 import json
 import base64
 import logging
+from ..brokers.http import build_session
 
 logger = logging.getLogger(__name__)
 
@@ -69,7 +70,7 @@ def get_schwab_token():
         }
         
         # Make token request
-        response = requests.post(token_url, data=data, headers=headers)
+        response = build_session().post(token_url, data=data, headers=headers)
         response.raise_for_status()
         tokens = response.json()
         
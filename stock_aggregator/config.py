@@ -1,9 +1,87 @@
+import logging
 import os
+import threading
+import time
 import yaml
 from pathlib import Path
 
+logger = logging.getLogger(__name__)
+
+# Minimum seconds between mtime checks of a loaded config file
+RELOAD_CHECK_INTERVAL = 1.0
+
+# Parsed config files shared by every Config instance in the process, keyed by path
+_parsed_configs = {}
+# Config paths found by the filesystem search, keyed by (STOCK_AGGREGATOR_CONFIG, cwd)
+_resolved_paths = {}
+_parsed_lock = threading.Lock()
+
+
+class _ParsedConfig:
+    """A parsed config file with broker indexes, re-parsed when its mtime changes."""
+    
+    def __init__(self, path):
+        self.path = path
+        self.mtime = None
+        self.data = {}
+        self.by_id = {}
+        self.by_type = {}
+        self.generation = 0
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self._load()
+    
+    def refresh(self):
+        """Re-parse the file if it changed, checking at most every RELOAD_CHECK_INTERVAL."""
+        now = time.monotonic()
+        if now - self._checked_at < RELOAD_CHECK_INTERVAL:
+            return
+        with self._lock:
+            if now - self._checked_at < RELOAD_CHECK_INTERVAL:
+                return
+            self._checked_at = now
+            try:
+                mtime = os.stat(self.path).st_mtime_ns
+            except OSError:
+                # Keep serving the last good config if the file disappears
+                return
+            if mtime != self.mtime:
+                try:
+                    self._load()
+                except ValueError as e:
+                    # Keep serving the last good config if an edit is half written
+                    logger.error(f"Keeping the previous configuration: {str(e)}")
+    
+    def _load(self):
+        mtime = os.stat(self.path).st_mtime_ns
+        try:
+            with open(self.path, 'r') as f:
+                data = yaml.safe_load(f) or {}
+            print(f"Loaded configuration from {self.path}")
+        except Exception as e:
+            raise ValueError(f"Error loading config from {self.path}: {str(e)}")
+        
+        by_id = {}
+        by_type = {}
+        for connection in data.get('brokers') or []:
+            if connection.get('id') is not None:
+                by_id.setdefault(connection['id'], connection)
+            by_type.setdefault(connection.get('type'), []).append(connection)
+        
+        # Swap in the new state together so readers never see a mix
+        self.data, self.by_id, self.by_type = data, by_id, by_type
+        self.mtime = mtime
+        self._checked_at = time.monotonic()
+        self.generation += 1
+
+
 class Config:
-    """Application configuration class"""
+    """Application configuration class
+    
+    The YAML file is parsed once per process and shared by every Config
+    instance. Broker connections are indexed by ID and type, and the file
+    is re-parsed when its modification time changes.
+    """
     
     def __init__(self, config_path=None):
         """
@@ -12,11 +90,16 @@ class Config:
         Args:
             config_path (str, optional): Custom path to the config file. Useful for testing.
         """
-        self.config = {}
-        
         # If a custom config path is provided, use it
         if config_path and os.path.exists(config_path):
-            self._load_config(config_path)
+            self._parsed = self._get_parsed(config_path)
+            return
+        
+        # Reuse the result of an earlier search from the same environment
+        search_key = (os.environ.get('STOCK_AGGREGATOR_CONFIG'), os.getcwd())
+        path = _resolved_paths.get(search_key)
+        if path and os.path.exists(path):
+            self._parsed = self._get_parsed(path)
             return
             
         # Check for config file in multiple locations
@@ -40,7 +123,8 @@ class Config:
         # Try each path until we find a valid config file
         for path in config_paths:
             if path and os.path.exists(path):
-                self._load_config(path)
+                self._parsed = self._get_parsed(path)
+                _resolved_paths[search_key] = path
                 return
                 
         # If we get here, no config file was found
@@ -49,6 +133,34 @@ class Config:
             "\n".join([p for p in config_paths if p])
         )
     
+    @staticmethod
+    def _get_parsed(config_path):
+        """Get the shared parsed config for a path, loading it on first use."""
+        path = os.path.abspath(config_path)
+        with _parsed_lock:
+            parsed = _parsed_configs.get(path)
+            if parsed is None:
+                parsed = _ParsedConfig(path)
+                _parsed_configs[path] = parsed
+        return parsed
+    
+    @property
+    def config(self):
+        """The parsed configuration, re-read if the file changed"""
+        self._parsed.refresh()
+        return self._parsed.data
+    
+    @property
+    def config_path(self):
+        """Path of the loaded config file"""
+        return self._parsed.path
+    
+    @property
+    def generation(self):
+        """Counter that increases each time the config file is re-parsed"""
+        self._parsed.refresh()
+        return self._parsed.generation
+    
     def _get_project_root_config_path(self):
         """Get the path to config.yml in the project root directory."""
         # Get the absolute path of the current file
@@ -60,29 +172,15 @@ class Config:
         # Construct the config file path
         return os.path.join(project_root, 'config.yml')
     
-    def _load_config(self, config_path):
-        """Load the configuration from the specified path."""
-        try:
-            with open(config_path, 'r') as f:
-                self.config = yaml.safe_load(f)
-            print(f"Loaded configuration from {config_path}")
-        except Exception as e:
-            raise ValueError(f"Error loading config from {config_path}: {str(e)}")
-    
     def get_broker_connections(self, broker_type):
         """Get all connections for a specific broker type"""
-        connections = []
-        for connection in self.config.get('brokers', []):
-            if connection.get('type') == broker_type:
-                connections.append(connection)
-        return connections
+        self._parsed.refresh()
+        return list(self._parsed.by_type.get(broker_type, []))
     
     def get_broker_connection(self, connection_id):
         """Get a specific broker connection by its ID"""
-        for connection in self.config.get('brokers', []):
-            if connection.get('id') == connection_id:
-                return connection
-        return None
+        self._parsed.refresh()
+        return self._parsed.by_id.get(connection_id)
     
     def is_broker_enabled(self, connection_id):
         """Check if a specific broker connection is enabled"""
@@ -131,6 +229,10 @@ class Config:
                     }
             return {}
 
+    def get_market_data_settings(self):
+        """Get market data cache settings from the market_data section"""
+        return self.config.get('market_data') or {}
+
     # Flask settings
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'dev-key-please-change-in-production'
     
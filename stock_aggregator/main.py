@@ -1,13 +1,50 @@
-from flask import Flask, render_template
+from flask import Flask, Response, g, redirect, render_template, request, url_for
+from markupsafe import Markup
 from .config import Config
 from datetime import datetime
+from . import metrics
+from .api import api, get_position_index, get_snapshot
 from .services.brokers_data import BrokersDataService
+from .services.cache import TTLCache
+from .services.position_index import DEFAULT_PAGE_SIZE
+from .services.snapshot import SnapshotScheduler
+from .services.stream import PriceStream
+import atexit
+import time
+
+# Rendered position tables kept per worker, overridable with fragment_cache_entries
+# in the app section of config.yml
+DEFAULT_FRAGMENT_CACHE_ENTRIES = 64
+
+# Position tables shown on the index page: asset type, title and table id
+POSITION_TABLES = (
+    ('equity', 'Equity Positions', 'equityPositionsTable'),
+    ('fixed_income', 'Fixed Income Positions', 'fixedIncomePositionsTable'),
+    ('option', 'Options Positions', 'optionsPositionsTable'),
+    ('collective_investment', 'Collective Investment Positions', 'collectivePositionsTable'),
+    ('other', 'Other Positions', 'otherPositionsTable')
+)
 
 app = Flask(__name__)
 app.config.from_object(Config)
 
 # Initialize services
 brokers_data = BrokersDataService()
+snapshots = SnapshotScheduler(brokers_data)
+price_stream = PriceStream(brokers_data.history)
+snapshots.add_listener(price_stream.publish)
+app.extensions['snapshots'] = snapshots
+app.extensions['price_stream'] = price_stream
+# End open event streams on shutdown instead of leaving them to their next heartbeat
+atexit.register(price_stream.close)
+app.register_blueprint(api)
+
+# Snapshots are immutable, so a table rendered for one stays valid until the next is published
+fragment_cache = TTLCache(
+    max_entries=(brokers_data.config.config.get('app') or {}).get('fragment_cache_entries',
+                                                                 DEFAULT_FRAGMENT_CACHE_ENTRIES),
+    ttl=None
+)
 
 # Custom filter for formatting dollar amounts
 @app.template_filter('formatDollar')
@@ -16,22 +53,95 @@ def format_dollar(value):
         return '$0.00'
     return '${:,.2f}'.format(float(value))
 
+# Custom filter for formatting a snapshot age in seconds
+@app.template_filter('formatAge')
+def format_age(seconds):
+    seconds = int(seconds or 0)
+    if seconds < 60:
+        return f'{seconds}s'
+    if seconds < 3600:
+        return f'{seconds // 60}m {seconds % 60}s'
+    return f'{seconds // 3600}h {seconds % 3600 // 60}m'
+
+@app.before_request
+def start_request_timing():
+    g.request_started = time.perf_counter()
+    metrics.start_request()
+
+@app.after_request
+def add_request_timing(response):
+    # Report this request's stage timings in a Server-Timing header
+    elapsed = time.perf_counter() - g.pop('request_started', time.perf_counter())
+    spans = metrics.finish_request() + [('total', elapsed)]
+    response.headers['Server-Timing'] = metrics.server_timing_header(spans)
+    endpoint = request.endpoint or 'unknown'
+    metrics.registry.observe('request', elapsed, endpoint=endpoint)
+    metrics.count('http_requests_total', endpoint=endpoint, status=response.status_code)
+    return response
+
+def render_position_tables(snapshot):
+    """Get the rendered first page of each asset type holding positions, reusing tables
+    already rendered for this snapshot version and page size"""
+    positions_by_type = snapshot.positions['positions_by_type']
+    page_size = (brokers_data.config.config.get('app') or {}).get('position_page_size', DEFAULT_PAGE_SIZE)
+    tables = []
+    for asset_type, title, table_id in POSITION_TABLES:
+        rows = positions_by_type.get(asset_type)
+        if not rows:
+            continue
+        key = (snapshot.epoch, snapshot.version, asset_type, page_size)
+        html = fragment_cache.get(key)
+        metrics.count('cache_requests_total', cache='fragments', tier='local',
+                      result='miss' if html is None else 'hit')
+        if html is None:
+            index = get_position_index(snapshot)
+            page = dict(index.query(asset_type=asset_type, page_size=page_size), sort='symbol', order='asc')
+            with metrics.timed('render_fragment', asset_type=asset_type):
+                html = Markup(render_template('_positions_table.html',
+                                              asset_type=asset_type,
+                                              title=title,
+                                              table_id=table_id,
+                                              page=page,
+                                              facets=index.facets(asset_type),
+                                              total=snapshot.positions['totals'][asset_type]))
+            fragment_cache.set(key, html)
+        tables.append(html)
+    return tables
+
 @app.route('/')
 def index():
-    # Get all data from brokers
-    positions_data = brokers_data.get_positions()
-    accounts = brokers_data.get_accounts()
+    # Render the latest background snapshot instead of calling brokers inline
+    with metrics.timed('snapshot_wait'):
+        snapshot = get_snapshot()
+    positions_data = snapshot.positions
+    accounts = snapshot.accounts
     
-    # Get last updated time
-    last_updated = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    # Get when the snapshot was built
+    last_updated = datetime.fromtimestamp(snapshot.created_at).strftime('%Y-%m-%d %H:%M:%S')
     
-    return render_template('index.html',
-                         positions=positions_data['positions_by_type'],
-                         totals=positions_data['totals'],
-                         total_market_value=positions_data['total_market_value'],
-                         total_unrealized_pl=positions_data['total_unrealized_pl'],
-                         accounts=accounts,
-                         last_updated=last_updated)
+    with metrics.timed('render'):
+        return render_template('index.html',
+                             position_tables=render_position_tables(snapshot),
+                             totals=positions_data['totals'],
+                             total_market_value=positions_data['total_market_value'],
+                             total_unrealized_pl=positions_data['total_unrealized_pl'],
+                             accounts=accounts,
+                             last_updated=last_updated,
+                             snapshot_age=snapshot.age_seconds(),
+                             snapshot_version=snapshot.version,
+                             snapshot_epoch=snapshot.epoch)
+
+@app.route('/refresh', methods=['POST'])
+def refresh():
+    # Rebuild the snapshot from fresh broker data before showing it
+    snapshots.start()
+    snapshots.refresh(invalidate=True)
+    return redirect(url_for('index'))
+
+@app.route('/metrics')
+def metrics_endpoint():
+    # Stage timings and counters of this worker process in the Prometheus text format
+    return Response(metrics.registry.render(), mimetype='text/plain; version=0.0.4')
 
 if __name__ == '__main__':
     app.run(debug=True) 
\ No newline at end of file
@@ -0,0 +1,177 @@
+"""Stage timings and counters, exposed in the Prometheus text format.
+
+Code wraps the stages worth watching in ``timed('stage')`` and counts
+events with ``count('name', label=value)``. Timings land in the
+``stock_aggregator_stage_seconds`` histogram by stage; an exception
+escaping a timed stage also counts in ``stock_aggregator_errors_total``.
+Spans recorded while serving a request are also collected per request so
+main.py can report them in a Server-Timing response header. Every worker
+process keeps its own registry.
+"""
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+import threading
+import time
+
+METRIC_PREFIX = 'stock_aggregator_'
+
+# Upper bounds in seconds of the stage timing histogram buckets
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+COUNTER_HELP = {
+    'outbound_calls_total': 'Requests sent to brokers and market data providers',
+    'cache_requests_total': 'Cache lookups by cache, tier and result',
+    'errors_total': 'Failed stages and outbound calls',
+    'http_requests_total': 'HTTP requests served by endpoint and status',
+    'stream_connections_total': 'Server-Sent Events streams opened'
+}
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+# Spans of the request being served on this thread, or None outside requests
+_request_spans: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar('request_spans', default=None)
+
+
+def _label_key(labels: Dict[str, object]) -> LabelKey:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _format_labels(key: LabelKey, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+    pairs = key + extra
+    if not pairs:
+        return ''
+    escaped = (
+        name + '="' + value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') + '"'
+        for name, value in pairs
+    )
+    return '{' + ','.join(escaped) + '}'
+
+
+def _format_value(value: float) -> str:
+    if value == int(value):
+        return str(int(value))
+    return repr(float(value))
+
+
+class MetricsRegistry:
+    """Thread-safe store of labelled counters and stage timing histograms"""
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._counters: Dict[str, Dict[LabelKey, float]] = {}
+        self._histograms: Dict[LabelKey, List] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name: str, amount: float = 1, **labels) -> None:
+        """Add amount to a counter"""
+        key = _label_key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + amount
+
+    def observe(self, stage: str, seconds: float, **labels) -> None:
+        """Record one timing of a stage"""
+        key = _label_key(dict(labels, stage=stage))
+        index = bisect_left(self.buckets, seconds)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                # Per-bucket counts (last is +Inf), then count and sum
+                histogram = self._histograms[key] = [[0] * (len(self.buckets) + 1), 0, 0.0]
+            histogram[0][index] += 1
+            histogram[1] += 1
+            histogram[2] += seconds
+
+    def get_counter(self, name: str, **labels) -> float:
+        """Current value of one counter series"""
+        with self._lock:
+            return self._counters.get(name, {}).get(_label_key(labels), 0)
+
+    def get_timing(self, stage: str, **labels) -> Tuple[int, float]:
+        """Number of timings and total seconds recorded for a stage"""
+        with self._lock:
+            histogram = self._histograms.get(_label_key(dict(labels, stage=stage)))
+            return (histogram[1], histogram[2]) if histogram else (0, 0.0)
+
+    def reset(self) -> None:
+        """Forget all recorded values"""
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def render(self) -> str:
+        """Get every metric in the Prometheus text exposition format"""
+        with self._lock:
+            counters = {name: dict(series) for name, series in self._counters.items()}
+            histograms = {key: (list(value[0]), value[1], value[2]) for key, value in self._histograms.items()}
+
+        lines = []
+        name = f'{METRIC_PREFIX}stage_seconds'
+        lines.append(f'# HELP {name} Time spent in each instrumented stage')
+        lines.append(f'# TYPE {name} histogram')
+        for key in sorted(histograms):
+            bucket_counts, count, total = histograms[key]
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), bucket_counts):
+                cumulative += bucket_count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append(f'{name}_bucket{_format_labels(key, (("le", le),))} {cumulative}')
+            lines.append(f'{name}_count{_format_labels(key)} {count}')
+            lines.append(f'{name}_sum{_format_labels(key)} {_format_value(total)}')
+
+        for counter in sorted(set(COUNTER_HELP) | set(counters)):
+            name = f'{METRIC_PREFIX}{counter}'
+            lines.append(f'# HELP {name} {COUNTER_HELP.get(counter, counter)}')
+            lines.append(f'# TYPE {name} counter')
+            for key, value in sorted(counters.get(counter, {}).items()):
+                lines.append(f'{name}{_format_labels(key)} {_format_value(value)}')
+
+        return '\n'.join(lines) + '\n'
+
+
+# Process-wide registry used by timed() and count()
+registry = MetricsRegistry()
+
+
+@contextmanager
+def timed(stage: str, **labels):
+    """Time the enclosed block as a stage, counting an error if it raises"""
+    started = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        registry.inc('errors_total', stage=stage)
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        registry.observe(stage, elapsed, **labels)
+        spans = _request_spans.get()
+        if spans is not None:
+            spans.append((stage, elapsed))
+
+
+def count(name: str, amount: float = 1, **labels) -> None:
+    """Add to a counter in the process-wide registry"""
+    registry.inc(name, amount, **labels)
+
+
+def start_request() -> None:
+    """Begin collecting spans for the request served by this thread"""
+    _request_spans.set([])
+
+
+def finish_request() -> List[Tuple[str, float]]:
+    """Stop collecting spans for this request and get them, summed by stage in first-seen order"""
+    spans = _request_spans.get() or []
+    _request_spans.set(None)
+    totals: Dict[str, float] = {}
+    for stage, elapsed in spans:
+        totals[stage] = totals.get(stage, 0.0) + elapsed
+    return list(totals.items())
+
+
+def server_timing_header(spans: List[Tuple[str, float]]) -> str:
+    """Format spans as a Server-Timing header value with durations in milliseconds"""
+    return ', '.join(f'{stage.replace(" ", "_")};dur={elapsed * 1000:.1f}' for stage, elapsed in spans)
@@ -0,0 +1,89 @@
+"""Compact, slotted records for positions.
+
+Raw and aggregated positions are held as instances with __slots__ instead
+of one dict per row, which keeps per-position memory small for large books
+and the snapshots that hold them. Each record is also a read-only Mapping,
+so code and templates written against position dicts (``position['symbol']``,
+``position.get('sector', '')``, ``position.total_quantity`` in Jinja) keep
+working. Records are not modified once built; use replace() for a changed copy.
+"""
+from collections.abc import Mapping
+from typing import Any, Dict, Tuple
+
+
+class Record(Mapping):
+    """Base for slotted records exposing their fields as a read-only mapping"""
+    __slots__ = ()
+    _fields: Tuple[str, ...] = ()
+    _defaults: Dict[str, Any] = {}
+
+    def __init__(self, **values):
+        for field in self._fields:
+            if field in values:
+                value = values.pop(field)
+            elif field in self._defaults:
+                value = self._defaults[field]
+            else:
+                raise TypeError(f"{type(self).__name__} missing field '{field}'")
+            object.__setattr__(self, field, value)
+        if values:
+            raise TypeError(f"{type(self).__name__} got unexpected fields: {', '.join(values)}")
+
+    def __getitem__(self, key: str) -> Any:
+        if key in self._fields:
+            return getattr(self, key)
+        raise KeyError(key)
+
+    def __iter__(self):
+        return iter(self._fields)
+
+    def __len__(self) -> int:
+        return len(self._fields)
+
+    def __contains__(self, key) -> bool:
+        return key in self._fields
+
+    def __repr__(self) -> str:
+        fields = ', '.join(f"{field}={getattr(self, field)!r}" for field in self._fields)
+        return f"{type(self).__name__}({fields})"
+
+    def replace(self, **changes) -> 'Record':
+        """Get a copy with some fields changed"""
+        values = {field: getattr(self, field) for field in self._fields}
+        values.update(changes)
+        return type(self)(**values)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Get a plain dict, converting nested records too"""
+        result = {}
+        for field in self._fields:
+            value = getattr(self, field)
+            if isinstance(value, (list, tuple)):
+                value = [item.to_dict() if isinstance(item, Record) else item for item in value]
+            elif isinstance(value, Record):
+                value = value.to_dict()
+            result[field] = value
+        return result
+
+
+class RawPosition(Record):
+    """One holding of one account as reported by a broker"""
+    __slots__ = ('symbol', 'name', 'quantity', 'average_price', 'current_price', 'market_value',
+                 'unrealized_pl', 'asset_type', 'connection_id', 'account_id', 'sector')
+    _fields = __slots__
+    _defaults = {'name': '', 'average_price': 0.0, 'current_price': 0.0, 'market_value': 0.0,
+                 'unrealized_pl': 0.0, 'asset_type': 'other', 'connection_id': None,
+                 'account_id': '', 'sector': ''}
+
+
+class AccountBreakdown(Record):
+    """One account's share of an aggregated position"""
+    __slots__ = ('account_id', 'quantity', 'average_price', 'market_value', 'total_cost', 'unrealized_pl')
+    _fields = __slots__
+
+
+class AggregatedPosition(Record):
+    """Holdings of one symbol across all accounts"""
+    __slots__ = ('symbol', 'name', 'sector', 'total_quantity', 'average_cost_basis', 'current_price',
+                 'total_market_value', 'total_unrealized_pl', 'unrealized_pl_percent', 'accounts')
+    _fields = __slots__
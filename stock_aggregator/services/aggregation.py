@@ -0,0 +1,331 @@
+from typing import Any, Dict, List, Optional
+import numpy as np
+from ..records import AccountBreakdown, AggregatedPosition
+
+# Books with at least this many positions of one type use the columnar engine
+COLUMNAR_THRESHOLD = 64
+
+# Asset type buckets of a portfolio, in display order
+ASSET_TYPES = ('equity', 'option', 'collective_investment', 'fixed_income', 'other', 'cash')
+
+
+def _use_columnar(count: int, engine: str) -> bool:
+    return engine == 'numpy' or (engine == 'auto' and count >= COLUMNAR_THRESHOLD)
+
+
+def _new_totals() -> Dict[str, float]:
+    return {'market_value': 0.0, 'unrealized_pl': 0.0}
+
+
+def aggregate_positions(positions: List[Dict], quotes: Dict[str, float], engine: str = 'auto') -> List[AggregatedPosition]:
+    """Aggregate raw positions of one asset type by symbol.
+
+    Args:
+        positions: Raw positions of a single asset type.
+        quotes: Current prices by symbol; a missing or non-positive quote
+            falls back to the first position's current_price.
+        engine: 'python', 'numpy', or 'auto' to pick numpy for books of at
+            least COLUMNAR_THRESHOLD positions.
+    """
+    if _use_columnar(len(positions), engine):
+        return aggregate_positions_columnar(positions, quotes)
+    return aggregate_positions_python(positions, quotes)
+
+
+def aggregate_portfolio(positions_by_type: Dict[str, List[Dict]], quotes: Dict[str, float],
+                        engine: str = 'auto') -> Dict[str, Any]:
+    """Aggregate a whole portfolio in one walk over its raw positions.
+
+    Each position is visited once: it is added to its symbol within its
+    asset type bucket and to that type's running market value and P/L, so
+    no aggregated list is walked again to build the totals. Cash positions
+    are passed through and only totaled.
+
+    Returns:
+        Dict with 'positions_by_type', 'totals' by asset type,
+        'total_market_value' and 'total_unrealized_pl'.
+    """
+    aggregated_positions = {}
+    totals = {}
+    for asset_type in ASSET_TYPES:
+        aggregated_positions[asset_type] = []
+        totals[asset_type] = _new_totals()
+
+    for asset_type, positions in positions_by_type.items():
+        type_totals = totals.setdefault(asset_type, _new_totals())
+        if asset_type == 'cash':
+            # Cash positions are already in the correct format and have no unrealized P/L
+            for position in positions:
+                type_totals['market_value'] += position['market_value']
+            aggregated_positions[asset_type] = positions
+        elif _use_columnar(len(positions), engine):
+            aggregated_positions[asset_type] = aggregate_positions_columnar(positions, quotes, type_totals)
+        else:
+            aggregated_positions[asset_type] = aggregate_positions_python(positions, quotes, type_totals)
+
+    return {
+        'positions_by_type': aggregated_positions,
+        'totals': totals,
+        'total_market_value': sum(type_totals['market_value'] for type_totals in totals.values()),
+        'total_unrealized_pl': sum(type_totals['unrealized_pl'] for type_totals in totals.values())
+    }
+
+
+def aggregate_positions_python(positions: List[Dict], quotes: Dict[str, float],
+                               totals: Optional[Dict[str, float]] = None) -> List[AggregatedPosition]:
+    """Aggregate positions by symbol one row at a time
+
+    Args:
+        totals: Running market value and unrealized P/L to add these positions to.
+    """
+    # Per symbol: first position, price, quantity, market value, cost, account rows
+    groups = {}
+    if totals is None:
+        totals = _new_totals()
+
+    for position in positions:
+        symbol = position['symbol']
+        group = groups.get(symbol)
+        if group is None:
+            current_price = quotes.get(symbol, 0.0)
+            if current_price <= 0:
+                current_price = position['current_price']
+            group = groups[symbol] = [position, current_price, 0.0, 0.0, 0.0, []]
+        current_price = group[1]
+
+        # Handle fixed income positions differently
+        if position.get('asset_type') == 'fixed_income':
+            # For fixed income, quantity is in face value (e.g., $1000 bonds)
+            # Market value is quantity * current price (as percentage of face value)
+            market_value = position['quantity'] * (current_price / 100.0)
+            # Cost basis is quantity * average price (as percentage of face value)
+            cost_basis = position['quantity'] * (position['average_price'] / 100.0)
+            unrealized_pl = market_value - cost_basis
+        else:
+            # For other asset types (equity, options, etc.)
+            market_value = position['quantity'] * current_price
+            unrealized_pl = market_value - (position['quantity'] * position['average_price'])
+
+        total_cost = position['quantity'] * position['average_price']
+        group[2] += position['quantity']
+        group[3] += market_value
+        group[4] += total_cost
+
+        # Running totals for the asset type
+        totals['market_value'] += market_value
+        totals['unrealized_pl'] += market_value - total_cost
+
+        # Add account details
+        group[5].append(AccountBreakdown(
+            account_id=position.get('account_id', ''),
+            quantity=position['quantity'],
+            average_price=position['average_price'],
+            market_value=market_value,
+            total_cost=total_cost,
+            unrealized_pl=unrealized_pl
+        ))
+
+    # Calculate final values for each aggregated position
+    aggregated = []
+    for symbol, (first, current_price, total_quantity, total_market_value, total_cost, accounts) in groups.items():
+        total_unrealized_pl = total_market_value - total_cost
+        aggregated.append(AggregatedPosition(
+            symbol=symbol,
+            name=first['name'],
+            sector=first.get('sector', ''),
+            total_quantity=total_quantity,
+            average_cost_basis=total_cost / total_quantity if total_quantity > 0 else 0.0,
+            current_price=current_price,
+            total_market_value=total_market_value,
+            total_unrealized_pl=total_unrealized_pl,
+            unrealized_pl_percent=(total_unrealized_pl / total_cost) * 100 if total_cost > 0 else 0.0,
+            accounts=tuple(accounts)
+        ))
+
+    return aggregated
+
+
+def aggregate_positions_columnar(positions: List[Dict], quotes: Dict[str, float],
+                                 totals: Optional[Dict[str, float]] = None) -> List[AggregatedPosition]:
+    """Aggregate positions by symbol with NumPy column arithmetic.
+
+    Quantities, average prices and prices are held as arrays and grouped
+    by a symbol code, so market value, cost and P/L for every row and every
+    symbol come from a handful of vectorized operations. The output matches
+    aggregate_positions_python, including symbol order (first appearance).
+
+    Args:
+        totals: Running market value and unrealized P/L to add these positions to.
+    """
+    if not positions:
+        return []
+
+    symbols = [position['symbol'] for position in positions]
+    quantity = np.fromiter((position['quantity'] for position in positions), dtype=np.float64, count=len(positions))
+    average_price = np.fromiter((position['average_price'] for position in positions), dtype=np.float64, count=len(positions))
+    # Fixed income quantities are face value and prices are percent of par
+    scale = np.fromiter((0.01 if position.get('asset_type') == 'fixed_income' else 1.0 for position in positions),
+                        dtype=np.float64, count=len(positions))
+
+    # Group codes numbered in order of first appearance
+    code_by_symbol = {}
+    codes = np.fromiter((code_by_symbol.setdefault(symbol, len(code_by_symbol)) for symbol in symbols),
+                        dtype=np.intp, count=len(symbols))
+    group_count = len(code_by_symbol)
+    first_index = np.full(group_count, len(symbols), dtype=np.intp)
+    np.minimum.at(first_index, codes, np.arange(len(symbols)))
+
+    # Price per symbol: the quote, else the first position's own price
+    group_price = np.empty(group_count, dtype=np.float64)
+    for code, row in enumerate(first_index.tolist()):
+        price = quotes.get(symbols[row], 0.0)
+        group_price[code] = price if price > 0 else positions[row]['current_price']
+
+    row_price = group_price[codes]
+    market_value = quantity * row_price * scale
+    total_cost = quantity * average_price
+    unrealized_pl = market_value - total_cost * scale
+
+    group_quantity = np.bincount(codes, weights=quantity, minlength=group_count)
+    group_market_value = np.bincount(codes, weights=market_value, minlength=group_count)
+    group_cost = np.bincount(codes, weights=total_cost, minlength=group_count)
+    group_pl = group_market_value - group_cost
+    if totals is not None:
+        market_value_sum = float(market_value.sum())
+        totals['market_value'] += market_value_sum
+        totals['unrealized_pl'] += market_value_sum - float(total_cost.sum())
+    with np.errstate(divide='ignore', invalid='ignore'):
+        average_cost_basis = np.where(group_quantity > 0, group_cost / group_quantity, 0.0)
+        pl_percent = np.where(group_cost > 0, group_pl / group_cost * 100, 0.0)
+
+    # Convert back to Python floats once per column rather than once per cell
+    accounts_by_code = [[] for _ in range(group_count)]
+    for position, code, row_market_value, row_cost, row_pl in zip(positions, codes.tolist(), market_value.tolist(),
+                                                                  total_cost.tolist(), unrealized_pl.tolist()):
+        accounts_by_code[code].append(AccountBreakdown(
+            account_id=position.get('account_id', ''),
+            quantity=position['quantity'],
+            average_price=position['average_price'],
+            market_value=row_market_value,
+            total_cost=row_cost,
+            unrealized_pl=row_pl
+        ))
+
+    aggregated = []
+    for row, accounts, quantity_sum, cost_basis, price, value, pl, percent in zip(
+            first_index.tolist(), accounts_by_code, group_quantity.tolist(), average_cost_basis.tolist(),
+            group_price.tolist(), group_market_value.tolist(), group_pl.tolist(), pl_percent.tolist()):
+        first = positions[row]
+        aggregated.append(AggregatedPosition(
+            symbol=symbols[row],
+            name=first['name'],
+            sector=first.get('sector', ''),
+            total_quantity=quantity_sum,
+            average_cost_basis=cost_basis,
+            current_price=price,
+            total_market_value=value,
+            total_unrealized_pl=pl,
+            unrealized_pl_percent=percent,
+            accounts=tuple(accounts)
+        ))
+
+    return aggregated
+
+
+def index_positions(positions_by_type: Dict[str, List[Dict]]) -> Dict[tuple, List[Dict]]:
+    """Group raw positions by (asset type, symbol) for revaluation"""
+    index = {}
+    for asset_type, positions in positions_by_type.items():
+        if asset_type == 'cash':
+            continue
+        for position in positions:
+            index.setdefault((asset_type, position['symbol']), []).append(position)
+    return index
+
+
+def revalue_portfolio(summary: Dict[str, Any], position_index: Dict[tuple, List[Dict]],
+                      quotes: Dict[str, float]) -> Dict[str, Any]:
+    """Apply new prices to an aggregated portfolio without re-aggregating it.
+
+    Only symbols whose quote moved are recomputed: their current price,
+    market value, unrealized P/L (overall and per account) and P/L %, with
+    the type and grand totals adjusted by the difference. Quantities and
+    cost basis are unchanged. The input summary is not modified; unchanged
+    positions are shared with the returned summary.
+
+    Args:
+        summary: Result of aggregate_portfolio.
+        position_index: index_positions() of the raw positions behind summary.
+        quotes: New prices by symbol; missing or non-positive quotes keep
+            the current price.
+
+    Returns:
+        New summary with the same structure, plus 'repriced' listing the
+        symbols whose price changed.
+    """
+    positions_by_type = dict(summary['positions_by_type'])
+    totals = {asset_type: dict(type_totals) for asset_type, type_totals in summary['totals'].items()}
+    total_market_value = summary['total_market_value']
+    total_unrealized_pl = summary['total_unrealized_pl']
+    repriced = []
+
+    for asset_type, aggregated in summary['positions_by_type'].items():
+        if asset_type == 'cash':
+            continue
+        revalued = None
+        for i, agg in enumerate(aggregated):
+            price = quotes.get(agg['symbol'], 0.0)
+            if price <= 0 or price == agg['current_price']:
+                continue
+
+            accounts = []
+            market_value_sum = 0.0
+            total_cost = 0.0
+            for position in position_index.get((asset_type, agg['symbol']), []):
+                if position.get('asset_type') == 'fixed_income':
+                    market_value = position['quantity'] * (price / 100.0)
+                    unrealized_pl = market_value - position['quantity'] * (position['average_price'] / 100.0)
+                else:
+                    market_value = position['quantity'] * price
+                    unrealized_pl = market_value - (position['quantity'] * position['average_price'])
+                market_value_sum += market_value
+                total_cost += position['quantity'] * position['average_price']
+                accounts.append(AccountBreakdown(
+                    account_id=position.get('account_id', ''),
+                    quantity=position['quantity'],
+                    average_price=position['average_price'],
+                    market_value=market_value,
+                    total_cost=position['quantity'] * position['average_price'],
+                    unrealized_pl=unrealized_pl
+                ))
+
+            total_pl = market_value_sum - total_cost
+            if revalued is None:
+                revalued = list(aggregated)
+            revalued[i] = agg.replace(
+                current_price=price,
+                total_market_value=market_value_sum,
+                total_unrealized_pl=total_pl,
+                unrealized_pl_percent=(total_pl / total_cost) * 100 if total_cost > 0 else 0.0,
+                accounts=tuple(accounts)
+            )
+
+            market_value_change = market_value_sum - agg['total_market_value']
+            pl_change = total_pl - agg['total_unrealized_pl']
+            totals[asset_type]['market_value'] += market_value_change
+            totals[asset_type]['unrealized_pl'] += pl_change
+            total_market_value += market_value_change
+            total_unrealized_pl += pl_change
+            repriced.append(agg['symbol'])
+
+        if revalued is not None:
+            positions_by_type[asset_type] = revalued
+
+    return dict(
+        summary,
+        positions_by_type=positions_by_type,
+        totals=totals,
+        total_market_value=total_market_value,
+        total_unrealized_pl=total_unrealized_pl,
+        repriced=repriced
+    )
@@ -1,21 +1,97 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from ..config import Config
-from ..brokers.schwab import SchwabBroker
+from ..brokers.base import SyncBrokerAdapter
+from ..brokers.schwab import HTTPX_AVAILABLE, AsyncSchwabBroker, SchwabBroker
 from ..brokers.merrill import MerrillBroker
-from ..services.market_data import MarketDataService
+from ..brokers.synthetic import SyntheticBroker
+from ..services.aggregation import aggregate_portfolio, aggregate_positions, index_positions, revalue_portfolio
+from ..services.changes import DEFAULT_HISTORY_VERSIONS, ChangeHistory
+from ..services.market_data import MarketDataService, set_offline
+from ..services.cache import configure_negative_cache, configure_remote_cache, configure_shared_cache
+from ..metrics import count, timed
+import asyncio
 import logging
+import threading
+import time
 
 logger = logging.getLogger(__name__)
 
+# Broker classes by the type field of a connection in config.yml
+BROKER_TYPES = {
+    'schwab': SchwabBroker,
+    'merrill': MerrillBroker,
+    'synthetic': SyntheticBroker
+}
+
+# Native async implementations by connection type; other brokers run through SyncBrokerAdapter
+ASYNC_BROKER_TYPES = {}
+if HTTPX_AVAILABLE:
+    ASYNC_BROKER_TYPES['schwab'] = AsyncSchwabBroker
+
+# Defaults for the concurrent broker fan-out, overridable in the app section of config.yml
+DEFAULT_BROKER_WORKERS = 8
+DEFAULT_BROKER_TIMEOUT = 20.0
+
 class BrokersDataService:
     def __init__(self):
         self.config = Config()
         self.brokers = {}
+        self._async_brokers = {}
+        self._loop = None
+        self._configure_caches()
         self.market_data = MarketDataService()
         self._initialize_brokers()
+        
+        app_settings = self.config.config.get('app') or {}
+        self._executor = ThreadPoolExecutor(
+            max_workers=app_settings.get('broker_workers', DEFAULT_BROKER_WORKERS),
+            thread_name_prefix='broker'
+        )
+        self._default_timeout = float(app_settings.get('broker_timeout_seconds', DEFAULT_BROKER_TIMEOUT))
+        self._in_flight = {}
+        self._last_good = {}
+        self._connection_status = {}
+        self._fan_out_lock = threading.Lock()
+        self._book = None
+        self.history = ChangeHistory(app_settings.get('change_history_versions', DEFAULT_HISTORY_VERSIONS))
+        
+        # Event loop for the async pipeline (self._loop), started on first use
+        self._loop_thread = None
+        self._async_in_flight = {}
+    
+    def _configure_caches(self):
+        """Apply configured limits to the process-wide market data caches"""
+        settings = self.config.get_market_data_settings()
+        configure_shared_cache('quotes',
+                               max_entries=settings.get('cache_max_entries'),
+                               ttl=settings.get('cache_ttl_seconds'))
+        configure_shared_cache('prices', ttl=settings.get('price_cache_ttl_seconds'))
+        configure_shared_cache('option_chains',
+                               max_entries=settings.get('chain_cache_max_entries'),
+                               ttl=settings.get('chain_cache_ttl_seconds'))
+        configure_negative_cache(base_ttl=settings.get('negative_ttl_seconds'),
+                                 max_ttl=settings.get('negative_max_ttl_seconds'))
+        set_offline(settings.get('offline', False))
+        
+        # Optional Redis tier shared by all worker processes
+        if settings.get('redis_enabled', False):
+            redis_settings = self.config.config.get('redis') or {}
+            configure_remote_cache(url=redis_settings.get('url'),
+                                   host=self.config.REDIS_HOST,
+                                   port=self.config.REDIS_PORT,
+                                   db=self.config.REDIS_DB,
+                                   ttl=settings.get('redis_ttl_seconds', 300))
     
     def _initialize_brokers(self):
-        """Initialize broker instances for all enabled connections"""
+        """Create broker instances for enabled connections and drop removed ones
+        
+        Existing broker instances are kept so their tokens and sessions
+        survive a config reload; they re-read their own settings.
+        """
+        self._config_generation = self.config.generation
+        brokers = {}
+        
         # Get all broker connections
         brokers_config = self.config.config.get('brokers', [])
         
@@ -26,101 +102,284 @@ class BrokersDataService:
             
             if not enabled:
                 continue
-                
-            if broker_type == 'schwab':
-                broker = SchwabBroker(connection_id)
-                if broker.is_enabled():
-                    self.brokers[connection_id] = broker
-            elif broker_type == 'merrill':
-                broker = MerrillBroker(connection_id)
-                if broker.is_enabled():
-                    self.brokers[connection_id] = broker
+            
+            broker_class = BROKER_TYPES.get(broker_type)
+            if broker_class is None:
+                continue
+            
+            broker = self.brokers.get(connection_id)
+            if not isinstance(broker, broker_class):
+                broker = broker_class(connection_id)
+            if broker.is_enabled():
+                brokers[connection_id] = broker
+        
+        # Dropped or replaced connections must not keep refreshing tokens in the background
+        for connection_id, broker in self.brokers.items():
+            if brokers.get(connection_id) is not broker:
+                broker.close()
+        self.brokers = brokers
+        self._discard_async_brokers()
+    
+    def _discard_async_brokers(self):
+        """Drop and close async interfaces whose connection was removed or rebuilt"""
+        for connection_id, async_broker in list(self._async_brokers.items()):
+            if self.brokers.get(connection_id) is async_broker.broker:
+                continue
+            del self._async_brokers[connection_id]
+            # Scheduled, not awaited: reloads also run on the loop thread itself
+            if self._loop is not None:
+                asyncio.run_coroutine_threadsafe(async_broker.aclose(), self._loop)
+    
+    def _sync_with_config(self):
+        """Apply config.yml changes made since the brokers were created"""
+        if self.config.generation == self._config_generation:
+            return
+        with self._fan_out_lock:
+            if self.config.generation != self._config_generation:
+                logger.info("Configuration changed, reloading broker connections")
+                self._configure_caches()
+                self._initialize_brokers()
+    
+    def _get_connection_timeout(self, connection_id: str) -> float:
+        """Get the deadline in seconds for one call to a broker connection"""
+        connection = self.config.get_broker_connection(connection_id) or {}
+        return float(connection.get('timeout_seconds', self._default_timeout))
+    
+    def _call_broker(self, connection_id: str, method_name: str):
+        """Run a broker method on the worker pool and record its latency"""
+        broker = self.brokers[connection_id]
+        started = time.monotonic()
+        with timed('broker_call', connection=connection_id, method=method_name):
+            result = getattr(broker, method_name)()
+        latency_ms = (time.monotonic() - started) * 1000
+        with self._fan_out_lock:
+            self._last_good[(method_name, connection_id)] = result
+        logger.debug(f"{connection_id}.{method_name} took {latency_ms:.0f} ms")
+        return result, latency_ms
+    
+    def _fan_out(self, method_name: str) -> Dict[str, Any]:
+        """Call a broker method on every connection concurrently.
+        
+        Each connection gets its own deadline measured from the start of the
+        fan-out. A connection that misses its deadline or raises is answered
+        with its last good result, which is marked stale in the connection
+        status. A call that is still running from an earlier fan-out is
+        awaited rather than started again, so slow brokers cannot fill the
+        worker pool; when it finishes its result becomes the last good one.
+        
+        Returns:
+            Dict mapping connection ID to the result, for connections that
+            returned in time or have a previous result.
+        """
+        self._sync_with_config()
+        started = time.monotonic()
+        futures = {}
+        with self._fan_out_lock:
+            for connection_id in self.brokers:
+                key = (method_name, connection_id)
+                future = self._in_flight.get(key)
+                if future is None or future.done():
+                    future = self._executor.submit(self._call_broker, connection_id, method_name)
+                    self._in_flight[key] = future
+                futures[connection_id] = future
+        
+        results = {}
+        for connection_id, future in futures.items():
+            timeout = self._get_connection_timeout(connection_id)
+            try:
+                outcome = future.result(timeout=max(0.0, started + timeout - time.monotonic()))
+            except Exception as e:
+                outcome = e
+            self._settle(method_name, connection_id, outcome, timeout, started, results)
+        
+        return results
+    
+    def _settle(self, method_name: str, connection_id: str, outcome, timeout: float, started: float,
+                results: Dict[str, Any]) -> None:
+        """Record one connection's fan-out outcome and add its (possibly stale) result"""
+        key = (method_name, connection_id)
+        status = {'latency_ms': None, 'stale': False, 'error': None}
+        if isinstance(outcome, BaseException):
+            if isinstance(outcome, (FutureTimeoutError, asyncio.TimeoutError)):
+                status['error'] = f"timed out after {timeout:.1f}s"
+                count('errors_total', stage='broker_deadline')
+                status['latency_ms'] = (time.monotonic() - started) * 1000
+            else:
+                status['error'] = str(outcome)
+            logger.error(f"Error calling {method_name} on {connection_id}: {status['error']}")
+            with self._fan_out_lock:
+                last_good = self._last_good.get(key)
+            if last_good is not None:
+                results[connection_id] = last_good
+                status['stale'] = True
+        else:
+            results[connection_id], status['latency_ms'] = outcome
+        
+        with self._fan_out_lock:
+            self._connection_status.setdefault(connection_id, {})[method_name] = status
+    
+    def _get_event_loop(self) -> asyncio.AbstractEventLoop:
+        """Get the event loop serving the async pipeline, starting its thread if needed"""
+        with self._fan_out_lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._loop_thread = threading.Thread(target=self._loop.run_forever,
+                                                     name='broker-event-loop', daemon=True)
+                self._loop_thread.start()
+            return self._loop
+    
+    def _run_async(self, coroutine):
+        """Run a coroutine on the pipeline's event loop and wait for its result"""
+        return asyncio.run_coroutine_threadsafe(coroutine, self._get_event_loop()).result()
+    
+    def _use_async(self) -> bool:
+        return bool((self.config.config.get('app') or {}).get('async_brokers', False))
+    
+    def _get_async_broker(self, connection_id: str):
+        """Get the async interface for a connection's broker"""
+        broker = self.brokers[connection_id]
+        async_broker = self._async_brokers.get(connection_id)
+        if async_broker is None or async_broker.broker is not broker:
+            connection = self.config.get_broker_connection(connection_id) or {}
+            async_class = ASYNC_BROKER_TYPES.get(connection.get('type'))
+            broker_class = BROKER_TYPES.get(connection.get('type'))
+            if async_class is not None and broker_class is not None and isinstance(broker, broker_class):
+                async_broker = async_class(broker)
+            else:
+                async_broker = SyncBrokerAdapter(broker, self._executor)
+            self._async_brokers[connection_id] = async_broker
+        return async_broker
+    
+    async def _call_broker_async(self, connection_id: str, method_name: str):
+        """Await a broker method on the event loop and record its latency"""
+        async_broker = self._get_async_broker(connection_id)
+        started = time.monotonic()
+        with timed('broker_call', connection=connection_id, method=method_name):
+            result = await getattr(async_broker, method_name)()
+        latency_ms = (time.monotonic() - started) * 1000
+        with self._fan_out_lock:
+            self._last_good[(method_name, connection_id)] = result
+        logger.debug(f"{connection_id}.{method_name} took {latency_ms:.0f} ms")
+        return result, latency_ms
+    
+    async def _fan_out_async(self, method_name: str) -> Dict[str, Any]:
+        """Async variant of _fan_out: every connection is awaited on one event loop.
+        
+        Deadlines, in-flight reuse and stale fallbacks behave as in _fan_out,
+        but connections with a native async broker use no worker thread.
+        """
+        self._sync_with_config()
+        started = time.monotonic()
+        tasks = {}
+        for connection_id in list(self.brokers):
+            key = (method_name, connection_id)
+            task = self._async_in_flight.get(key)
+            if task is None or task.done():
+                task = asyncio.ensure_future(self._call_broker_async(connection_id, method_name))
+                self._async_in_flight[key] = task
+            tasks[connection_id] = task
+        
+        timeouts = {connection_id: self._get_connection_timeout(connection_id) for connection_id in tasks}
+        outcomes = await asyncio.gather(
+            *(asyncio.wait_for(asyncio.shield(task), max(0.0, started + timeouts[connection_id] - time.monotonic()))
+              for connection_id, task in tasks.items()),
+            return_exceptions=True
+        )
+        
+        results = {}
+        for connection_id, outcome in zip(tasks, outcomes):
+            self._settle(method_name, connection_id, outcome, timeouts[connection_id], started, results)
+        return results
+    
+    def close(self) -> None:
+        """Stop every broker connection, the event loop and the worker pool"""
+        for broker in list(self.brokers.values()):
+            broker.close()
+        loop = self._loop
+        if loop is not None:
+            async def close_brokers():
+                pending = [task for task in self._async_in_flight.values() if not task.done()]
+                for task in pending:
+                    task.cancel()
+                await asyncio.gather(*pending, return_exceptions=True)
+                for async_broker in list(self._async_brokers.values()):
+                    await async_broker.aclose()
+            asyncio.run_coroutine_threadsafe(close_brokers(), loop).result()
+            loop.call_soon_threadsafe(loop.stop)
+            self._loop_thread.join()
+            loop.close()
+            self._loop = None
+        self._executor.shutdown(wait=False)
+    
+    def get_connection_status(self) -> Dict[str, Dict[str, Dict]]:
+        """Get latency, staleness and last error per connection and broker method"""
+        with self._fan_out_lock:
+            return {
+                connection_id: {method_name: dict(status) for method_name, status in methods.items()}
+                for connection_id, methods in self._connection_status.items()
+            }
     
     def get_accounts(self) -> List[Dict]:
         """Get all accounts from all enabled broker connections"""
+        if self._use_async():
+            return self._run_async(self.get_accounts_async())
+        return self._combine_accounts(self._fan_out('get_accounts'))
+    
+    async def get_accounts_async(self) -> List[Dict]:
+        """Get all accounts, awaiting every connection on the running event loop"""
+        return self._combine_accounts(await self._fan_out_async('get_accounts'))
+    
+    def _combine_accounts(self, results: Dict[str, List[Dict]]) -> List[Dict]:
+        """Flatten accounts by connection, marking those served from stale data"""
         all_accounts = []
         
-        for connection_id, broker in self.brokers.items():
-            try:
-                accounts = broker.get_accounts()
-                all_accounts.extend(accounts)
-            except Exception as e:
-                logger.error(f"Error getting accounts from {connection_id}: {str(e)}")
+        for connection_id, accounts in results.items():
+            if self._connection_status[connection_id]['get_accounts']['stale']:
+                accounts = [dict(account, stale=True) for account in accounts]
+            all_accounts.extend(accounts)
         
         return all_accounts
     
-    def _aggregate_positions(self, positions: List[Dict]) -> List[Dict]:
-        """Aggregate positions by symbol"""
-        aggregated = {}
-        
-        for position in positions:
-            symbol = position['symbol']
-            if symbol not in aggregated:
-                current_price = self.market_data.get_current_price(symbol)
-                if current_price <= 0:
-                    current_price = position['current_price']
-                aggregated[symbol] = {
-                    'symbol': symbol,
-                    'name': position['name'],
-                    'sector': position.get('sector', ''),
-                    'total_quantity': 0.0,
-                    'average_cost_basis': 0.0,
-                    'current_price': current_price,
-                    'total_market_value': 0.0,
-                    'total_unrealized_pl': 0.0,
-                    'unrealized_pl_percent': 0.0,
-                    'accounts': []
-                }
-            
-            # Update aggregated position
-            agg = aggregated[symbol]
-            # Try to get current price from market data
-            current_price = agg['current_price']
-            
-            # Handle fixed income positions differently
-            if position.get('asset_type') == 'fixed_income':
-                # For fixed income, quantity is in face value (e.g., $1000 bonds)
-                # Market value is quantity * current price (as percentage of face value)
-                market_value = position['quantity'] * (current_price / 100.0)
-                # Cost basis is quantity * average price (as percentage of face value)
-                cost_basis = position['quantity'] * (position['average_price'] / 100.0)
-                unrealized_pl = market_value - cost_basis
-            else:
-                # For other asset types (equity, options, etc.)
-                market_value = position['quantity'] * current_price
-                unrealized_pl = market_value - (position['quantity'] * position['average_price'])
-            
-            agg['current_price'] = current_price
-            agg['total_quantity'] += position['quantity']
-            agg['total_market_value'] += market_value
+    def _aggregate_positions(self, positions: List[Dict], quotes: Optional[Dict[str, float]] = None) -> List[Dict]:
+        """Aggregate positions by symbol
 
-            # Add account details
-            agg['accounts'].append({
-                'account_id': position.get('account_id', ''),
-                'quantity': position['quantity'],
-                'average_price': position['average_price'],
-                'market_value': market_value,
-                'total_cost': position['quantity'] * position['average_price'],
-                'unrealized_pl': unrealized_pl,
-            })
-        
-        # Calculate final values for each aggregated position
-        for agg in aggregated.values():
-            # Calculate total cost basis
-            total_cost = sum(acc['total_cost'] for acc in agg['accounts'])
-            agg['average_cost_basis'] = total_cost / agg['total_quantity'] if agg['total_quantity'] > 0 else 0
-            
-            # Calculate total unrealized PL
-            agg['total_unrealized_pl'] = agg['total_market_value'] - total_cost
-            
-            # Calculate unrealized PL percentage
-            if total_cost > 0:
-                agg['unrealized_pl_percent'] = (agg['total_unrealized_pl'] / total_cost) * 100
-        
-        return list(aggregated.values())
+        Args:
+            positions: Raw positions of a single asset type.
+            quotes: Prefetched prices by symbol. When omitted, prices for all
+                symbols in ``positions`` are fetched in one batch.
+        """
+        if quotes is None:
+            quotes = self.market_data.get_quotes(position['symbol'] for position in positions)
+        engine = (self.config.config.get('app') or {}).get('aggregation_engine', 'auto')
+        return aggregate_positions(positions, quotes, engine)
     
     def get_positions(self) -> Dict[str, Any]:
         """Get combined positions from all enabled broker connections"""
+        if self._use_async():
+            return self._run_async(self.get_positions_async())
+        
+        # Get positions from all brokers concurrently
+        positions_by_type, stale_connections = self._collect_positions(self._fan_out('get_all_positions'))
+        
+        # Fetch prices for every held symbol in one batch
+        with timed('quotes'):
+            quotes = self.market_data.get_quotes(self._held_symbols(positions_by_type))
+        
+        return self._summarize_positions(positions_by_type, quotes, stale_connections)
+    
+    async def get_positions_async(self) -> Dict[str, Any]:
+        """Get combined positions, gathering connections and quote batches on the running event loop"""
+        positions_by_type, stale_connections = self._collect_positions(await self._fan_out_async('get_all_positions'))
+        with timed('quotes'):
+            quotes = await self.market_data.get_quotes_async(self._held_symbols(positions_by_type))
+        return self._summarize_positions(positions_by_type, quotes, stale_connections)
+    
+    def _collect_positions(self, results: Dict[str, Dict[str, List[Dict]]]):
+        """Merge positions by type across connections
+        
+        Returns:
+            Raw positions by asset type, and the connections served from stale data.
+        """
         positions_by_type = {
             'equity': [],
             'option': [],
@@ -130,63 +389,86 @@ class BrokersDataService:
             'cash': []
         }
         
-        totals = {
-            'equity': {'market_value': 0.0, 'unrealized_pl': 0.0},
-            'option': {'market_value': 0.0, 'unrealized_pl': 0.0},
-            'collective_investment': {'market_value': 0.0, 'unrealized_pl': 0.0},
-            'fixed_income': {'market_value': 0.0, 'unrealized_pl': 0.0},
-            'other': {'market_value': 0.0, 'unrealized_pl': 0.0},
-            'cash': {'market_value': 0.0, 'unrealized_pl': 0.0}
-        }
+        stale_connections = []
+        for connection_id, broker_positions in results.items():
+            if self._connection_status[connection_id]['get_all_positions']['stale']:
+                stale_connections.append(connection_id)
+            
+            # Combine positions by type
+            for asset_type, positions in broker_positions.items():
+                positions_by_type[asset_type].extend(positions)
         
-        total_market_value = 0.0
-        total_unrealized_pl = 0.0
+        return positions_by_type, stale_connections
+    
+    def _held_symbols(self, positions_by_type: Dict[str, List[Dict]]) -> List[str]:
+        """Get the symbols that need a price, in position order"""
+        return [
+            position['symbol']
+            for asset_type, positions in positions_by_type.items()
+            if asset_type != 'cash'
+            for position in positions
+        ]
+    
+    def _summarize_positions(self, positions_by_type: Dict[str, List[Dict]], quotes: Dict[str, float],
+                             stale_connections: List[str]) -> Dict[str, Any]:
+        """Aggregate raw positions by symbol and compute totals in one pass"""
+        engine = (self.config.config.get('app') or {}).get('aggregation_engine', 'auto')
+        with timed('aggregation'):
+            summary = aggregate_portfolio(positions_by_type, quotes, engine)
+        summary['stale_connections'] = stale_connections
+        summary['version'] = self.history.record(summary['positions_by_type'])
         
-        for connection_id, broker in self.brokers.items():
-            try:
-                # Get positions from this broker
-                broker_positions = broker.get_all_positions()
-                
-                # Combine positions by type
-                for asset_type, positions in broker_positions.items():
-                    positions_by_type[asset_type].extend(positions)
-            except Exception as e:
-                logger.error(f"Error getting positions from {connection_id}: {str(e)}")
-        
-        # Aggregate positions by symbol for each type
-        aggregated_positions = {
-            'equity': self._aggregate_positions(positions_by_type['equity']),
-            'option': self._aggregate_positions(positions_by_type['option']),
-            'collective_investment': self._aggregate_positions(positions_by_type['collective_investment']),
-            'fixed_income': self._aggregate_positions(positions_by_type['fixed_income']),
-            'other': self._aggregate_positions(positions_by_type['other']),
-            'cash': positions_by_type['cash']  # Cash positions are already in the correct format
-        }
+        # Keep the book so price updates can revalue it without a broker sync
+        with self._fan_out_lock:
+            self._book = {
+                'summary': summary,
+                'index': index_positions(positions_by_type)
+            }
+        return summary
+    
+    def revalue_positions(self) -> Dict[str, Any]:
+        """Reprice the last synced positions with fresh quotes, without calling brokers.
         
-        # Recalculate totals based on aggregated positions
-        for asset_type, positions in aggregated_positions.items():
-            if asset_type == 'cash':
-                # For cash, sum the market values directly
-                totals[asset_type]['market_value'] = sum(pos['market_value'] for pos in positions)
-                totals[asset_type]['unrealized_pl'] = 0.0  # Cash has no unrealized P/L
-            else:
-                totals[asset_type]['market_value'] = sum(pos['total_market_value'] for pos in positions)
-                totals[asset_type]['unrealized_pl'] = sum(pos['total_unrealized_pl'] for pos in positions)
-            
-            total_market_value += totals[asset_type]['market_value']
-            total_unrealized_pl += totals[asset_type]['unrealized_pl']
+        Holdings come from the last get_positions() call; only symbols whose
+        price moved are recomputed. Quotes another worker downloaded within
+        price_cache_ttl_seconds are reused through the Redis tier. Falls back to a full get_positions() when
+        nothing has been synced yet.
         
-        return {
-            'positions_by_type': aggregated_positions,
-            'totals': totals,
-            'total_market_value': total_market_value,
-            'total_unrealized_pl': total_unrealized_pl
-        }
+        Returns:
+            Same structure as get_positions(), plus 'repriced' symbols. When no
+            price moved, the last summary is returned unchanged under its
+            version with an empty 'repriced'.
+        """
+        with self._fan_out_lock:
+            book = self._book
+        if book is None:
+            return self.get_positions()
+        
+        symbols = [symbol for asset_type, symbol in book['index']]
+        with timed('quotes'):
+            quotes = self.market_data.get_quotes(symbols, refresh=True)
+        with timed('revaluation'):
+            summary = revalue_portfolio(book['summary'], book['index'], quotes)
+        if not summary['repriced']:
+            # Flat prices keep the current version, so ETags and caches built on it stay valid
+            return dict(book['summary'], repriced=[])
+        summary['version'] = self.history.record(summary['positions_by_type'])
+        
+        with self._fan_out_lock:
+            # A full sync that finished meanwhile has newer holdings; keep it
+            if self._book is book:
+                self._book = dict(book, summary=summary)
+        return summary
     
     def get_broker(self, connection_id: str):
         """Get a specific broker instance by connection ID"""
         return self.brokers.get(connection_id)
     
+    def invalidate_caches(self) -> None:
+        """Drop every broker's per-cycle cache so the next fan-out refetches"""
+        for broker in list(self.brokers.values()):
+            broker.invalidate_cache()
+    
     def get_enabled_connections(self) -> List[str]:
         """Get list of enabled connection IDs"""
         return list(self.brokers.keys())
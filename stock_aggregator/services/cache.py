@@ -0,0 +1,368 @@
+try:
+    import redis
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+import json
+import logging
+import threading
+import time
+import zlib
+
+logger = logging.getLogger(__name__)
+
+# Serialized values larger than this many bytes are zlib compressed before going to Redis
+COMPRESS_THRESHOLD = 512
+
+# Defaults for the process-wide caches, overridable from the market_data section of config.yml
+DEFAULT_CACHE_SETTINGS = {
+    'quotes': {'max_entries': 5000, 'ttl': 300},
+    'prices': {'max_entries': 5000, 'ttl': 10},
+    'option_chains': {'max_entries': 200, 'ttl': 300}
+}
+DEFAULT_NEGATIVE_SETTINGS = {'base_ttl': 60, 'max_ttl': 3600, 'max_entries': 5000}
+
+_MISSING = object()
+
+
+class TTLCache:
+    """Thread-safe LRU cache with a per-entry time to live.
+
+    Entries expire ``ttl`` seconds after they are written unless a different
+    ``ttl`` is passed to ``set``. When the cache holds ``max_entries`` items the
+    least recently used entry is evicted. Hit, miss and eviction counts are
+    kept for monitoring.
+    """
+
+    def __init__(self, max_entries: int = 1000, ttl: Optional[float] = 300):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data = OrderedDict()
+        self._lock = threading.RLock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return a fresh value for key and mark it as recently used."""
+        with self._lock:
+            value = self._lookup(key)
+            if value is _MISSING:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def peek(self, key: Hashable, default: Any = None) -> Any:
+        """Return a fresh value for key without touching LRU order or counters."""
+        with self._lock:
+            value = self._lookup(key)
+            return default if value is _MISSING else value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """Store a value, evicting least recently used entries when full."""
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            self._evict()
+
+    def delete(self, key: Hashable) -> None:
+        """Remove a key if present."""
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        """Remove all entries and reset counters."""
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def configure(self, max_entries: Optional[int] = None, ttl: Optional[float] = None) -> None:
+        """Change the size limit and default TTL, trimming if needed."""
+        with self._lock:
+            if max_entries is not None:
+                self.max_entries = int(max_entries)
+            if ttl is not None:
+                self.ttl = float(ttl)
+            self._evict()
+
+    def stats(self) -> Dict[str, int]:
+        """Get cache size and hit/miss/eviction counters."""
+        with self._lock:
+            return {
+                'entries': len(self._data),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions
+            }
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.peek(key, _MISSING) is not _MISSING
+
+    def _lookup(self, key):
+        entry = self._data.get(key)
+        if entry is None:
+            return _MISSING
+        expires_at, value = entry
+        if expires_at is not None and time.monotonic() >= expires_at:
+            del self._data[key]
+            return _MISSING
+        return value
+
+    def _evict(self):
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+
+class RedisCache:
+    """Cross-process cache tier stored in Redis.
+
+    Values are JSON encoded without whitespace and zlib compressed when
+    larger than COMPRESS_THRESHOLD, with a one byte marker so either form
+    can be read back. Redis errors are logged and treated as cache misses
+    so a Redis outage only costs the extra upstream fetches.
+    """
+
+    def __init__(self, client, prefix: str = 'stock_aggregator:', ttl: Optional[float] = 300):
+        self.client = client
+        self.prefix = prefix
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Return the decoded value stored under key."""
+        try:
+            payload = self.client.get(self.prefix + key)
+        except Exception as e:
+            self.errors += 1
+            logger.debug(f"Error reading {key} from Redis: {str(e)}")
+            return default
+        if payload is None:
+            self.misses += 1
+            return default
+        try:
+            value = self._decode(payload)
+        except Exception as e:
+            self.errors += 1
+            logger.debug(f"Error decoding {key} from Redis: {str(e)}")
+            return default
+        self.hits += 1
+        return value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        """Store a value under key with an expiry in seconds."""
+        ttl = self.ttl if ttl is None else ttl
+        try:
+            payload = self._encode(value)
+            if ttl is not None:
+                self.client.set(self.prefix + key, payload, ex=max(1, int(ttl)))
+            else:
+                self.client.set(self.prefix + key, payload)
+        except Exception as e:
+            self.errors += 1
+            logger.debug(f"Error writing {key} to Redis: {str(e)}")
+
+    def delete(self, key: str) -> None:
+        """Remove a key if present."""
+        try:
+            self.client.delete(self.prefix + key)
+        except Exception as e:
+            self.errors += 1
+            logger.debug(f"Error deleting {key} from Redis: {str(e)}")
+
+    def stats(self) -> Dict[str, int]:
+        """Get hit/miss/error counters."""
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'errors': self.errors
+        }
+
+    @staticmethod
+    def _encode(value: Any) -> bytes:
+        payload = json.dumps(value, separators=(',', ':'), default=str).encode('utf-8')
+        if len(payload) > COMPRESS_THRESHOLD:
+            return b'z' + zlib.compress(payload)
+        return b'j' + payload
+
+    @staticmethod
+    def _decode(payload: bytes) -> Any:
+        marker, body = payload[:1], payload[1:]
+        if marker == b'z':
+            body = zlib.decompress(body)
+        return json.loads(body.decode('utf-8'))
+
+
+class NegativeCache:
+    """Remembers failed lookups so they are not retried on every request.
+
+    A key that fails is blocked for ``base_ttl`` seconds, doubling with each
+    consecutive failure up to ``max_ttl``. The failure count survives expiry
+    so a symbol that keeps failing backs off further; a success clears it.
+    Every lookup answered from a negative entry is counted as a hit.
+    """
+
+    def __init__(self, base_ttl: float = 60, max_ttl: float = 3600, max_entries: int = 5000):
+        self.base_ttl = base_ttl
+        self.max_ttl = max_ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.RLock()
+
+    def is_blocked(self, key: Hashable) -> bool:
+        """Return True (and count a hit) while a failed key is backing off."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.monotonic() >= entry['expires_at']:
+                return False
+            entry['hits'] += 1
+            return True
+
+    def record_failure(self, key: Hashable, error: str = '') -> float:
+        """Record a failed lookup and return how long the key is blocked for."""
+        with self._lock:
+            entry = self._entries.pop(key, None) or {'failures': 0, 'hits': 0}
+            entry['failures'] += 1
+            ttl = min(self.base_ttl * (2 ** (entry['failures'] - 1)), self.max_ttl)
+            entry['expires_at'] = time.monotonic() + ttl
+            entry['error'] = error
+            self._entries[key] = entry
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            return ttl
+
+    def record_success(self, key: Hashable) -> None:
+        """Forget any failures for a key."""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def configure(self, base_ttl: Optional[float] = None, max_ttl: Optional[float] = None) -> None:
+        """Change the backoff settings for future failures."""
+        with self._lock:
+            if base_ttl is not None:
+                self.base_ttl = float(base_ttl)
+            if max_ttl is not None:
+                self.max_ttl = float(max_ttl)
+
+    def clear(self) -> None:
+        """Forget all failures."""
+        with self._lock:
+            self._entries.clear()
+
+    def entries(self) -> Dict[Hashable, Dict[str, Any]]:
+        """Get failures, hits, remaining block time and last error per key, most hit first."""
+        now = time.monotonic()
+        with self._lock:
+            items = [
+                (key, {
+                    'failures': entry['failures'],
+                    'hits': entry['hits'],
+                    'blocked_for': max(0.0, entry['expires_at'] - now),
+                    'error': entry['error']
+                })
+                for key, entry in self._entries.items()
+            ]
+        items.sort(key=lambda item: item[1]['hits'], reverse=True)
+        return dict(items)
+
+    def stats(self) -> Dict[str, int]:
+        """Get the number of failing keys and total negative hits."""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'hits': sum(entry['hits'] for entry in self._entries.values())
+            }
+
+
+_shared_caches = {}
+_shared_lock = threading.Lock()
+_remote_cache = None
+_negative_cache = None
+
+
+def get_shared_cache(name: str) -> TTLCache:
+    """Get the process-wide cache with the given name, creating it on first use."""
+    with _shared_lock:
+        cache = _shared_caches.get(name)
+        if cache is None:
+            defaults = DEFAULT_CACHE_SETTINGS.get(name, {})
+            cache = TTLCache(**defaults)
+            _shared_caches[name] = cache
+        return cache
+
+
+def configure_shared_cache(name: str, max_entries: Optional[int] = None, ttl: Optional[float] = None) -> TTLCache:
+    """Apply size and TTL settings to a process-wide cache."""
+    cache = get_shared_cache(name)
+    cache.configure(max_entries=max_entries, ttl=ttl)
+    return cache
+
+
+def shared_cache_stats() -> Dict[str, Dict[str, int]]:
+    """Get counters for every process-wide cache."""
+    with _shared_lock:
+        caches = dict(_shared_caches)
+    return {name: cache.stats() for name, cache in caches.items()}
+
+
+def get_negative_cache() -> NegativeCache:
+    """Get the process-wide negative cache for failed lookups."""
+    global _negative_cache
+    with _shared_lock:
+        if _negative_cache is None:
+            _negative_cache = NegativeCache(**DEFAULT_NEGATIVE_SETTINGS)
+        return _negative_cache
+
+
+def configure_negative_cache(base_ttl: Optional[float] = None, max_ttl: Optional[float] = None) -> NegativeCache:
+    """Apply backoff settings to the process-wide negative cache."""
+    cache = get_negative_cache()
+    cache.configure(base_ttl=base_ttl, max_ttl=max_ttl)
+    return cache
+
+
+def get_remote_cache() -> Optional[RedisCache]:
+    """Get the shared Redis tier, or None when it is not configured."""
+    return _remote_cache
+
+
+def configure_remote_cache(url: Optional[str] = None, host: str = 'localhost', port: int = 6379,
+                           db: int = 0, ttl: Optional[float] = 300, client=None) -> Optional[RedisCache]:
+    """Enable the shared Redis tier.
+
+    Args:
+        url (str, optional): Redis URL. Takes precedence over host/port/db.
+        ttl (float, optional): Default expiry in seconds for stored values.
+        client (optional): Pre-built Redis client, mainly for tests.
+    """
+    global _remote_cache
+    if client is None:
+        if not REDIS_AVAILABLE:
+            logger.warning("Redis module not available. Market data will be cached per process only.")
+            return None
+        if url:
+            client = redis.Redis.from_url(url, socket_timeout=1, socket_connect_timeout=1)
+        else:
+            client = redis.Redis(host=host, port=port, db=db, socket_timeout=1, socket_connect_timeout=1)
+    _remote_cache = RedisCache(client, ttl=ttl)
+    return _remote_cache
+
+
+def disable_remote_cache() -> None:
+    """Stop using the shared Redis tier."""
+    global _remote_cache
+    _remote_cache = None
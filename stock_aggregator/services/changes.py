@@ -0,0 +1,113 @@
+from collections import deque
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import threading
+
+# Default number of portfolio versions whose changes are kept for delta queries,
+# overridable with change_history_versions in the app section of config.yml
+DEFAULT_HISTORY_VERSIONS = 100
+
+RowKey = Tuple[str, str]
+
+
+def row_key(asset_type: str, row: Dict) -> RowKey:
+    """Identify an aggregated row: by symbol, or by account for cash rows (all named CASH)"""
+    if asset_type == 'cash':
+        accounts = row.get('accounts') or []
+        return asset_type, accounts[0]['account_id'] if accounts else row['symbol']
+    return asset_type, row['symbol']
+
+
+def iter_rows(positions_by_type: Dict[str, List[Dict]]) -> Iterator[Tuple[RowKey, Dict]]:
+    for asset_type, rows in positions_by_type.items():
+        for row in rows:
+            yield row_key(asset_type, row), row
+
+
+def diff_positions(previous: Dict[RowKey, Dict], current: Dict[RowKey, Dict]) -> Dict[str, Any]:
+    """Compare two keyed portfolios.
+
+    Rows shared unchanged between summaries (revaluation reuses them) are
+    skipped by identity before any field comparison.
+
+    Returns:
+        Dict with 'added' and 'changed' rows by key and the 'removed' keys.
+    """
+    added = {}
+    changed = {}
+    for key, row in current.items():
+        before = previous.get(key)
+        if before is None:
+            added[key] = row
+        elif before is not row and before != row:
+            changed[key] = row
+    removed = [key for key in previous if key not in current]
+    return {'added': added, 'changed': changed, 'removed': removed}
+
+
+class ChangeHistory:
+    """Versions of the aggregated portfolio and the rows that changed between them.
+
+    record() numbers each new summary with the next version and stores
+    which rows were added, removed or changed against the previous one.
+    Only the last max_versions diffs are kept, so changes_since() answers
+    None for versions that have aged out and the caller sends everything.
+    """
+
+    def __init__(self, max_versions: int = DEFAULT_HISTORY_VERSIONS):
+        self._entries = deque(maxlen=max(1, int(max_versions)))
+        self._rows: Dict[RowKey, Dict] = {}
+        self._version = 0
+        self._lock = threading.Lock()
+
+    @property
+    def version(self) -> int:
+        """Latest recorded version; 0 before the first summary"""
+        return self._version
+
+    def record(self, positions_by_type: Dict[str, List[Dict]]) -> int:
+        """Store the changes of a new summary and return its version"""
+        rows = dict(iter_rows(positions_by_type))
+        with self._lock:
+            changes = diff_positions(self._rows, rows)
+            self._version += 1
+            self._entries.append((self._version, changes))
+            self._rows = rows
+            return self._version
+
+    def changes_since(self, since: int, until: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """Net changes from version since up to version until (default: latest).
+
+        Returns:
+            Dict with 'added', 'changed' (rows by key) and 'removed' (keys),
+            or None when since is not covered by the history.
+        """
+        with self._lock:
+            until = self._version if until is None else until
+            entries = list(self._entries)
+        if since == until:
+            return {'added': {}, 'changed': {}, 'removed': []}
+        # The oldest entry holds the changes from the version before it
+        if not entries or since > until or since < entries[0][0] - 1 or until > entries[-1][0]:
+            return None
+
+        upserts: Dict[RowKey, Dict] = {}
+        first_seen: Dict[RowKey, str] = {}
+        removed = {}
+        for version, changes in entries:
+            if version <= since or version > until:
+                continue
+            for kind in ('added', 'changed'):
+                for key, row in changes[kind].items():
+                    first_seen.setdefault(key, kind)
+                    upserts[key] = row
+                    removed.pop(key, None)
+            for key in changes['removed']:
+                first_seen.setdefault(key, 'removed')
+                upserts.pop(key, None)
+                removed[key] = True
+
+        # A row added and removed again within the window was never seen by the client
+        removed_keys = [key for key in removed if first_seen[key] != 'added']
+        added = {key: row for key, row in upserts.items() if first_seen[key] == 'added'}
+        changed = {key: row for key, row in upserts.items() if first_seen[key] != 'added'}
+        return {'added': added, 'changed': changed, 'removed': removed_keys}
@@ -1,15 +1,100 @@
+import asyncio
 import yfinance as yf
-from typing import Dict, List, Optional, Tuple
-from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
 import logging
 import re
+import time
+from .cache import NegativeCache, RedisCache, TTLCache, get_negative_cache, get_remote_cache, get_shared_cache
+from ..metrics import count, timed
 
 logger = logging.getLogger(__name__)
 
+# Maximum number of tickers sent to yfinance in a single bulk download
+QUOTE_BATCH_SIZE = 200
+
+# When set, lookups are answered from the caches only and yfinance is never called
+_offline = False
+
+
+def set_offline(enabled: bool) -> None:
+    """Turn network-free market data on or off for this process.
+
+    Offline lookups that miss the caches return no price, so positions keep
+    the prices their broker reported. Used by synthetic connections and
+    benchmarks.
+    """
+    global _offline
+    _offline = bool(enabled)
+
+
+def is_offline() -> bool:
+    """Check whether market data lookups are network-free"""
+    return _offline
+
+
 class MarketDataService:
-    def __init__(self):
-        self._cache = {}
-        self._cache_timeout = timedelta(minutes=5)
+    def __init__(self, cache: Optional[TTLCache] = None, chain_cache: Optional[TTLCache] = None,
+                 remote_cache: Optional[RedisCache] = None, negative_cache: Optional[NegativeCache] = None,
+                 price_cache: Optional[TTLCache] = None):
+        """
+        Initialize the MarketDataService.
+        
+        Args:
+            cache (TTLCache, optional): Quote cache. Defaults to the process-wide quote cache.
+            chain_cache (TTLCache, optional): Option chain cache. Defaults to the process-wide chain cache.
+            remote_cache (RedisCache, optional): Cross-worker tier checked after the local caches.
+                Defaults to the shared Redis tier when one is configured.
+            negative_cache (NegativeCache, optional): Failed lookups to back off from.
+                Defaults to the process-wide negative cache.
+            price_cache (TTLCache, optional): Short-lived bulk download prices. Defaults to the
+                process-wide price cache.
+        """
+        self._cache = cache if cache is not None else get_shared_cache('quotes')
+        self._chain_cache = chain_cache if chain_cache is not None else get_shared_cache('option_chains')
+        self._remote = remote_cache if remote_cache is not None else get_remote_cache()
+        self._negative = negative_cache if negative_cache is not None else get_negative_cache()
+        self._prices = price_cache if price_cache is not None else get_shared_cache('prices')
+
+    def _get_cached_info(self, symbol: str) -> Optional[Dict]:
+        """Look up stock info in the local cache, then the remote tier."""
+        stock_info = self._cache.get(symbol)
+        count('cache_requests_total', cache='quotes', tier='local', result='miss' if stock_info is None else 'hit')
+        if stock_info is None and self._remote is not None:
+            stock_info = self._remote.get(f"quote:{symbol}")
+            count('cache_requests_total', cache='quotes', tier='remote', result='miss' if stock_info is None else 'hit')
+            if stock_info is not None:
+                self._cache.set(symbol, stock_info)
+        return stock_info
+
+    def _set_cached_info(self, symbol: str, stock_info: Dict) -> None:
+        """Store stock info in the local cache and the remote tier."""
+        self._cache.set(symbol, stock_info)
+        if self._remote is not None:
+            self._remote.set(f"quote:{symbol}", stock_info)
+
+    def _get_cached_price(self, symbol: str) -> Optional[float]:
+        """Look up a recently downloaded price locally, then in the remote tier.
+
+        Remote prices carry their download time, so the local copy expires
+        with the original instead of living a full TTL longer.
+        """
+        price = self._prices.get(symbol)
+        count('cache_requests_total', cache='prices', tier='local', result='miss' if price is None else 'hit')
+        if price is None and self._remote is not None:
+            entry = self._remote.get(f"price:{symbol}")
+            count('cache_requests_total', cache='prices', tier='remote', result='miss' if entry is None else 'hit')
+            if entry is not None:
+                price = entry['price']
+                remaining = (self._prices.ttl or 0) - (time.time() - entry['at'])
+                if remaining > 0:
+                    self._prices.set(symbol, price, ttl=remaining)
+        return price
+
+    def _set_cached_price(self, symbol: str, price: float) -> None:
+        """Store a downloaded price in the local cache and the remote tier."""
+        self._prices.set(symbol, price)
+        if self._remote is not None:
+            self._remote.set(f"price:{symbol}", {'price': price, 'at': time.time()}, ttl=self._prices.ttl)
 
     def _parse_option_symbol(self, symbol: str) -> Optional[Dict]:
         """Parse an options symbol into its components."""
@@ -39,30 +124,85 @@ class MarketDataService:
             'strike': strike_price
         }
 
+    def _get_chain(self, underlying: str, expiration: Optional[str] = None) -> Dict:
+        """Get an option chain from the cache, downloading it if missing or stale.
+
+        The cached chain holds the call and put records plus an index from
+        (option_type, strike) to last price so contracts can be priced
+        without scanning the chain. Download errors are raised to the caller.
+        """
+        key = (underlying, expiration)
+        chain = self._chain_cache.get(key)
+        count('cache_requests_total', cache='option_chains', tier='local', result='miss' if chain is None else 'hit')
+        if chain is not None:
+            return chain
+
+        remote_key = f"chain:{underlying}:{expiration or ''}"
+        if self._negative.is_blocked(remote_key):
+            raise LookupError(f"Option chain {underlying} {expiration or ''} recently failed")
+        records = self._remote.get(remote_key) if self._remote is not None else None
+        if records is not None:
+            chain = self._build_chain(records['calls'], records['puts'])
+            self._chain_cache.set(key, chain)
+            return chain
+        if _offline:
+            raise LookupError(f"Option chain {underlying} {expiration or ''} not cached (offline)")
+
+        try:
+            count('outbound_calls_total', service='yfinance', endpoint='option_chain')
+            with timed('yfinance_option_chain'):
+                ticker = yf.Ticker(underlying)
+                if expiration:
+                    options = ticker.option_chain(expiration)
+                else:
+                    options = ticker.option_chain()
+        except Exception as e:
+            self._negative.record_failure(remote_key, str(e))
+            raise
+        self._negative.record_success(remote_key)
+
+        calls = options.calls.to_dict('records')
+        puts = options.puts.to_dict('records')
+        chain = self._build_chain(calls, puts)
+        self._chain_cache.set(key, chain)
+        if self._remote is not None:
+            # The index has tuple keys, so only the records are shared
+            self._remote.set(remote_key, {'calls': calls, 'puts': puts})
+        return chain
+
+    def _build_chain(self, calls: List[Dict], puts: List[Dict]) -> Dict:
+        """Build a cached chain entry with its (option_type, strike) price index."""
+        index = {}
+        for option_type, records in (('call', calls), ('put', puts)):
+            for record in records:
+                index.setdefault((option_type, round(float(record['strike']), 3)), float(record['lastPrice']))
+
+        return {
+            'calls': calls,
+            'puts': puts,
+            'index': index
+        }
+
     def _get_option_price(self, symbol: str) -> float:
         """Get the current price for an options symbol."""
         option_data = self._parse_option_symbol(symbol)
         if not option_data:
             return 0.0
+        if self._negative.is_blocked(symbol):
+            return 0.0
             
         try:
-            # Get the underlying stock's option chain
-            ticker = yf.Ticker(option_data['underlying'])
-            options = ticker.option_chain(option_data['expiration'])
-            
-            # Get the appropriate chain (calls or puts)
-            chain = options.calls if option_data['option_type'] == 'call' else options.puts
-            
-            # Find the matching strike price
-            matching_option = chain[chain['strike'] == option_data['strike']]
-            if not matching_option.empty:
-                return float(matching_option['lastPrice'].iloc[0])
-                
-            return 0.0
+            chain = self._get_chain(option_data['underlying'], option_data['expiration'])
         except Exception as e:
             logger.debug(f"Error getting option price for {symbol}: {str(e)}")
             return 0.0
 
+        price = chain['index'].get((option_data['option_type'], round(option_data['strike'], 3)))
+        if price is None:
+            self._negative.record_failure(symbol, 'strike not in option chain')
+            return 0.0
+        return price
+
     def _is_fixed_income(self, symbol: str) -> bool:
         """Check if the symbol is a fixed income security (CUSIP)."""
         # CUSIP pattern: 
@@ -112,15 +252,24 @@ class MarketDataService:
             }
 
         # Check cache for regular stocks
-        now = datetime.now()
-        if symbol in self._cache:
-            cached_data = self._cache[symbol]
-            if now - cached_data['timestamp'] < self._cache_timeout:
-                return cached_data['info']
+        cached_info = self._get_cached_info(symbol)
+        if cached_info is not None:
+            return cached_info
+
+        # Skip symbols that recently failed until their backoff expires
+        if _offline or self._negative.is_blocked(symbol):
+            return {
+                'name': symbol,
+                'current_price': 0.0,
+                'sector': '',
+                'industry': ''
+            }
 
         try:
-            ticker = yf.Ticker(symbol)
-            info = ticker.info
+            count('outbound_calls_total', service='yfinance', endpoint='info')
+            with timed('yfinance_info'):
+                ticker = yf.Ticker(symbol)
+                info = ticker.info
             
             stock_info = {
                 'name': info.get('longName', symbol),
@@ -129,12 +278,16 @@ class MarketDataService:
                 'industry': info.get('industry', '')
             }
             
-            self._cache[symbol] = {
-                'info': stock_info,
-                'timestamp': now
-            }
+            # Unknown tickers come back without a price; back off instead of caching them
+            if not stock_info['current_price']:
+                self._negative.record_failure(symbol, 'no price returned')
+                return stock_info
+            
+            self._negative.record_success(symbol)
+            self._set_cached_info(symbol, stock_info)
             return stock_info
         except Exception as e:
+            self._negative.record_failure(symbol, str(e))
             # Silently return default values for 404 errors
             if "404" in str(e):
                 return {
@@ -153,21 +306,165 @@ class MarketDataService:
             }
 
     def get_current_price(self, symbol: str) -> float:
-        """Get the current price for a symbol."""
+        """Get the current price for a symbol, preferring a recent bulk download."""
+        price = self._get_cached_price(symbol)
+        if price is not None:
+            return price
         return self.get_stock_info(symbol)['current_price']
 
+    def get_quotes(self, symbols: Iterable[str], refresh: bool = False) -> Dict[str, float]:
+        """Get current prices for many symbols using bulk downloads.
+
+        Fresh cached prices are reused and symbols in the negative cache are
+        skipped; the remaining plain tickers are fetched in batches of
+        QUOTE_BATCH_SIZE and written back to the cache. Fixed income and
+        option symbols keep their existing lookup paths.
+
+        Args:
+            refresh: Only reuse prices downloaded within the price cache TTL,
+                by this worker or another one through the remote tier, and
+                download the rest.
+        """
+        quotes, to_fetch = self._resolve_quotes(symbols, refresh)
+
+        for start in range(0, len(to_fetch), QUOTE_BATCH_SIZE):
+            batch = to_fetch[start:start + QUOTE_BATCH_SIZE]
+            prices, error = self._download_prices(batch)
+            self._store_prices(batch, prices, error, quotes)
+
+        return quotes
+
+    async def get_quotes_async(self, symbols: Iterable[str]) -> Dict[str, float]:
+        """Async variant of get_quotes that downloads all batches concurrently.
+
+        yfinance is synchronous, so cache resolution and each batch download
+        run in the event loop's default executor; the batches are gathered
+        instead of fetched one after another.
+        """
+        loop = asyncio.get_running_loop()
+        quotes, to_fetch = await loop.run_in_executor(None, self._resolve_quotes, list(symbols))
+
+        batches = [to_fetch[start:start + QUOTE_BATCH_SIZE] for start in range(0, len(to_fetch), QUOTE_BATCH_SIZE)]
+        results = await asyncio.gather(*(loop.run_in_executor(None, self._download_prices, batch) for batch in batches))
+        for batch, (prices, error) in zip(batches, results):
+            self._store_prices(batch, prices, error, quotes)
+
+        return quotes
+
+    def _resolve_quotes(self, symbols: Iterable[str], refresh: bool = False) -> Tuple[Dict[str, float], List[str]]:
+        """Answer what can be answered without a bulk download.
+
+        Returns:
+            Prices found so far by symbol, and the plain tickers still to download.
+        """
+        quotes = {}
+        to_fetch = []
+
+        for symbol in dict.fromkeys(symbols):
+            if not symbol:
+                continue
+            if self._is_fixed_income(symbol) or self._parse_option_symbol(symbol):
+                quotes[symbol] = self.get_current_price(symbol)
+                continue
+            price = self._get_cached_price(symbol)
+            if price is not None:
+                quotes[symbol] = price
+                continue
+            cached_info = None if refresh else self._get_cached_info(symbol)
+            if cached_info is not None:
+                quotes[symbol] = cached_info['current_price']
+                continue
+            if _offline or self._negative.is_blocked(symbol):
+                quotes[symbol] = 0.0
+                continue
+            to_fetch.append(symbol)
+
+        return quotes, to_fetch
+
+    def _store_prices(self, batch: List[str], prices: Dict[str, float], error: Optional[str],
+                      quotes: Dict[str, float]) -> None:
+        """Record one downloaded batch in quotes and the price cache.
+
+        Downloads carry no name or sector, so they never create stock info
+        entries that get_stock_info would then serve.
+
+        Only symbols missing from a successful download are recorded as
+        failing; a failed request says nothing about its symbols and is
+        simply retried on the next call.
+        """
+        if error is not None:
+            logger.warning(f"Quote download failed for {len(batch)} symbols: {error}")
+            for symbol in batch:
+                quotes[symbol] = 0.0
+            return
+        for symbol in batch:
+            price = prices.get(symbol, 0.0)
+            quotes[symbol] = price
+            if price <= 0:
+                self._negative.record_failure(symbol, 'no price returned')
+                continue
+            self._negative.record_success(symbol)
+            self._set_cached_price(symbol, price)
+
+    def _download_prices(self, symbols: List[str]) -> Tuple[Dict[str, float], Optional[str]]:
+        """Fetch the latest close for a batch of tickers in one request.
+
+        Returns the prices found and the error message if the request failed
+        or came back empty.
+        """
+        try:
+            count('outbound_calls_total', service='yfinance', endpoint='download')
+            with timed('yfinance_download'):
+                data = yf.download(
+                    symbols,
+                    period='5d',
+                    group_by='ticker',
+                    auto_adjust=False,
+                    progress=False,
+                    threads=True
+                )
+        except Exception as e:
+            logger.debug(f"Error downloading quotes for {len(symbols)} symbols: {str(e)}")
+            return {}, str(e)
+
+        if data is None or data.empty:
+            return {}, 'empty response'
+
+        prices = {}
+        multi_level = getattr(data.columns, 'nlevels', 1) > 1
+        for symbol in symbols:
+            try:
+                closes = data[symbol]['Close'] if multi_level else data['Close']
+                closes = closes.dropna()
+                if not closes.empty:
+                    prices[symbol] = float(closes.iloc[-1])
+            except KeyError:
+                continue
+        return prices, None
+
+    def cache_stats(self) -> Dict[str, Dict[str, int]]:
+        """Get counters for the quote, option chain and negative caches and the Redis tier."""
+        stats = {
+            'quotes': self._cache.stats(),
+            'prices': self._prices.stats(),
+            'option_chains': self._chain_cache.stats()
+        }
+        stats['negative'] = self._negative.stats()
+        if self._remote is not None:
+            stats['redis'] = self._remote.stats()
+        return stats
+
+    def get_failing_symbols(self) -> Dict[str, Dict]:
+        """Get symbols and option chains currently in the negative cache, most hit first."""
+        return self._negative.entries()
+
     def get_option_chain(self, symbol: str, expiration: Optional[str] = None) -> Dict:
         """Get option chain data for a symbol."""
         try:
-            ticker = yf.Ticker(symbol)
-            if expiration:
-                options = ticker.option_chain(expiration)
-            else:
-                options = ticker.option_chain()
-            
+            chain = self._get_chain(symbol, expiration)
             return {
-                'calls': options.calls.to_dict('records'),
-                'puts': options.puts.to_dict('records')
+                'calls': chain['calls'],
+                'puts': chain['puts']
             }
         except Exception as e:
             # Silently return empty option chain for 404 errors
@@ -175,4 +472,4 @@ class MarketDataService:
                 return {'calls': [], 'puts': []}
             # Log other errors but still return empty option chain
             logger.debug(f"Error getting option chain for {symbol}: {str(e)}")
-            return {'calls': [], 'puts': []} 
\ No newline at end of file
+            return {'calls': [], 'puts': []}
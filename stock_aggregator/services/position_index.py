@@ -0,0 +1,148 @@
+from bisect import bisect_left
+from collections import defaultdict
+from typing import Any, Dict, FrozenSet, List, Optional
+import heapq
+
+# Fields positions can be sorted by; each has an order precomputed per snapshot
+SORT_FIELDS = ('symbol', 'total_market_value', 'total_unrealized_pl', 'unrealized_pl_percent')
+
+DEFAULT_PAGE_SIZE = 50
+
+
+def _sort_key(field: str):
+    # Ties fall back to the symbol so pages are stable across requests
+    if field == 'symbol':
+        return lambda row: (str(row.get('symbol') or '').upper(),)
+    return lambda row: (float(row.get(field) or 0.0), str(row.get('symbol') or '').upper())
+
+
+class PositionIndex:
+    """Aggregated positions of one snapshot, indexed for paged queries.
+
+    Rows are indexed by asset type, sector and account id, and ordered once
+    by every field in SORT_FIELDS, both overall and within each asset type.
+    A query without filters is a slice of a precomputed order; filters
+    intersect the matching row sets and rank only those rows. Symbol
+    filters match a case-insensitive prefix through the symbol order.
+    Cash rows are balances rather than holdings and are left out.
+    Snapshots never change, so an index is built once and shared.
+    """
+
+    def __init__(self, positions_by_type: Dict[str, List]):
+        self._rows: List[Any] = []
+        self._asset_types: List[str] = []
+        by_sector = defaultdict(set)
+        by_account = defaultdict(set)
+        sectors = defaultdict(set)
+        accounts = defaultdict(set)
+        asset_types = [asset_type for asset_type in positions_by_type if asset_type != 'cash']
+        for asset_type in asset_types:
+            for row in positions_by_type[asset_type]:
+                row_id = len(self._rows)
+                self._rows.append(row)
+                self._asset_types.append(asset_type)
+                if row.get('sector'):
+                    by_sector[row['sector']].add(row_id)
+                    sectors[asset_type].add(row['sector'])
+                for account in row.get('accounts') or ():
+                    by_account[account['account_id']].add(row_id)
+                    accounts[asset_type].add(account['account_id'])
+        self._by_sector: Dict[str, FrozenSet[int]] = {key: frozenset(ids) for key, ids in by_sector.items()}
+        self._by_account: Dict[str, FrozenSet[int]] = {key: frozenset(ids) for key, ids in by_account.items()}
+        self._facets = {
+            asset_type: {'sectors': sorted(sectors[asset_type]), 'accounts': sorted(accounts[asset_type])}
+            for asset_type in asset_types
+        }
+        self._facets[None] = {'sectors': sorted(by_sector), 'accounts': sorted(by_account)}
+
+        # Orders within an asset type are the overall orders filtered, so ranks are shared
+        self._ranks: Dict[str, List[int]] = {}
+        self._orders: Dict[Optional[str], Dict[str, List[int]]] = {None: {}}
+        for asset_type in asset_types:
+            self._orders[asset_type] = {}
+        for field in SORT_FIELDS:
+            key = _sort_key(field)
+            order = sorted(range(len(self._rows)), key=lambda row_id: key(self._rows[row_id]))
+            ranks = [0] * len(order)
+            for rank, row_id in enumerate(order):
+                ranks[row_id] = rank
+            self._ranks[field] = ranks
+            self._orders[None][field] = order
+            for asset_type in asset_types:
+                self._orders[asset_type][field] = []
+            for row_id in order:
+                self._orders[self._asset_types[row_id]][field].append(row_id)
+
+        self._symbols = {
+            scope: [str(self._rows[row_id].get('symbol') or '').upper() for row_id in orders['symbol']]
+            for scope, orders in self._orders.items()
+        }
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def facets(self, asset_type: Optional[str] = None) -> Dict[str, List[str]]:
+        """Sectors and account ids present among the positions of an asset type (default: all)"""
+        return self._facets.get(asset_type, {'sectors': [], 'accounts': []})
+
+    def query(self, asset_type: Optional[str] = None, symbol: Optional[str] = None,
+              sector: Optional[str] = None, account_id: Optional[str] = None,
+              sort: str = 'symbol', descending: bool = False,
+              page: int = 1, page_size: int = DEFAULT_PAGE_SIZE) -> Dict[str, Any]:
+        """Get one page of positions matching every given filter.
+
+        Args:
+            asset_type: Only positions of this asset type.
+            symbol: Only symbols starting with this, ignoring case.
+            sector: Only positions in this sector.
+            account_id: Only positions held in this account.
+            sort: Field from SORT_FIELDS to order by.
+            descending: Largest values first.
+            page: 1-based page number.
+            page_size: Positions per page.
+
+        Returns:
+            Dict with the page's 'positions', the 'total' number of matches
+            and the number of 'pages'.
+        """
+        if sort not in SORT_FIELDS:
+            raise ValueError(f"Cannot sort by {sort}")
+        orders = self._orders.get(asset_type)
+        if orders is None:
+            return {'positions': [], 'total': 0, 'page': page, 'page_size': page_size, 'pages': 0}
+        order = orders[sort]
+
+        candidates = None
+        if symbol:
+            symbols = self._symbols[asset_type]
+            prefix = symbol.upper()
+            start = bisect_left(symbols, prefix)
+            end = bisect_left(symbols, prefix + '\uffff', start)
+            candidates = frozenset(orders['symbol'][start:end])
+        for index, value in ((self._by_sector, sector), (self._by_account, account_id)):
+            if value:
+                matches = index.get(value, frozenset())
+                candidates = matches if candidates is None else candidates & matches
+
+        first = (page - 1) * page_size
+        if candidates is None:
+            total = len(order)
+            if descending:
+                ids = order[max(0, total - first - page_size):max(0, total - first)][::-1]
+            else:
+                ids = order[first:first + page_size]
+        else:
+            if asset_type is not None and not symbol:
+                candidates = [row_id for row_id in candidates if self._asset_types[row_id] == asset_type]
+            total = len(candidates)
+            ranks = self._ranks[sort]
+            pick = heapq.nlargest if descending else heapq.nsmallest
+            ids = pick(first + page_size, candidates, key=ranks.__getitem__)[first:]
+
+        return {
+            'positions': [self._rows[row_id] for row_id in ids],
+            'total': total,
+            'page': page,
+            'page_size': page_size,
+            'pages': -(-total // page_size)
+        }
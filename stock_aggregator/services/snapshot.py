@@ -0,0 +1,183 @@
+from typing import Any, Dict, List, NamedTuple, Optional
+from ..metrics import timed
+import logging
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+# Default seconds between full broker syncs and between price-only revaluations,
+# overridable in the app section of config.yml (a price interval of 0 disables revaluation)
+DEFAULT_SNAPSHOT_INTERVAL = 60.0
+DEFAULT_PRICE_INTERVAL = 15.0
+
+
+class PortfolioSnapshot(NamedTuple):
+    """One published portfolio view. Snapshots are never modified once published."""
+    version: int
+    created_at: float
+    positions: Dict[str, Any]
+    accounts: List[Dict]
+    duration_ms: float
+    epoch: str = ''
+
+    def age_seconds(self) -> float:
+        """Seconds since this snapshot was built"""
+        return max(0.0, time.time() - self.created_at)
+
+
+class SnapshotScheduler:
+    """Rebuild positions and accounts in the background and publish them as snapshots.
+
+    Requests read the latest snapshot instead of calling brokers, so page
+    latency no longer depends on broker latency. A background thread
+    re-syncs holdings from every broker each snapshot_interval_seconds and,
+    in between, revalues the last holdings with fresh prices every
+    price_interval_seconds. refresh() and request_refresh() trigger a full
+    sync on demand. Each worker process runs its own scheduler.
+    """
+
+    def __init__(self, brokers_data, interval: Optional[float] = None, price_interval: Optional[float] = None):
+        self.brokers_data = brokers_data
+        self._interval = interval
+        self._price_interval = price_interval
+        self._full_requested = False
+        self._snapshot = None
+        self._version = 0
+        # Versions only count up within one scheduler; the epoch tells schedulers (and workers) apart
+        self.epoch = uuid.uuid4().hex[:8]
+        self._published = threading.Condition()
+        self._refresh_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._listeners = []
+
+    @property
+    def interval(self) -> float:
+        """Seconds between full broker syncs"""
+        if self._interval is not None:
+            return self._interval
+        app_settings = self.brokers_data.config.config.get('app') or {}
+        return float(app_settings.get('snapshot_interval_seconds', DEFAULT_SNAPSHOT_INTERVAL))
+
+    @property
+    def price_interval(self) -> float:
+        """Seconds between price-only revaluations; 0 disables them"""
+        if self._price_interval is not None:
+            return self._price_interval
+        app_settings = self.brokers_data.config.config.get('app') or {}
+        return float(app_settings.get('price_interval_seconds', DEFAULT_PRICE_INTERVAL) or 0)
+
+    def add_listener(self, callback) -> None:
+        """Call callback(snapshot) after each snapshot is published"""
+        self._listeners.append(callback)
+
+    def start(self) -> None:
+        """Start the background refresher if it is not already running"""
+        with self._published:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='snapshot-refresher', daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the background refresher after its current rebuild"""
+        self._stop.set()
+        self._wake.set()
+
+    def latest(self, timeout: Optional[float] = None) -> Optional[PortfolioSnapshot]:
+        """Get the latest snapshot, waiting up to timeout seconds for the first one.
+
+        Returns:
+            The latest snapshot, or None if none was published in time.
+        """
+        with self._published:
+            if self._snapshot is None and timeout != 0:
+                self._published.wait_for(lambda: self._snapshot is not None, timeout)
+            return self._snapshot
+
+    def refresh(self, invalidate: bool = False) -> PortfolioSnapshot:
+        """Rebuild and publish a snapshot now.
+
+        Args:
+            invalidate: Drop broker-level caches first so the rebuild refetches
+                from every connection.
+        """
+        with self._refresh_lock:
+            if invalidate:
+                self.brokers_data.invalidate_caches()
+            started = time.monotonic()
+            with timed('snapshot_refresh'):
+                positions = self.brokers_data.get_positions()
+                accounts = self.brokers_data.get_accounts()
+            return self._publish(positions, accounts, started)
+
+    def revalue(self) -> PortfolioSnapshot:
+        """Publish the latest holdings repriced with fresh quotes, without a broker sync.
+
+        Returns the current snapshot unchanged when no price moved.
+        """
+        if self.latest(timeout=0) is None:
+            return self.refresh()
+        with self._refresh_lock:
+            previous = self.latest(timeout=0)
+            started = time.monotonic()
+            with timed('snapshot_revalue'):
+                positions = self.brokers_data.revalue_positions()
+            # Nothing repriced: the published snapshot is still current
+            if 'repriced' in positions and not positions['repriced']:
+                return previous
+            return self._publish(positions, previous.accounts, started)
+
+    def _publish(self, positions: Dict[str, Any], accounts: List[Dict], started: float) -> PortfolioSnapshot:
+        duration_ms = (time.monotonic() - started) * 1000
+        with self._published:
+            # Publish under the portfolio's own version when it has one, so API deltas line up
+            self._version = max(self._version + 1, positions.get('version') or 0)
+            self._snapshot = PortfolioSnapshot(
+                version=self._version,
+                created_at=time.time(),
+                positions=positions,
+                accounts=accounts,
+                duration_ms=duration_ms,
+                epoch=self.epoch
+            )
+            self._published.notify_all()
+            snapshot = self._snapshot
+        logger.info(f"Published snapshot {snapshot.version} in {duration_ms:.0f} ms")
+
+        for callback in list(self._listeners):
+            try:
+                callback(snapshot)
+            except Exception as e:
+                logger.error(f"Error notifying snapshot listener: {str(e)}")
+        return snapshot
+
+    def request_refresh(self) -> None:
+        """Ask the background refresher to run a full sync now without waiting for it"""
+        self._full_requested = True
+        self._wake.set()
+
+    def _run(self) -> None:
+        next_sync = 0.0
+        while not self._stop.is_set():
+            full_sync = self._full_requested or time.monotonic() >= next_sync or self.price_interval <= 0
+            try:
+                if full_sync:
+                    self._full_requested = False
+                    self.refresh()
+                else:
+                    self.revalue()
+            except Exception as e:
+                logger.error(f"Error refreshing snapshot: {str(e)}")
+            if full_sync:
+                next_sync = time.monotonic() + self.interval
+
+            wake_at = next_sync
+            if self.price_interval > 0:
+                wake_at = min(wake_at, time.monotonic() + self.price_interval)
+            self._wake.wait(max(0.0, wake_at - time.monotonic()))
+            self._wake.clear()
@@ -0,0 +1,172 @@
+from collections import deque
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import json
+import logging
+import threading
+
+from .changes import iter_rows
+
+logger = logging.getLogger(__name__)
+
+# Events kept for clients that reconnect with Last-Event-ID
+DEFAULT_STREAM_BACKLOG = 50
+
+# Seconds between keep-alive comments on an idle stream
+DEFAULT_HEARTBEAT = 15.0
+
+# Fields of a changed row sent in a price event
+PRICE_FIELDS = ('current_price', 'total_market_value', 'total_unrealized_pl', 'unrealized_pl_percent')
+
+# Fields of each account breakdown that a price move changes
+ACCOUNT_PRICE_FIELDS = ('market_value', 'unrealized_pl')
+
+
+def _changed_fields(before, after, ignored: Tuple[str, ...]) -> bool:
+    return any(before.get(field) != after.get(field) for field in set(before) | set(after) if field not in ignored)
+
+
+def _holdings_changed(before, row) -> bool:
+    """Whether a changed row differs in more than what a price event patches"""
+    if before is None or _changed_fields(before, row, PRICE_FIELDS + ('accounts',)):
+        return True
+    before_accounts = before.get('accounts') or ()
+    accounts = row.get('accounts') or ()
+    if len(before_accounts) != len(accounts):
+        return True
+    return any(_changed_fields(previous, account, ACCOUNT_PRICE_FIELDS)
+               for previous, account in zip(before_accounts, accounts))
+
+
+def _format_event(event_id: str, event: str, data: Dict[str, Any]) -> bytes:
+    payload = json.dumps(data, separators=(',', ':'))
+    return f"id: {event_id}\nevent: {event}\ndata: {payload}\n\n".encode('utf-8')
+
+
+class PriceStream:
+    """Server-Sent Events feed of price and total updates for the published portfolio.
+
+    The stream listens to the snapshot scheduler, so the worker's one
+    background refresher is the only source of quotes no matter how many
+    clients are connected. Each published snapshot is compared with the
+    previous one once and turned into a single encoded event that every
+    client is sent as is:
+
+    - ``prices``: changed rows (price, value, P/L, P/L % and per-account
+      values) and the new totals, for clients to patch in place;
+    - ``holdings``: positions were added or removed, or a row changed in
+      more than its prices (quantity, cost basis, accounts), so clients
+      reload;
+    - ``reset``: sent to a reconnecting client whose Last-Event-ID is no
+      longer in the backlog or comes from another worker.
+
+    Event IDs are ``<epoch>-<version>`` of the snapshot they describe.
+    Changed rows are read from the change history the portfolio versions
+    were recorded in rather than found by comparing snapshots again.
+    """
+
+    def __init__(self, history, backlog: int = DEFAULT_STREAM_BACKLOG, heartbeat: float = DEFAULT_HEARTBEAT):
+        self.heartbeat = heartbeat
+        self._history = history
+        self._events = deque(maxlen=backlog)
+        self._previous = None
+        self._clients = 0
+        self._closed = False
+        self._changed = threading.Condition()
+
+    @property
+    def clients(self) -> int:
+        """Number of streams currently open"""
+        return self._clients
+
+    def publish(self, snapshot) -> None:
+        """Turn a newly published snapshot into an event for all clients"""
+        previous, self._previous = self._previous, snapshot
+        if previous is None or previous.epoch != snapshot.epoch:
+            return
+
+        changes = self._history.changes_since(previous.positions.get('version', previous.version),
+                                              until=snapshot.positions.get('version', snapshot.version))
+        event_id = f"{snapshot.epoch}-{snapshot.version}"
+        totals = {
+            'version': snapshot.version,
+            'totals': snapshot.positions['totals'],
+            'total_market_value': snapshot.positions['total_market_value'],
+            'total_unrealized_pl': snapshot.positions['total_unrealized_pl']
+        }
+
+        # Versions no longer in the history cannot be patched, so clients reload like for new holdings
+        reload = changes is None or changes['added'] or changes['removed']
+        if not reload and changes['changed']:
+            before = dict(iter_rows(previous.positions['positions_by_type']))
+            reload = any(_holdings_changed(before.get(key), row) for key, row in changes['changed'].items())
+        if reload:
+            payload = _format_event(event_id, 'holdings', totals)
+        else:
+            payload = _format_event(event_id, 'prices', dict(
+                totals, positions=[self._price_update(key, row) for key, row in changes['changed'].items()]))
+
+        with self._changed:
+            self._events.append((snapshot.version, event_id, payload))
+            self._changed.notify_all()
+
+    @staticmethod
+    def _price_update(key: Tuple[str, str], row: Dict) -> Dict[str, Any]:
+        update = {'asset_type': key[0], 'key': key[1]}
+        for field in PRICE_FIELDS:
+            if field in row:
+                update[field] = row[field]
+        update['accounts'] = [
+            {'account_id': account['account_id'], 'market_value': account['market_value'],
+             'unrealized_pl': account['unrealized_pl']}
+            for account in row.get('accounts') or ()
+            if 'unrealized_pl' in account
+        ]
+        return update
+
+    def close(self) -> None:
+        """End every open stream"""
+        with self._changed:
+            self._closed = True
+            self._changed.notify_all()
+
+    def _pending(self, cursor: int) -> List[Tuple[int, str, bytes]]:
+        return [event for event in self._events if event[0] > cursor]
+
+    def events(self, epoch: str, version: int, last_event_id: Optional[str] = None) -> Iterator[bytes]:
+        """Yield encoded events for one client until the stream is closed.
+
+        Args:
+            epoch: Epoch of the snapshot the client starts from.
+            version: Version the client already has; later events are sent.
+            last_event_id: Last-Event-ID of a reconnecting client, which
+                replaces epoch and version.
+        """
+        with self._changed:
+            self._clients += 1
+        try:
+            cursor = version
+            if last_event_id:
+                event_epoch, _, event_version = last_event_id.rpartition('-')
+                with self._changed:
+                    oldest = self._events[0][0] - 1 if self._events else version
+                if event_epoch != epoch or not event_version.isdigit() or int(event_version) < oldest:
+                    yield _format_event(f"{epoch}-{version}", 'reset', {'version': version})
+                else:
+                    cursor = int(event_version)
+
+            yield b"retry: 5000\n\n"
+            while True:
+                with self._changed:
+                    self._changed.wait_for(lambda: self._closed or self._pending(cursor), self.heartbeat)
+                    if self._closed:
+                        return
+                    pending = self._pending(cursor)
+                if not pending:
+                    yield b": keep-alive\n\n"
+                    continue
+                for event_version, _, payload in pending:
+                    cursor = event_version
+                    yield payload
+        finally:
+            with self._changed:
+                self._clients -= 1
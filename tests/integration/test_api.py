@@ -0,0 +1,230 @@
+import unittest
+import tempfile
+import gzip
+import json
+import os
+import yaml
+from unittest.mock import PropertyMock, patch
+
+from stock_aggregator.main import app, brokers_data, snapshots
+from stock_aggregator.records import AccountBreakdown, AggregatedPosition
+
+
+def make_summary(count=1, price=100.0):
+    positions = [
+        AggregatedPosition(
+            symbol=f'SYM{i}', name=f'Symbol {i}', sector='Technology', total_quantity=10.0,
+            average_cost_basis=90.0, current_price=price, total_market_value=10 * price,
+            total_unrealized_pl=10 * (price - 90.0), unrealized_pl_percent=(price / 90.0 - 1) * 100,
+            accounts=(AccountBreakdown(account_id='acct-1', quantity=10.0, average_price=90.0,
+                                       market_value=10 * price, total_cost=900.0,
+                                       unrealized_pl=10 * (price - 90.0)),)
+        )
+        for i in range(count)
+    ]
+    market_value = sum(position.total_market_value for position in positions)
+    unrealized_pl = sum(position.total_unrealized_pl for position in positions)
+    return {
+        'positions_by_type': {'equity': positions, 'cash': []},
+        'totals': {'equity': {'market_value': market_value, 'unrealized_pl': unrealized_pl},
+                   'cash': {'market_value': 0.0, 'unrealized_pl': 0.0}},
+        'total_market_value': market_value,
+        'total_unrealized_pl': unrealized_pl,
+        'stale_connections': []
+    }
+
+
+class TestApi(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.config_path = os.path.join(self.temp_dir.name, 'config.yml')
+        with open(self.config_path, 'w') as f:
+            yaml.dump({'brokers': [], 'app': {'price_interval_seconds': 0}}, f)
+        self.previous_config = os.environ.get('STOCK_AGGREGATOR_CONFIG')
+        os.environ['STOCK_AGGREGATOR_CONFIG'] = self.config_path
+        self.client = app.test_client()
+
+    def tearDown(self):
+        snapshots.stop()
+        self.temp_dir.cleanup()
+        if self.previous_config is None:
+            os.environ.pop('STOCK_AGGREGATOR_CONFIG', None)
+        else:
+            os.environ['STOCK_AGGREGATOR_CONFIG'] = self.previous_config
+
+    def publish(self, summary, accounts=None):
+        """Publish a snapshot with the given positions, versioned like BrokersDataService does"""
+        summary = dict(summary, version=brokers_data.history.record(summary['positions_by_type']))
+        with patch('stock_aggregator.services.brokers_data.BrokersDataService.get_positions', return_value=summary), \
+                patch('stock_aggregator.services.brokers_data.BrokersDataService.get_accounts',
+                      return_value=accounts or []):
+            return snapshots.refresh()
+
+    def test_positions_json(self):
+        """Test that positions are served as JSON with the snapshot version"""
+        snapshot = self.publish(make_summary())
+
+        response = self.client.get('/api/positions')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content_type, 'application/json')
+        data = response.get_json()
+        self.assertEqual(data['version'], snapshot.version)
+        self.assertEqual(data['positions_by_type']['equity'][0]['symbol'], 'SYM0')
+        self.assertEqual(data['positions_by_type']['equity'][0]['accounts'][0]['account_id'], 'acct-1')
+
+    def test_accounts_and_totals(self):
+        """Test the accounts and totals views of the snapshot"""
+        self.publish(make_summary(count=2), accounts=[{'id': 'acct-1', 'balance': 2000.0}])
+
+        accounts = self.client.get('/api/accounts').get_json()
+        totals = self.client.get('/api/totals').get_json()
+
+        self.assertEqual(accounts['accounts'], [{'id': 'acct-1', 'balance': 2000.0}])
+        self.assertEqual(totals['total_market_value'], 2000.0)
+        self.assertEqual(totals['totals']['equity']['market_value'], 2000.0)
+
+    def test_conditional_get(self):
+        """Test that an unchanged snapshot answers If-None-Match with an empty 304"""
+        self.publish(make_summary())
+        first = self.client.get('/api/totals')
+        etag = first.headers['ETag']
+        self.assertFalse(etag.startswith('W/'))
+
+        unchanged = self.client.get('/api/totals', headers={'If-None-Match': etag})
+        self.assertEqual(unchanged.status_code, 304)
+        self.assertEqual(unchanged.data, b'')
+        self.assertEqual(unchanged.headers['ETag'], etag)
+
+        self.publish(make_summary(price=101.0))
+        changed = self.client.get('/api/totals', headers={'If-None-Match': etag})
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed.headers['ETag'], etag)
+
+    def test_gzip_large_payload(self):
+        """Test that large payloads are gzipped when the client accepts it"""
+        self.publish(make_summary(count=200))
+
+        response = self.client.get('/api/positions', headers={'Accept-Encoding': 'gzip'})
+
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response.headers['Vary'])
+        self.assertTrue(response.headers['ETag'].endswith('-gzip"'))
+        data = json.loads(gzip.decompress(response.data))
+        self.assertEqual(len(data['positions_by_type']['equity']), 200)
+
+        # A gzip ETag still matches when revalidated
+        etag = response.headers['ETag']
+        unchanged = self.client.get('/api/positions', headers={'Accept-Encoding': 'gzip', 'If-None-Match': etag})
+        self.assertEqual(unchanged.status_code, 304)
+
+    def test_small_payload_uncompressed(self):
+        """Test that small payloads are not compressed"""
+        self.publish(make_summary())
+
+        response = self.client.get('/api/accounts', headers={'Accept-Encoding': 'gzip'})
+
+        self.assertNotIn('Content-Encoding', response.headers)
+
+    def test_position_changes(self):
+        """Test that a delta holds only the rows changed since a version and the new totals"""
+        first = self.publish(make_summary(count=3))
+        summary = make_summary(count=3)
+        summary['positions_by_type']['equity'][1] = make_summary(price=120.0)['positions_by_type']['equity'][0].replace(symbol='SYM1')
+        latest = self.publish(summary)
+
+        response = self.client.get(f'/api/positions/changes?since={first.version}&epoch={first.epoch}')
+
+        data = response.get_json()
+        self.assertFalse(data['full'])
+        self.assertEqual(data['version'], latest.version)
+        self.assertEqual([(change['asset_type'], change['key']) for change in data['changed']], [('equity', 'SYM1')])
+        self.assertEqual(data['changed'][0]['position']['current_price'], 120.0)
+        self.assertEqual(data['added'], [])
+        self.assertEqual(data['removed'], [])
+        self.assertEqual(data['total_market_value'], latest.positions['total_market_value'])
+
+    def test_position_changes_fall_back_to_full(self):
+        """Test that unknown versions and epochs get the full positions"""
+        snapshot = self.publish(make_summary(count=2))
+
+        other = '0' * 8 if snapshot.epoch != '0' * 8 else '1' * 8
+        other_epoch = self.client.get(f'/api/positions/changes?since={snapshot.version}&epoch={other}').get_json()
+        aged_out = self.client.get('/api/positions/changes?since=999999').get_json()
+
+        for data in (other_epoch, aged_out):
+            self.assertTrue(data['full'])
+            self.assertEqual(len(data['positions_by_type']['equity']), 2)
+        self.assertEqual(self.client.get('/api/positions/changes').status_code, 400)
+
+    def test_position_changes_rejects_bad_epoch(self):
+        """Test that an epoch that cannot come from a snapshot is a 400, not a broken ETag"""
+        self.publish(make_summary())
+
+        for epoch in ('a"b', 'other', 'A' * 8):
+            response = self.client.get('/api/positions/changes', query_string={'since': 1, 'epoch': epoch})
+            self.assertEqual(response.status_code, 400)
+
+    def test_position_query(self):
+        """Test that positions are paged, sorted and filtered on the server"""
+        summary = make_summary(count=5)
+        summary['positions_by_type']['equity'] = [
+            position.replace(total_market_value=1000.0 + i) for i, position in enumerate(summary['positions_by_type']['equity'])
+        ]
+        self.publish(summary)
+
+        data = self.client.get('/api/positions/query?asset_type=equity&sort=total_market_value&order=desc'
+                               '&page=2&page_size=2').get_json()
+        filtered = self.client.get('/api/positions/query?asset_type=equity&symbol=sym3&account_id=acct-1').get_json()
+
+        self.assertEqual([position['symbol'] for position in data['positions']], ['SYM2', 'SYM1'])
+        self.assertEqual((data['total'], data['pages'], data['page']), (5, 3, 2))
+        self.assertEqual(data['facets'], {'sectors': ['Technology'], 'accounts': ['acct-1']})
+        self.assertEqual([position['symbol'] for position in filtered['positions']], ['SYM3'])
+        self.assertEqual(self.client.get('/api/positions/query?sort=name').status_code, 400)
+        self.assertEqual(self.client.get('/api/positions/query?page_size=100000').status_code, 400)
+
+    def test_no_snapshot_yet(self):
+        """Test that requests get a 503 with Retry-After instead of waiting forever for a first snapshot"""
+        with patch.object(snapshots, 'latest', return_value=None) as latest:
+            api_response = self.client.get('/api/positions')
+            page_response = self.client.get('/')
+
+        for response in (api_response, page_response):
+            self.assertEqual(response.status_code, 503)
+            self.assertEqual(response.headers['Retry-After'], '5')
+        self.assertIsNotNone(latest.call_args.kwargs['timeout'])
+
+    def test_stream_sends_missed_updates(self):
+        """Test that the event stream replays updates published after the client's version"""
+        first = self.publish(make_summary(count=2))
+        self.publish(make_summary(count=2, price=105.0))
+
+        response = self.client.get(f'/api/stream?since={first.version}&epoch={first.epoch}', buffered=False)
+        try:
+            self.assertEqual(response.mimetype, 'text/event-stream')
+            chunks = iter(response.response)
+            self.assertEqual(next(chunks), b'retry: 5000\n\n')
+            event = next(chunks).decode()
+        finally:
+            response.close()
+
+        self.assertIn('event: prices', event)
+        data = json.loads(event.split('data: ', 1)[1])
+        self.assertEqual(sorted(position['key'] for position in data['positions']), ['SYM0', 'SYM1'])
+        self.assertEqual(data['total_market_value'], 2100.0)
+
+    def test_stream_limit(self):
+        """Test that streams past max_streams are refused instead of holding another request thread"""
+        self.publish(make_summary())
+        price_stream = app.extensions['price_stream']
+
+        with patch.object(type(price_stream), 'clients', new_callable=PropertyMock, return_value=8):
+            response = self.client.get('/api/stream')
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.headers['Retry-After'], '5')
+
+
+if __name__ == '__main__':
+    unittest.main()
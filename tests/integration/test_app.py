@@ -15,7 +15,8 @@ sys.modules['plaid.model.item_public_token_exchange_request'] = MagicMock()
 sys.modules['plaid.model.link_token_create_request'] = MagicMock()
 sys.modules['plaid.model.link_token_create_request_user'] = MagicMock()
 
-from stock_aggregator.main import app
+from stock_aggregator.main import app, brokers_data, fragment_cache, render_position_tables, snapshots
+from stock_aggregator.metrics import registry
 from stock_aggregator.config import Config
 
 class TestApp(unittest.TestCase):
@@ -61,6 +62,8 @@ class TestApp(unittest.TestCase):
         self.app.testing = True
     
     def tearDown(self):
+        snapshots.stop()
+        
         # Clean up the temporary directory
         self.temp_dir.cleanup()
         
@@ -98,6 +101,94 @@ class TestApp(unittest.TestCase):
         # Test the index route
         response = self.app.get('/')
         self.assertEqual(response.status_code, 200)
+        self.assertIn(b'Updated', response.data)
+    
+    @patch('stock_aggregator.services.brokers_data.BrokersDataService.get_positions')
+    @patch('stock_aggregator.services.brokers_data.BrokersDataService.get_accounts')
+    def test_refresh_route(self, mock_get_accounts, mock_get_positions):
+        """Test that a manual refresh rebuilds the snapshot and redirects to the index"""
+        mock_get_positions.return_value = {
+            'positions_by_type': {},
+            'totals': {},
+            'total_market_value': 0.0,
+            'total_unrealized_pl': 0.0
+        }
+        mock_get_accounts.return_value = []
+        calls_before = mock_get_positions.call_count
+        
+        response = self.app.post('/refresh')
+        
+        self.assertEqual(response.status_code, 302)
+        self.assertGreater(mock_get_positions.call_count, calls_before)
+
+    @patch('stock_aggregator.services.brokers_data.BrokersDataService.get_positions')
+    @patch('stock_aggregator.services.brokers_data.BrokersDataService.get_accounts')
+    def test_metrics_route(self, mock_get_accounts, mock_get_positions):
+        """Test that requests report stage timings in a header and in /metrics"""
+        mock_get_positions.return_value = {
+            'positions_by_type': {},
+            'totals': {},
+            'total_market_value': 0.0,
+            'total_unrealized_pl': 0.0
+        }
+        mock_get_accounts.return_value = []
+        
+        response = self.app.get('/')
+        self.assertIn('render;dur=', response.headers['Server-Timing'])
+        self.assertIn('total;dur=', response.headers['Server-Timing'])
+        
+        response = self.app.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.content_type.startswith('text/plain'))
+        self.assertIn(b'stock_aggregator_stage_seconds_count{stage="render"}', response.data)
+        self.assertIn(b'stock_aggregator_http_requests_total{endpoint="index",status="200"}', response.data)
+
+    @patch('stock_aggregator.services.brokers_data.BrokersDataService.get_positions')
+    @patch('stock_aggregator.services.brokers_data.BrokersDataService.get_accounts')
+    def test_index_reuses_rendered_tables(self, mock_get_accounts, mock_get_positions):
+        """Test that position tables are rendered once per snapshot version and asset type"""
+        position = {
+            'symbol': 'AAPL', 'name': 'Apple Inc.', 'sector': 'Technology', 'total_quantity': 10.0,
+            'average_cost_basis': 150.0, 'current_price': 175.0, 'total_market_value': 1750.0,
+            'total_unrealized_pl': 250.0, 'unrealized_pl_percent': 16.67,
+            'accounts': [{'account_id': 'acct-1', 'quantity': 10.0, 'average_price': 150.0,
+                          'unrealized_pl': 250.0}]
+        }
+        mock_get_positions.return_value = {
+            'positions_by_type': {'equity': [position], 'option': [], 'cash': []},
+            'totals': {'equity': {'market_value': 1750.0, 'unrealized_pl': 250.0},
+                       'option': {'market_value': 0.0, 'unrealized_pl': 0.0},
+                       'cash': {'market_value': 0.0, 'unrealized_pl': 0.0}},
+            'total_market_value': 1750.0,
+            'total_unrealized_pl': 250.0
+        }
+        mock_get_accounts.return_value = []
+        fragment_cache.clear()
+        snapshot = snapshots.refresh()
+        registry.reset()
+        
+        with app.test_request_context('/'):
+            first = render_position_tables(snapshot)
+            second = render_position_tables(snapshot)
+            # A new snapshot version renders the table again
+            newer = render_position_tables(snapshot._replace(version=snapshot.version + 1))
+            # So does a new page size from a config reload
+            with patch.dict(brokers_data.config.config, app={'position_page_size': 10}):
+                resized = render_position_tables(snapshot)
+        
+        self.assertEqual(len(first), 1)
+        self.assertIn('id="equityPositionsTable"', first[0])
+        self.assertIn('data-key="AAPL"', first[0])
+        self.assertIs(second[0], first[0])
+        self.assertEqual(newer, first)
+        self.assertIsNot(resized[0], first[0])
+        self.assertEqual(registry.get_timing('render_fragment', asset_type='equity')[0], 3)
+        self.assertEqual(registry.get_counter('cache_requests_total', cache='fragments', tier='local',
+                                              result='hit'), 1)
+        
+        response = self.app.get('/')
+        self.assertIn(b'id="equityPositionsTable"', response.data)
+        self.assertNotIn(b'id="optionsPositionsTable"', response.data)
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,148 @@
+import unittest
+import random
+
+from stock_aggregator.services.aggregation import (
+    aggregate_portfolio,
+    aggregate_positions,
+    aggregate_positions_columnar,
+    aggregate_positions_python,
+    index_positions,
+    revalue_portfolio
+)
+
+
+def make_positions(count, seed=7):
+    """Build raw positions with repeated symbols, fixed income rows and missing quotes."""
+    rng = random.Random(seed)
+    symbols = [f'SYM{i}' for i in range(max(1, count // 4))] + ['912828XYZ1']
+    positions = []
+    for i in range(count):
+        symbol = rng.choice(symbols)
+        positions.append({
+            'symbol': symbol,
+            'name': f'{symbol} Inc',
+            'sector': 'Technology' if i % 2 else '',
+            'quantity': rng.choice([rng.uniform(-50, 500), 0.0, 1000.0]),
+            'average_price': rng.uniform(1, 300),
+            'current_price': rng.uniform(1, 300),
+            'asset_type': 'fixed_income' if symbol == '912828XYZ1' else 'equity',
+            'account_id': f'acct-{rng.randint(1, 5)}'
+        })
+    return positions
+
+
+class AggregationAssertions:
+    def assertSameAggregation(self, expected, actual):
+        """Assert two aggregations match up to float rounding"""
+        self.assertEqual([agg['symbol'] for agg in actual], [agg['symbol'] for agg in expected])
+        for want, got in zip(expected, actual):
+            for key in ('name', 'sector'):
+                self.assertEqual(got[key], want[key])
+            for key in ('total_quantity', 'average_cost_basis', 'current_price', 'total_market_value',
+                        'total_unrealized_pl', 'unrealized_pl_percent'):
+                self.assertAlmostEqual(got[key], want[key], places=6, msg=f"{want['symbol']} {key}")
+            self.assertEqual(len(got['accounts']), len(want['accounts']))
+            for want_account, got_account in zip(want['accounts'], got['accounts']):
+                self.assertEqual(got_account.keys(), want_account.keys())
+                for key, value in want_account.items():
+                    if isinstance(value, str):
+                        self.assertEqual(got_account[key], value)
+                    else:
+                        self.assertAlmostEqual(got_account[key], value, places=6)
+
+
+class TestAggregationEngines(AggregationAssertions, unittest.TestCase):
+    def test_columnar_matches_python(self):
+        """Test that the NumPy engine reproduces the row-by-row engine"""
+        for count in (1, 10, 257):
+            positions = make_positions(count, seed=count)
+            # Leave some symbols unquoted so the position price fallback is exercised
+            quotes = {position['symbol']: 100.0 + i for i, position in enumerate(positions) if i % 3}
+
+            self.assertSameAggregation(aggregate_positions_python(positions, quotes),
+                                       aggregate_positions_columnar(positions, quotes))
+
+    def test_empty_positions(self):
+        """Test that both engines return nothing for an empty book"""
+        self.assertEqual(aggregate_positions_columnar([], {}), [])
+        self.assertEqual(aggregate_positions([], {}, 'numpy'), [])
+
+    def test_auto_engine_output(self):
+        """Test that the auto engine returns plain Python floats"""
+        positions = make_positions(100)
+
+        aggregated = aggregate_positions(positions, {})
+
+        self.assertIs(type(aggregated[0]['total_market_value']), float)
+        self.assertIs(type(aggregated[0]['accounts'][0]['market_value']), float)
+
+
+class TestAggregatePortfolio(AggregationAssertions, unittest.TestCase):
+    def setUp(self):
+        self.positions_by_type = {
+            'equity': make_positions(40, seed=1),
+            'option': make_positions(5, seed=2),
+            'collective_investment': [],
+            'fixed_income': make_positions(8, seed=3),
+            'other': [],
+            'cash': [{'symbol': 'CASH', 'market_value': 1500.0}, {'symbol': 'CASH', 'market_value': 500.0}]
+        }
+        self.quotes = {'SYM1': 42.0, 'SYM2': 17.5}
+
+    def test_totals_match_aggregated_positions(self):
+        """Test that running totals equal the sums over the aggregated positions"""
+        for engine in ('python', 'numpy'):
+            summary = aggregate_portfolio(self.positions_by_type, self.quotes, engine)
+
+            for asset_type, positions in summary['positions_by_type'].items():
+                if asset_type == 'cash':
+                    continue
+                self.assertAlmostEqual(summary['totals'][asset_type]['market_value'],
+                                       sum(agg['total_market_value'] for agg in positions), places=6)
+                self.assertAlmostEqual(summary['totals'][asset_type]['unrealized_pl'],
+                                       sum(agg['total_unrealized_pl'] for agg in positions), places=6)
+            self.assertEqual(summary['totals']['cash'], {'market_value': 2000.0, 'unrealized_pl': 0.0})
+            self.assertAlmostEqual(summary['total_market_value'],
+                                   sum(totals['market_value'] for totals in summary['totals'].values()), places=6)
+
+    def test_matches_per_type_aggregation(self):
+        """Test that the single pass builds the same positions as aggregating each type"""
+        summary = aggregate_portfolio(self.positions_by_type, self.quotes, 'python')
+
+        for asset_type in ('equity', 'option', 'fixed_income'):
+            self.assertEqual(summary['positions_by_type'][asset_type],
+                             aggregate_positions_python(self.positions_by_type[asset_type], self.quotes))
+        self.assertIs(summary['positions_by_type']['cash'], self.positions_by_type['cash'])
+
+    def test_revalue_matches_full_aggregation(self):
+        """Test that repricing the book equals aggregating again with the new quotes"""
+        summary = aggregate_portfolio(self.positions_by_type, self.quotes, 'python')
+        new_quotes = dict(self.quotes, SYM1=50.0, SYM3=9.0)
+
+        revalued = revalue_portfolio(summary, index_positions(self.positions_by_type), new_quotes)
+        expected = aggregate_portfolio(self.positions_by_type, new_quotes, 'python')
+
+        self.assertEqual(sorted(set(revalued['repriced'])), ['SYM1', 'SYM3'])
+        for asset_type in ('equity', 'option', 'fixed_income'):
+            self.assertSameAggregation(expected['positions_by_type'][asset_type],
+                                       revalued['positions_by_type'][asset_type])
+            for key in ('market_value', 'unrealized_pl'):
+                self.assertAlmostEqual(revalued['totals'][asset_type][key], expected['totals'][asset_type][key], places=6)
+        self.assertAlmostEqual(revalued['total_market_value'], expected['total_market_value'], places=6)
+        self.assertAlmostEqual(revalued['total_unrealized_pl'], expected['total_unrealized_pl'], places=6)
+
+    def test_revalue_leaves_unmoved_positions_alone(self):
+        """Test that unchanged prices reuse positions and leave the input summary untouched"""
+        summary = aggregate_portfolio(self.positions_by_type, self.quotes, 'python')
+        equity = summary['positions_by_type']['equity']
+        sym1 = next(agg for agg in equity if agg['symbol'] == 'SYM1')
+
+        revalued = revalue_portfolio(summary, index_positions(self.positions_by_type), dict(self.quotes, SYM1=43.0))
+
+        self.assertEqual(sym1['current_price'], 42.0)
+        self.assertIs(revalued['positions_by_type']['option'], summary['positions_by_type']['option'])
+        unmoved = [agg for agg in revalued['positions_by_type']['equity'] if agg['symbol'] != 'SYM1']
+        self.assertTrue(all(any(agg is original for original in equity) for agg in unmoved))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,259 @@
+import unittest
+import tempfile
+import os
+import threading
+import asyncio
+import time
+import yaml
+from unittest.mock import patch
+
+from stock_aggregator.brokers.base import AsyncBroker, SyncBrokerAdapter
+from stock_aggregator.services.brokers_data import BrokersDataService
+
+
+class FakeBroker:
+    """Broker stand-in that returns canned data, optionally after a delay."""
+
+    def __init__(self, connection_id, delay=0.0, accounts=None, positions=None):
+        self.connection_id = connection_id
+        self.delay = delay
+        self.release = threading.Event()
+        self.accounts = accounts if accounts is not None else [{'id': f'{connection_id}-1', 'balance': 100.0}]
+        self.positions = positions if positions is not None else {'equity': [], 'cash': []}
+        self.error = None
+        self.closed = False
+        self.calls = 0
+
+    def _wait(self):
+        self.calls += 1
+        if self.delay:
+            self.release.wait(self.delay)
+        if self.error is not None:
+            raise self.error
+
+    def get_accounts(self):
+        self._wait()
+        return self.accounts
+
+    def get_all_positions(self):
+        self._wait()
+        return self.positions
+
+    def close(self):
+        self.closed = True
+
+
+class FakeAsyncBroker(AsyncBroker):
+    """Native async broker stand-in that sleeps on the event loop."""
+
+    def __init__(self, broker, delay=0.1):
+        super().__init__(broker)
+        self.delay = delay
+        self.closed = False
+
+    async def get_accounts(self):
+        await asyncio.sleep(self.delay)
+        return self.broker.accounts
+
+    async def get_all_positions(self):
+        await asyncio.sleep(self.delay)
+        return self.broker.positions
+
+    async def aclose(self):
+        self.closed = True
+
+
+class TestBrokersDataFanOut(unittest.TestCase):
+    async_brokers = False
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.config_path = os.path.join(self.temp_dir.name, 'config.yml')
+        config_data = {
+            'brokers': [
+                {'type': 'fake', 'id': 'fast', 'enabled': True},
+                {'type': 'fake', 'id': 'slow', 'enabled': True, 'timeout_seconds': 0.2}
+            ],
+            'app': {'broker_workers': 4, 'broker_timeout_seconds': 5, 'async_brokers': self.async_brokers}
+        }
+        with open(self.config_path, 'w') as f:
+            yaml.dump(config_data, f)
+        self.previous_config = os.environ.get('STOCK_AGGREGATOR_CONFIG')
+        os.environ['STOCK_AGGREGATOR_CONFIG'] = self.config_path
+
+        self.service = BrokersDataService()
+        self.fast = FakeBroker('fast')
+        self.slow = FakeBroker('slow')
+        self.service.brokers = {'fast': self.fast, 'slow': self.slow}
+
+    def tearDown(self):
+        self.slow.release.set()
+        self.service.close()
+        self.temp_dir.cleanup()
+        if self.previous_config is None:
+            os.environ.pop('STOCK_AGGREGATOR_CONFIG', None)
+        else:
+            os.environ['STOCK_AGGREGATOR_CONFIG'] = self.previous_config
+
+    def test_accounts_from_all_connections(self):
+        """Test that results from every connection are combined"""
+        accounts = self.service.get_accounts()
+
+        self.assertEqual({account['id'] for account in accounts}, {'fast-1', 'slow-1'})
+        status = self.service.get_connection_status()
+        self.assertFalse(status['fast']['get_accounts']['stale'])
+        self.assertIsNotNone(status['fast']['get_accounts']['latency_ms'])
+
+    def test_late_connection_uses_last_good_result(self):
+        """Test that a connection past its deadline serves its last result marked stale"""
+        self.service.get_accounts()
+        self.slow.delay = 5.0
+
+        accounts = self.service.get_accounts()
+
+        slow_accounts = [account for account in accounts if account['id'] == 'slow-1']
+        self.assertEqual(len(slow_accounts), 1)
+        self.assertTrue(slow_accounts[0]['stale'])
+        status = self.service.get_connection_status()
+        self.assertTrue(status['slow']['get_accounts']['stale'])
+        self.assertIn('timed out', status['slow']['get_accounts']['error'])
+        self.assertFalse(status['fast']['get_accounts']['stale'])
+
+    def test_failing_connection_served_stale(self):
+        """Test that a broker error keeps the last good result instead of replacing it"""
+        self.service.get_accounts()
+        self.fast.error = RuntimeError('api down')
+
+        accounts = self.service.get_accounts()
+        self.fast.error = None
+        self.slow.error = RuntimeError('api down')
+        accounts_again = self.service.get_accounts()
+
+        self.assertIn('fast-1', [account['id'] for account in accounts])
+        status = self.service.get_connection_status()
+        self.assertTrue(status['slow']['get_accounts']['stale'])
+        self.assertIn('api down', status['slow']['get_accounts']['error'])
+        self.assertEqual(sorted(account['id'] for account in accounts_again), ['fast-1', 'slow-1'])
+
+    @patch.dict('stock_aggregator.services.brokers_data.BROKER_TYPES', {'fake': FakeBroker})
+    def test_dropped_connections_are_closed(self):
+        """Test that brokers removed on reload, and all brokers on shutdown, are closed"""
+        self.service.brokers = {'fast': self.fast, 'slow': self.slow, 'gone': FakeBroker('gone')}
+        gone = self.service.brokers['gone']
+        self.fast.is_enabled = self.slow.is_enabled = lambda: True
+
+        self.service._initialize_brokers()
+
+        self.assertTrue(gone.closed)
+        self.assertFalse(self.fast.closed or self.slow.closed)
+        self.service.close()
+        self.assertTrue(self.fast.closed and self.slow.closed)
+
+    def test_late_connection_without_history_is_skipped(self):
+        """Test that a late connection with no previous result is left out"""
+        self.slow.delay = 5.0
+
+        accounts = self.service.get_accounts()
+
+        self.assertEqual([account['id'] for account in accounts], ['fast-1'])
+
+    def test_in_flight_call_not_repeated(self):
+        """Test that a still-running call is awaited instead of started again"""
+        self.slow.delay = 5.0
+        self.service.get_accounts()
+        self.service.get_accounts()
+
+        self.assertEqual(self.slow.calls, 1)
+
+    def test_revalue_positions_skips_brokers(self):
+        """Test that a price update reprices the last holdings without calling brokers"""
+        self.fast.positions = {'equity': [{
+            'symbol': 'AAPL', 'name': 'Apple', 'quantity': 10.0, 'average_price': 100.0,
+            'current_price': 110.0, 'asset_type': 'equity', 'account_id': 'fast-1'
+        }], 'cash': []}
+        self.service.market_data.get_quotes = lambda symbols, refresh=False: {'AAPL': 120.0 if refresh else 110.0}
+        synced = self.service.get_positions()
+        calls = self.fast.calls
+
+        positions_data = self.service.revalue_positions()
+
+        self.assertEqual(self.fast.calls, calls)
+        self.assertEqual(positions_data['version'], synced['version'] + 1)
+        changes = self.service.history.changes_since(synced['version'])
+        self.assertEqual(list(changes['changed']), [('equity', 'AAPL')])
+        self.assertEqual(positions_data['repriced'], ['AAPL'])
+        self.assertEqual(positions_data['positions_by_type']['equity'][0]['total_market_value'], 1200.0)
+        self.assertEqual(positions_data['totals']['equity']['unrealized_pl'], 200.0)
+
+    def test_flat_revaluation_keeps_version(self):
+        """Test that a price update that moved nothing records no new version"""
+        self.fast.positions = {'equity': [{
+            'symbol': 'AAPL', 'name': 'Apple', 'quantity': 10.0, 'average_price': 100.0,
+            'current_price': 110.0, 'asset_type': 'equity', 'account_id': 'fast-1'
+        }], 'cash': []}
+        self.service.market_data.get_quotes = lambda symbols, refresh=False: {'AAPL': 110.0}
+        synced = self.service.get_positions()
+
+        positions_data = self.service.revalue_positions()
+
+        self.assertEqual(positions_data['repriced'], [])
+        self.assertEqual(positions_data['version'], synced['version'])
+        self.assertEqual(self.service.history.version, synced['version'])
+
+    def test_positions_report_stale_connections(self):
+        """Test that get_positions lists connections served from stale data"""
+        self.service.get_positions()
+        self.slow.delay = 5.0
+
+        positions_data = self.service.get_positions()
+
+        self.assertEqual(positions_data['stale_connections'], ['slow'])
+
+
+class TestBrokersDataAsyncPipeline(TestBrokersDataFanOut):
+    """Run the fan-out tests through the event loop pipeline."""
+    async_brokers = True
+
+    def test_sync_brokers_use_adapter(self):
+        """Test that brokers without an async implementation are wrapped"""
+        self.service.get_accounts()
+
+        self.assertIsInstance(self.service._async_brokers['fast'], SyncBrokerAdapter)
+
+    @patch.dict('stock_aggregator.services.brokers_data.ASYNC_BROKER_TYPES', {'fake': FakeAsyncBroker})
+    @patch.dict('stock_aggregator.services.brokers_data.BROKER_TYPES', {'fake': FakeBroker})
+    def test_native_async_brokers_share_one_loop(self):
+        """Test that many async connections are awaited together, not one worker each"""
+        self.service.brokers = {f'conn{i}': FakeBroker(f'conn{i}') for i in range(20)}
+        self.service.config.get_broker_connection = lambda connection_id: {'type': 'fake'}
+
+        started = time.monotonic()
+        accounts = self.service.get_accounts()
+        elapsed = time.monotonic() - started
+
+        self.assertEqual(len(accounts), 20)
+        self.assertIsInstance(self.service._async_brokers['conn0'], FakeAsyncBroker)
+        # 20 connections sleeping 0.1s each with 4 workers would take 0.5s if run on threads
+        self.assertLess(elapsed, 0.4)
+    @patch.dict('stock_aggregator.services.brokers_data.ASYNC_BROKER_TYPES', {'fake': FakeAsyncBroker})
+    @patch.dict('stock_aggregator.services.brokers_data.BROKER_TYPES', {'fake': FakeBroker})
+    def test_dropped_async_brokers_are_closed(self):
+        """Test that async interfaces of connections removed on reload are dropped and closed"""
+        self.service.brokers = {'fast': self.fast, 'slow': self.slow, 'gone': FakeBroker('gone')}
+        self.service.config.get_broker_connection = lambda connection_id: {'type': 'fake'}
+        self.service.get_accounts()
+        gone = self.service._async_brokers['gone']
+        kept = self.service._async_brokers['fast']
+        self.fast.is_enabled = self.slow.is_enabled = lambda: True
+
+        self.service._initialize_brokers()
+        self.service._run_async(asyncio.sleep(0))
+
+        self.assertTrue(gone.closed)
+        self.assertNotIn('gone', self.service._async_brokers)
+        self.assertIs(self.service._async_brokers['fast'], kept)
+        self.assertFalse(kept.closed)
+
+
+if __name__ == '__main__':
+    unittest.main()
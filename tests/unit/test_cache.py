@@ -0,0 +1,96 @@
+import unittest
+from unittest.mock import patch
+
+from stock_aggregator.services.cache import NegativeCache, TTLCache
+
+
+class TestTTLCache(unittest.TestCase):
+    def test_get_and_set(self):
+        """Test basic storage and hit/miss counting"""
+        cache = TTLCache(max_entries=10, ttl=60)
+        cache.set('AAPL', 1)
+
+        self.assertEqual(cache.get('AAPL'), 1)
+        self.assertIsNone(cache.get('MSFT'))
+        self.assertEqual(cache.stats()['hits'], 1)
+        self.assertEqual(cache.stats()['misses'], 1)
+
+    def test_lru_eviction(self):
+        """Test that the least recently used entry is evicted when full"""
+        cache = TTLCache(max_entries=2, ttl=60)
+        cache.set('A', 1)
+        cache.set('B', 2)
+        cache.get('A')
+        cache.set('C', 3)
+
+        self.assertIn('A', cache)
+        self.assertNotIn('B', cache)
+        self.assertIn('C', cache)
+        self.assertEqual(cache.stats()['evictions'], 1)
+
+    @patch('stock_aggregator.services.cache.time.monotonic')
+    def test_expiry(self, mock_monotonic):
+        """Test default and per-entry TTLs"""
+        mock_monotonic.return_value = 100.0
+        cache = TTLCache(max_entries=10, ttl=60)
+        cache.set('A', 1)
+        cache.set('B', 2, ttl=5)
+
+        mock_monotonic.return_value = 110.0
+        self.assertEqual(cache.get('A'), 1)
+        self.assertIsNone(cache.get('B'))
+
+        mock_monotonic.return_value = 161.0
+        self.assertIsNone(cache.get('A'))
+        self.assertEqual(len(cache), 0)
+
+    def test_configure_trims(self):
+        """Test that shrinking max_entries evicts the oldest entries"""
+        cache = TTLCache(max_entries=5, ttl=60)
+        for i in range(5):
+            cache.set(i, i)
+        cache.configure(max_entries=2)
+
+        self.assertEqual(len(cache), 2)
+        self.assertIn(4, cache)
+        self.assertEqual(cache.stats()['evictions'], 3)
+
+
+class TestNegativeCache(unittest.TestCase):
+    @patch('stock_aggregator.services.cache.time.monotonic')
+    def test_exponential_backoff(self, mock_monotonic):
+        """Test that each consecutive failure doubles the block time up to the cap"""
+        mock_monotonic.return_value = 0.0
+        cache = NegativeCache(base_ttl=10, max_ttl=30)
+
+        self.assertEqual(cache.record_failure('BAD'), 10)
+        self.assertEqual(cache.record_failure('BAD'), 20)
+        self.assertEqual(cache.record_failure('BAD'), 30)
+
+    @patch('stock_aggregator.services.cache.time.monotonic')
+    def test_block_and_hits(self, mock_monotonic):
+        """Test that blocked lookups are counted until the entry expires"""
+        mock_monotonic.return_value = 0.0
+        cache = NegativeCache(base_ttl=10, max_ttl=30)
+        cache.record_failure('BAD', '404')
+
+        self.assertTrue(cache.is_blocked('BAD'))
+        self.assertTrue(cache.is_blocked('BAD'))
+        self.assertFalse(cache.is_blocked('GOOD'))
+        self.assertEqual(cache.entries()['BAD']['hits'], 2)
+        self.assertEqual(cache.entries()['BAD']['error'], '404')
+
+        mock_monotonic.return_value = 11.0
+        self.assertFalse(cache.is_blocked('BAD'))
+
+    def test_success_resets(self):
+        """Test that a successful lookup clears the failure history"""
+        cache = NegativeCache(base_ttl=10, max_ttl=30)
+        cache.record_failure('BAD')
+        cache.record_success('BAD')
+
+        self.assertFalse(cache.is_blocked('BAD'))
+        self.assertEqual(cache.record_failure('BAD'), 10)
+
+if __name__ == '__main__':
+    unittest.main()
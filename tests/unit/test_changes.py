@@ -0,0 +1,74 @@
+import unittest
+
+from stock_aggregator.records import AggregatedPosition
+from stock_aggregator.services.changes import ChangeHistory, diff_positions
+
+
+def make_row(symbol, price):
+    return AggregatedPosition(symbol=symbol, name=symbol, sector='', total_quantity=10.0,
+                              average_cost_basis=50.0, current_price=price, total_market_value=10 * price,
+                              total_unrealized_pl=10 * (price - 50.0), unrealized_pl_percent=0.0, accounts=())
+
+
+def make_cash(account_id, amount):
+    return {'symbol': 'CASH', 'market_value': amount, 'accounts': [{'account_id': account_id}]}
+
+
+class TestChangeHistory(unittest.TestCase):
+    def test_diff(self):
+        """Test that rows are classified as added, changed or removed"""
+        shared = make_row('KEEP', 10.0)
+        previous = {('equity', 'KEEP'): shared, ('equity', 'MOVE'): make_row('MOVE', 10.0),
+                    ('equity', 'GONE'): make_row('GONE', 10.0)}
+        current = {('equity', 'KEEP'): shared, ('equity', 'MOVE'): make_row('MOVE', 11.0),
+                   ('equity', 'NEW'): make_row('NEW', 10.0)}
+
+        changes = diff_positions(previous, current)
+
+        self.assertEqual(list(changes['added']), [('equity', 'NEW')])
+        self.assertEqual(list(changes['changed']), [('equity', 'MOVE')])
+        self.assertEqual(changes['removed'], [('equity', 'GONE')])
+
+    def test_versions_and_net_changes(self):
+        """Test that changes across several versions are merged into one delta"""
+        history = ChangeHistory()
+        first = history.record({'equity': [make_row('AAPL', 10.0), make_row('MSFT', 20.0)],
+                                'cash': [make_cash('acct-1', 5.0), make_cash('acct-2', 6.0)]})
+        history.record({'equity': [make_row('AAPL', 11.0), make_row('MSFT', 20.0)],
+                        'cash': [make_cash('acct-1', 5.0), make_cash('acct-2', 7.0)]})
+        latest = history.record({'equity': [make_row('AAPL', 12.0), make_row('IBM', 30.0)],
+                                 'cash': [make_cash('acct-1', 5.0), make_cash('acct-2', 7.0)]})
+
+        self.assertEqual((first, latest), (1, 3))
+        changes = history.changes_since(first)
+        self.assertEqual(changes['changed'][('equity', 'AAPL')]['current_price'], 12.0)
+        self.assertEqual(changes['changed'][('cash', 'acct-2')]['market_value'], 7.0)
+        self.assertEqual(list(changes['added']), [('equity', 'IBM')])
+        self.assertEqual(changes['removed'], [('equity', 'MSFT')])
+        self.assertEqual(history.changes_since(latest), {'added': {}, 'changed': {}, 'removed': []})
+
+        # Version 0 is the empty portfolio, so everything is added
+        self.assertEqual(len(history.changes_since(0)['added']), 4)
+
+    def test_added_then_removed_is_dropped(self):
+        """Test that a row added and removed within the window is not reported"""
+        history = ChangeHistory()
+        base = history.record({'equity': [make_row('AAPL', 10.0)]})
+        history.record({'equity': [make_row('AAPL', 10.0), make_row('TEMP', 1.0)]})
+        history.record({'equity': [make_row('AAPL', 10.0)]})
+
+        self.assertEqual(history.changes_since(base), {'added': {}, 'changed': {}, 'removed': []})
+
+    def test_aged_out_version(self):
+        """Test that versions older than the kept history are not answered"""
+        history = ChangeHistory(max_versions=2)
+        for price in (10.0, 11.0, 12.0, 13.0):
+            history.record({'equity': [make_row('AAPL', price)]})
+
+        self.assertIsNone(history.changes_since(1))
+        self.assertIsNotNone(history.changes_since(2))
+        self.assertIsNone(history.changes_since(9))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,6 +2,7 @@ import unittest
 import os
 import tempfile
 import yaml
+from unittest.mock import patch
 from stock_aggregator.config import Config
 
 class TestConfig(unittest.TestCase):
@@ -90,5 +91,54 @@ class TestConfig(unittest.TestCase):
         self.assertFalse(config.is_broker_enabled('test2'))
         self.assertFalse(config.is_broker_enabled('non_existent'))
 
+    def test_config_parsed_once(self):
+        """Test that Config instances for the same file share one parse"""
+        first = Config(config_path=self.config_path)
+        second = Config(config_path=self.config_path)
+        self.assertIs(first._parsed, second._parsed)
+        self.assertIs(first.config, second.config)
+    
+    @patch('stock_aggregator.config.RELOAD_CHECK_INTERVAL', 0)
+    def test_reload_on_mtime_change(self):
+        """Test that edits to the file are picked up without a new Config"""
+        config = Config(config_path=self.config_path)
+        generation = config.generation
+        self.assertFalse(config.is_broker_enabled('test2'))
+        
+        self.config_data['brokers'][1]['enabled'] = True
+        with open(self.config_path, 'w') as f:
+            yaml.dump(self.config_data, f)
+        stat = os.stat(self.config_path)
+        os.utime(self.config_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+        
+        self.assertTrue(config.is_broker_enabled('test2'))
+        self.assertEqual(config.generation, generation + 1)
+    
+    @patch('stock_aggregator.config.RELOAD_CHECK_INTERVAL', 0)
+    def test_unchanged_file_not_reparsed(self):
+        """Test that lookups without a file change reuse the parsed config"""
+        config = Config(config_path=self.config_path)
+        generation = config.generation
+        
+        with patch('stock_aggregator.config.yaml.safe_load') as mock_load:
+            config.get_broker_connection('test1')
+            config.is_broker_enabled('test2')
+            mock_load.assert_not_called()
+        self.assertEqual(config.generation, generation)
+    
+    @patch('stock_aggregator.config.RELOAD_CHECK_INTERVAL', 0)
+    def test_failed_reload_logged(self):
+        """Test that a broken edit is logged and the last good config kept"""
+        config = Config(config_path=self.config_path)
+        
+        with open(self.config_path, 'w') as f:
+            f.write('brokers: [unclosed\n')
+        stat = os.stat(self.config_path)
+        os.utime(self.config_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+        
+        with self.assertLogs('stock_aggregator.config', level='ERROR') as logs:
+            self.assertTrue(config.is_broker_enabled('test1'))
+        self.assertIn(self.config_path, logs.output[0])
+
 if __name__ == '__main__':
     unittest.main()
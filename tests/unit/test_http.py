@@ -0,0 +1,76 @@
+import unittest
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from stock_aggregator.brokers.http import build_session
+
+
+class FlakyHandler(BaseHTTPRequestHandler):
+    """Answers 503 for the first `failures` requests, then 200."""
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        server = self.server
+        server.hits += 1
+        status = 503 if server.hits <= server.failures else 200
+        body = b'{}'
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestBrokerSession(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), FlakyHandler)
+        self.server.hits = 0
+        self.server.failures = 0
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/accounts"
+        self.session = build_session({'backoff_factor': 0, 'max_retries': 3})
+
+    def tearDown(self):
+        self.session.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_default_timeout(self):
+        """Test that connection settings become the default request timeout"""
+        session = build_session({'connect_timeout': 2, 'read_timeout': 7})
+
+        self.assertEqual(session.timeout, (2.0, 7.0))
+
+    def test_keep_alive_reuses_connection(self):
+        """Test that repeated requests share one pooled connection"""
+        for _ in range(3):
+            self.session.get(self.url).raise_for_status()
+
+        stats = self.session.connection_stats()
+        self.assertEqual(stats['requests'], 3)
+        self.assertEqual(stats['connections_opened'], 1)
+
+    def test_retries_server_errors(self):
+        """Test that 5xx responses are retried and counted"""
+        self.server.failures = 2
+
+        response = self.session.get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.session.connection_stats()['retries'], 2)
+
+    def test_retries_are_bounded(self):
+        """Test that the final error response is returned once retries run out"""
+        self.server.failures = 10
+
+        response = self.session.get(self.url)
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(self.server.hits, 4)
+
+if __name__ == '__main__':
+    unittest.main()
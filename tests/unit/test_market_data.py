@@ -0,0 +1,214 @@
+import unittest
+import asyncio
+from unittest.mock import patch, MagicMock, PropertyMock
+
+import pandas as pd
+
+from stock_aggregator.services.cache import NegativeCache, TTLCache
+from stock_aggregator.services.market_data import MarketDataService
+
+
+def make_download_frame(prices):
+    """Build a DataFrame shaped like yf.download(..., group_by='ticker')."""
+    columns = pd.MultiIndex.from_product([list(prices.keys()), ['Open', 'Close']])
+    rows = []
+    for day in range(2):
+        row = []
+        for price in prices.values():
+            row.extend([price - 1, price + day])
+        rows.append(row)
+    return pd.DataFrame(rows, columns=columns)
+
+
+class TestMarketDataQuotes(unittest.TestCase):
+    def setUp(self):
+        self.market_data = MarketDataService(cache=TTLCache(), chain_cache=TTLCache(), negative_cache=NegativeCache(),
+                                             price_cache=TTLCache(ttl=10))
+
+    @patch('stock_aggregator.services.market_data.yf.download')
+    def test_get_quotes_uses_single_bulk_download(self, mock_download):
+        """Test that a cold lookup of many tickers costs one bulk request"""
+        mock_download.return_value = make_download_frame({'AAPL': 100.0, 'MSFT': 200.0})
+
+        quotes = self.market_data.get_quotes(['AAPL', 'MSFT', 'AAPL'])
+
+        self.assertEqual(mock_download.call_count, 1)
+        self.assertEqual(mock_download.call_args[0][0], ['AAPL', 'MSFT'])
+        self.assertEqual(quotes, {'AAPL': 101.0, 'MSFT': 201.0})
+
+    @patch('stock_aggregator.services.market_data.yf.download')
+    def test_get_quotes_fills_cache(self, mock_download):
+        """Test that prices from a bulk download serve later single lookups"""
+        mock_download.return_value = make_download_frame({'AAPL': 100.0})
+
+        self.market_data.get_quotes(['AAPL'])
+        self.assertEqual(self.market_data.get_current_price('AAPL'), 101.0)
+
+        self.market_data.get_quotes(['AAPL'])
+        self.assertEqual(mock_download.call_count, 1)
+
+    @patch('stock_aggregator.services.market_data.yf.Ticker')
+    @patch('stock_aggregator.services.market_data.yf.download')
+    def test_get_quotes_leaves_stock_info_alone(self, mock_download, mock_ticker):
+        """Test that a bulk download does not stand in for a stock info lookup"""
+        mock_download.return_value = make_download_frame({'AAPL': 100.0})
+        mock_ticker.return_value.info = {'longName': 'Apple Inc.', 'regularMarketPrice': 190.0,
+                                         'sector': 'Technology'}
+
+        self.market_data.get_quotes(['AAPL'])
+        info = self.market_data.get_stock_info('AAPL')
+
+        self.assertEqual((info['name'], info['sector']), ('Apple Inc.', 'Technology'))
+        mock_ticker.assert_called_once_with('AAPL')
+
+    @patch('stock_aggregator.services.market_data.yf.download')
+    def test_refresh_reuses_recent_downloads(self, mock_download):
+        """Test that a refresh downloads again only once the price cache entry expired"""
+        mock_download.return_value = make_download_frame({'AAPL': 100.0})
+
+        self.market_data.get_quotes(['AAPL'], refresh=True)
+        self.market_data.get_quotes(['AAPL'], refresh=True)
+        self.assertEqual(mock_download.call_count, 1)
+
+        self.market_data._prices.clear()
+        self.market_data.get_quotes(['AAPL'], refresh=True)
+        self.assertEqual(mock_download.call_count, 2)
+
+    @patch('stock_aggregator.services.market_data.yf.download')
+    def test_get_quotes_missing_symbol(self, mock_download):
+        """Test that symbols absent from the download get a zero price"""
+        mock_download.return_value = make_download_frame({'AAPL': 100.0})
+
+        quotes = self.market_data.get_quotes(['AAPL', 'ZZZZ'])
+
+        self.assertEqual(quotes['ZZZZ'], 0.0)
+
+    @patch('stock_aggregator.services.market_data.yf.download')
+    def test_get_quotes_skips_fixed_income(self, mock_download):
+        """Test that CUSIPs are not sent to the bulk download"""
+        quotes = self.market_data.get_quotes(['912828XYZ1'])
+
+        mock_download.assert_not_called()
+        self.assertEqual(quotes, {'912828XYZ1': 0.0})
+
+    @patch('stock_aggregator.services.market_data.QUOTE_BATCH_SIZE', 1)
+    @patch('stock_aggregator.services.market_data.yf.download')
+    def test_get_quotes_async_gathers_batches(self, mock_download):
+        """Test that the async variant downloads every batch and fills the cache"""
+        mock_download.side_effect = lambda symbols, **kwargs: make_download_frame({symbols[0]: 100.0})
+
+        quotes = asyncio.run(self.market_data.get_quotes_async(['AAPL', 'MSFT']))
+
+        self.assertEqual(mock_download.call_count, 2)
+        self.assertEqual(quotes, {'AAPL': 101.0, 'MSFT': 101.0})
+        self.assertEqual(self.market_data.get_current_price('MSFT'), 101.0)
+
+
+class TestMarketDataOptionChains(unittest.TestCase):
+    def setUp(self):
+        self.market_data = MarketDataService(cache=TTLCache(), chain_cache=TTLCache(), negative_cache=NegativeCache(),
+                                             price_cache=TTLCache(ttl=10))
+        self.options = MagicMock()
+        self.options.calls = pd.DataFrame({'strike': [580.0, 585.0], 'lastPrice': [7.5, 4.25]})
+        self.options.puts = pd.DataFrame({'strike': [585.0], 'lastPrice': [3.1]})
+
+    @patch('stock_aggregator.services.market_data.yf.Ticker')
+    def test_chain_downloaded_once_per_expiration(self, mock_ticker):
+        """Test that contracts sharing an expiry reuse one chain download"""
+        mock_ticker.return_value.option_chain.return_value = self.options
+
+        call_price = self.market_data._get_option_price('SPY   250829C00585000')
+        put_price = self.market_data._get_option_price('SPY   250829P00585000')
+        other_price = self.market_data._get_option_price('SPY   250829C00580000')
+
+        self.assertEqual(call_price, 4.25)
+        self.assertEqual(put_price, 3.1)
+        self.assertEqual(other_price, 7.5)
+        mock_ticker.return_value.option_chain.assert_called_once_with('2025-08-29')
+
+    @patch('stock_aggregator.services.market_data.yf.Ticker')
+    def test_unknown_strike(self, mock_ticker):
+        """Test that a strike missing from the chain prices at zero"""
+        mock_ticker.return_value.option_chain.return_value = self.options
+
+        self.assertEqual(self.market_data._get_option_price('SPY   250829C00999000'), 0.0)
+
+    @patch('stock_aggregator.services.market_data.yf.Ticker')
+    def test_get_option_chain_shares_cache(self, mock_ticker):
+        """Test that get_option_chain reads chains cached by option pricing"""
+        mock_ticker.return_value.option_chain.return_value = self.options
+
+        self.market_data._get_option_price('SPY   250829C00585000')
+        chain = self.market_data.get_option_chain('SPY', '2025-08-29')
+
+        self.assertEqual(len(chain['calls']), 2)
+        self.assertEqual(len(chain['puts']), 1)
+        mock_ticker.return_value.option_chain.assert_called_once()
+        self.assertEqual(self.market_data.cache_stats()['option_chains']['hits'], 1)
+
+
+class TestMarketDataNegativeCache(unittest.TestCase):
+    def setUp(self):
+        self.market_data = MarketDataService(cache=TTLCache(), chain_cache=TTLCache(), negative_cache=NegativeCache(),
+                                             price_cache=TTLCache(ttl=10))
+
+    @patch('stock_aggregator.services.market_data.yf.Ticker')
+    def test_failed_lookup_not_retried(self, mock_ticker):
+        """Test that a failing symbol is not refetched while backing off"""
+        type(mock_ticker.return_value).info = PropertyMock(side_effect=Exception('404 Not Found'))
+
+        self.assertEqual(self.market_data.get_current_price('DELISTED'), 0.0)
+        self.assertEqual(self.market_data.get_current_price('DELISTED'), 0.0)
+
+        self.assertEqual(mock_ticker.call_count, 1)
+        failing = self.market_data.get_failing_symbols()
+        self.assertEqual(failing['DELISTED']['hits'], 1)
+        self.assertEqual(self.market_data.cache_stats()['negative']['entries'], 1)
+
+    @patch('stock_aggregator.services.market_data.yf.download')
+    def test_missing_quotes_not_refetched(self, mock_download):
+        """Test that symbols missing from a bulk download are skipped next time"""
+        mock_download.return_value = make_download_frame({'AAPL': 100.0})
+
+        self.market_data.get_quotes(['AAPL', 'ZZZZ'])
+        self.market_data.get_quotes(['ZZZZ'])
+
+        self.assertEqual(mock_download.call_count, 1)
+
+    @patch('stock_aggregator.services.market_data.yf.download')
+    def test_failed_download_retried(self, mock_download):
+        """Test that a failed or empty bulk download puts no symbol on backoff"""
+        mock_download.side_effect = [ConnectionError('network down'), make_download_frame({}),
+                                     make_download_frame({'AAPL': 100.0, 'MSFT': 200.0})]
+
+        self.assertEqual(self.market_data.get_quotes(['AAPL', 'MSFT']), {'AAPL': 0.0, 'MSFT': 0.0})
+        self.market_data.get_quotes(['AAPL', 'MSFT'])
+        quotes = self.market_data.get_quotes(['AAPL', 'MSFT'])
+
+        self.assertEqual(mock_download.call_count, 3)
+        self.assertEqual(quotes, {'AAPL': 101.0, 'MSFT': 201.0})
+        self.assertEqual(self.market_data.get_failing_symbols(), {})
+
+    @patch('stock_aggregator.services.market_data.yf.Ticker')
+    def test_expired_option_chain_not_refetched(self, mock_ticker):
+        """Test that a failing option chain is not downloaded for every contract"""
+        mock_ticker.return_value.option_chain.side_effect = ValueError('Expiration not found')
+
+        self.market_data._get_option_price('SPY   200117C00300000')
+        self.market_data._get_option_price('SPY   200117P00300000')
+
+        mock_ticker.return_value.option_chain.assert_called_once()
+
+
+class TestSharedCache(unittest.TestCase):
+    def test_instances_share_process_cache(self):
+        """Test that default MarketDataService instances use one quote cache"""
+        first = MarketDataService()
+        second = MarketDataService()
+
+        self.assertIs(first._cache, second._cache)
+        self.assertIs(first._chain_cache, second._chain_cache)
+        self.assertIs(first._prices, second._prices)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+import unittest
+import tempfile
+import os
+import yaml
+from types import SimpleNamespace
+from unittest.mock import patch, MagicMock
+
+from stock_aggregator.brokers.merrill import MerrillBroker
+
+
+def make_security(symbol, quantity, cost_basis, current_price):
+    return SimpleNamespace(ticker_symbol=symbol, name=f'{symbol} Inc', quantity=quantity,
+                           cost_basis=cost_basis, current_price=current_price, type='equity')
+
+
+def make_account(account_id, securities):
+    return SimpleNamespace(account_id=account_id, name=f'Account {account_id}', type='investment',
+                           subtype='brokerage', balances=SimpleNamespace(current=500.0),
+                           securities=securities)
+
+
+@patch('stock_aggregator.brokers.merrill.AccountsBalanceGetRequest', MagicMock(), create=True)
+class TestMerrillBalancesSnapshot(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.config_path = os.path.join(self.temp_dir.name, 'config.yml')
+        config_data = {
+            'brokers': [
+                {'type': 'merrill', 'id': 'merrill_test', 'enabled': True, 'use_mock': True}
+            ]
+        }
+        with open(self.config_path, 'w') as f:
+            yaml.dump(config_data, f)
+        self.previous_config = os.environ.get('STOCK_AGGREGATOR_CONFIG')
+        os.environ['STOCK_AGGREGATOR_CONFIG'] = self.config_path
+
+        self.broker = MerrillBroker('merrill_test')
+        self.broker.use_mock = False
+        self.broker.access_token = 'token'
+        self.broker.client = MagicMock()
+        self.broker.client.accounts_balance_get.return_value = SimpleNamespace(accounts=[
+            make_account(f'acct-{i}', [make_security('IBM', 10, 100.0, 120.0)])
+            for i in range(8)
+        ])
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+        if self.previous_config is None:
+            os.environ.pop('STOCK_AGGREGATOR_CONFIG', None)
+        else:
+            os.environ['STOCK_AGGREGATOR_CONFIG'] = self.previous_config
+
+    def test_all_positions_single_plaid_call(self):
+        """Test that eight accounts cost one Plaid call for accounts and positions"""
+        positions = self.broker.get_all_positions()
+        accounts = self.broker.get_accounts()
+
+        self.assertEqual(self.broker.client.accounts_balance_get.call_count, 1)
+        self.assertEqual(len(positions['equity']), 8)
+        self.assertEqual(len(positions['cash']), 8)
+        self.assertEqual(len(accounts), 8)
+
+    def test_get_positions_served_from_split(self):
+        """Test that per-account positions come from the cached split"""
+        positions = self.broker.get_positions('acct-3')
+
+        self.assertEqual(len(positions), 1)
+        self.assertEqual(positions[0]['account_id'], 'acct-3')
+        self.assertEqual(positions[0]['unrealized_pl'], 200.0)
+        self.assertEqual(self.broker.get_positions('missing'), [])
+        self.assertEqual(self.broker.client.accounts_balance_get.call_count, 1)
+
+    def test_plaid_errors_propagate(self):
+        """Test that a failing Plaid call raises instead of looking like an empty book"""
+        self.broker.client.accounts_balance_get.side_effect = RuntimeError('plaid down')
+
+        with self.assertRaises(RuntimeError):
+            self.broker.get_all_positions()
+        with self.assertRaises(RuntimeError):
+            self.broker.get_accounts()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+import unittest
+
+from stock_aggregator import metrics
+from stock_aggregator.metrics import MetricsRegistry, server_timing_header
+
+
+class TestMetricsRegistry(unittest.TestCase):
+    def test_counters(self):
+        """Test that counters add up per label set"""
+        registry = MetricsRegistry()
+        registry.inc('outbound_calls_total', service='yfinance', endpoint='download')
+        registry.inc('outbound_calls_total', 2, service='yfinance', endpoint='download')
+        registry.inc('outbound_calls_total', service='schwab', endpoint='accounts')
+
+        self.assertEqual(registry.get_counter('outbound_calls_total', endpoint='download', service='yfinance'), 3)
+        self.assertEqual(registry.get_counter('outbound_calls_total', service='plaid', endpoint='x'), 0)
+
+    def test_render_prometheus_text(self):
+        """Test the exposition format of histograms and counters"""
+        registry = MetricsRegistry(buckets=(0.1, 1.0))
+        registry.observe('render', 0.05)
+        registry.observe('render', 0.5)
+        registry.inc('errors_total', stage='quote "batch"')
+
+        text = registry.render()
+
+        self.assertIn('# TYPE stock_aggregator_stage_seconds histogram', text)
+        self.assertIn('stock_aggregator_stage_seconds_bucket{stage="render",le="0.1"} 1', text)
+        self.assertIn('stock_aggregator_stage_seconds_bucket{stage="render",le="1.0"} 2', text)
+        self.assertIn('stock_aggregator_stage_seconds_bucket{stage="render",le="+Inf"} 2', text)
+        self.assertIn('stock_aggregator_stage_seconds_count{stage="render"} 2', text)
+        self.assertIn('stock_aggregator_stage_seconds_sum{stage="render"} 0.55', text)
+        self.assertIn('# TYPE stock_aggregator_errors_total counter', text)
+        self.assertIn('stock_aggregator_errors_total{stage="quote \\"batch\\""} 1', text)
+
+
+class TestTimed(unittest.TestCase):
+    def setUp(self):
+        metrics.registry.reset()
+
+    def test_timed_records_stage(self):
+        """Test that a timed block is observed under its stage"""
+        with metrics.timed('aggregation'):
+            pass
+
+        observed, _ = metrics.registry.get_timing('aggregation')
+        self.assertEqual(observed, 1)
+
+    def test_timed_counts_errors(self):
+        """Test that an exception escaping a stage counts as an error and still records the time"""
+        with self.assertRaises(ValueError):
+            with metrics.timed('schwab_accounts'):
+                raise ValueError('boom')
+
+        self.assertEqual(metrics.registry.get_counter('errors_total', stage='schwab_accounts'), 1)
+        self.assertEqual(metrics.registry.get_timing('schwab_accounts')[0], 1)
+
+    def test_request_spans(self):
+        """Test that spans are collected per request and summed by stage"""
+        with metrics.timed('outside'):
+            pass
+        metrics.start_request()
+        with metrics.timed('quotes'):
+            pass
+        with metrics.timed('render'):
+            pass
+        with metrics.timed('quotes'):
+            pass
+        spans = metrics.finish_request()
+
+        self.assertEqual([stage for stage, _ in spans], ['quotes', 'render'])
+        self.assertEqual(metrics.finish_request(), [])
+        self.assertEqual(server_timing_header([('render', 0.0125)]), 'render;dur=12.5')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+import unittest
+
+from stock_aggregator.records import AccountBreakdown, AggregatedPosition
+from stock_aggregator.services.position_index import PositionIndex
+
+
+def make_row(symbol, value, pl, sector='Technology', accounts=('acct-1',)):
+    return AggregatedPosition(
+        symbol=symbol, name=symbol, sector=sector, total_quantity=1.0, average_cost_basis=value - pl,
+        current_price=value, total_market_value=value, total_unrealized_pl=pl,
+        unrealized_pl_percent=pl / (value - pl) * 100,
+        accounts=tuple(AccountBreakdown(account_id=account_id, quantity=1.0, average_price=value - pl,
+                                        market_value=value, total_cost=value - pl, unrealized_pl=pl)
+                       for account_id in accounts)
+    )
+
+
+def symbols(result):
+    return [row['symbol'] for row in result['positions']]
+
+
+class TestPositionIndex(unittest.TestCase):
+    def setUp(self):
+        self.index = PositionIndex({
+            'equity': [
+                make_row('MSFT', 400.0, 100.0),
+                make_row('AAPL', 200.0, -20.0, accounts=('acct-1', 'acct-2')),
+                make_row('AMZN', 300.0, 10.0, sector='Consumer', accounts=('acct-2',)),
+                make_row('XOM', 100.0, 40.0, sector='Energy')
+            ],
+            'collective_investment': [make_row('VTI', 250.0, 50.0, sector='')],
+            'cash': [{'symbol': 'CASH', 'market_value': 1000.0, 'accounts': [{'account_id': 'acct-1'}]}]
+        })
+
+    def test_sorted_pages(self):
+        """Test that pages are slices of the requested order within an asset type"""
+        first = self.index.query(asset_type='equity', page_size=3)
+        second = self.index.query(asset_type='equity', page=2, page_size=3)
+        by_value = self.index.query(asset_type='equity', sort='total_market_value', descending=True)
+        by_percent = self.index.query(asset_type='equity', sort='unrealized_pl_percent')
+
+        self.assertEqual(symbols(first), ['AAPL', 'AMZN', 'MSFT'])
+        self.assertEqual(symbols(second), ['XOM'])
+        self.assertEqual((first['total'], first['pages']), (4, 2))
+        self.assertEqual(symbols(by_value), ['MSFT', 'AMZN', 'AAPL', 'XOM'])
+        self.assertEqual(symbols(by_percent), ['AAPL', 'AMZN', 'MSFT', 'XOM'])
+
+    def test_filters(self):
+        """Test filtering by symbol prefix, sector and account, alone and combined"""
+        self.assertEqual(symbols(self.index.query(symbol='a')), ['AAPL', 'AMZN'])
+        self.assertEqual(symbols(self.index.query(asset_type='equity', sector='Technology')), ['AAPL', 'MSFT'])
+        self.assertEqual(symbols(self.index.query(account_id='acct-2', sort='total_unrealized_pl',
+                                                  descending=True)), ['AMZN', 'AAPL'])
+        self.assertEqual(symbols(self.index.query(symbol='A', account_id='acct-1')), ['AAPL'])
+        self.assertEqual(self.index.query(asset_type='equity', sector='Utilities')['total'], 0)
+        self.assertEqual(self.index.query(asset_type='option')['positions'], [])
+
+    def test_filtered_pages(self):
+        """Test that filtered results are paged in sort order"""
+        result = self.index.query(account_id='acct-1', sort='total_market_value', page=2, page_size=2)
+
+        self.assertEqual(symbols(result), ['VTI', 'MSFT'])
+        self.assertEqual((result['total'], result['pages']), (4, 2))
+
+    def test_facets(self):
+        """Test that sectors and accounts are listed per asset type"""
+        self.assertEqual(self.index.facets('equity'),
+                         {'sectors': ['Consumer', 'Energy', 'Technology'], 'accounts': ['acct-1', 'acct-2']})
+        self.assertEqual(self.index.facets('collective_investment'), {'sectors': [], 'accounts': ['acct-1']})
+
+    def test_cash_not_indexed(self):
+        """Test that cash balances are left out of queries and facets"""
+        self.assertEqual(len(self.index), 5)
+        self.assertNotIn('CASH', symbols(self.index.query(page_size=10)))
+        self.assertEqual(self.index.query(asset_type='cash')['total'], 0)
+        self.assertEqual(self.index.facets('cash'), {'sectors': [], 'accounts': []})
+
+    def test_unknown_sort(self):
+        """Test that only indexed fields can be sorted on"""
+        with self.assertRaises(ValueError):
+            self.index.query(sort='name')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+import unittest
+
+from flask import Flask, render_template_string
+
+from stock_aggregator.records import AccountBreakdown, AggregatedPosition, RawPosition
+
+
+def make_aggregated():
+    account = AccountBreakdown(account_id='acct-1', quantity=10.0, average_price=100.0,
+                               market_value=1200.0, total_cost=1000.0, unrealized_pl=200.0)
+    return AggregatedPosition(symbol='AAPL', name='Apple', sector='', total_quantity=10.0,
+                              average_cost_basis=100.0, current_price=120.0, total_market_value=1200.0,
+                              total_unrealized_pl=200.0, unrealized_pl_percent=20.0, accounts=(account,))
+
+
+class TestRecords(unittest.TestCase):
+    def test_mapping_view(self):
+        """Test that records read like the dicts they replace"""
+        position = RawPosition(symbol='AAPL', quantity=10.0, average_price=100.0, current_price=120.0)
+
+        self.assertEqual(position['symbol'], 'AAPL')
+        self.assertEqual(position.get('sector', 'n/a'), '')
+        self.assertIsNone(position.get('missing'))
+        self.assertIn('quantity', position)
+        self.assertEqual(dict(position)['asset_type'], 'other')
+        with self.assertRaises(KeyError):
+            position['missing']
+
+    def test_slotted(self):
+        """Test that records carry no per-instance dict"""
+        self.assertFalse(hasattr(RawPosition(symbol='AAPL', quantity=1.0), '__dict__'))
+        self.assertFalse(hasattr(make_aggregated(), '__dict__'))
+
+    def test_required_and_unknown_fields(self):
+        """Test that missing required fields and unknown fields are rejected"""
+        with self.assertRaises(TypeError):
+            RawPosition(quantity=1.0)
+        with self.assertRaises(TypeError):
+            RawPosition(symbol='AAPL', quantity=1.0, colour='red')
+
+    def test_replace_and_to_dict(self):
+        """Test that replace copies and to_dict converts nested records"""
+        aggregated = make_aggregated()
+
+        repriced = aggregated.replace(current_price=130.0)
+
+        self.assertEqual(aggregated.current_price, 120.0)
+        self.assertEqual(repriced.current_price, 130.0)
+        self.assertIs(repriced.accounts, aggregated.accounts)
+        self.assertEqual(repriced.to_dict()['accounts'][0]['account_id'], 'acct-1')
+        self.assertEqual(aggregated, dict(aggregated))
+
+    def test_template_access(self):
+        """Test that Jinja attribute and item access both work"""
+        app = Flask(__name__)
+        with app.app_context():
+            html = render_template_string(
+                "{{ p.symbol }} {{ p['total_quantity'] }}{% for a in p.accounts %} {{ a.account_id }}{% endfor %}",
+                p=make_aggregated()
+            )
+
+        self.assertEqual(html, 'AAPL 10.0 acct-1')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,119 @@
+import unittest
+from unittest.mock import patch, MagicMock
+
+import pandas as pd
+
+from stock_aggregator.services.cache import NegativeCache, RedisCache, TTLCache
+from stock_aggregator.services.market_data import MarketDataService, set_offline
+
+
+class FakeRedis:
+    """In-memory stand-in for the subset of the redis client used by RedisCache."""
+
+    def __init__(self):
+        self.store = {}
+        self.expiries = {}
+
+    def get(self, name):
+        return self.store.get(name)
+
+    def set(self, name, value, ex=None):
+        self.store[name] = value
+        self.expiries[name] = ex
+        return True
+
+    def delete(self, name):
+        self.store.pop(name, None)
+        return 1
+
+
+class TestRedisCache(unittest.TestCase):
+    def setUp(self):
+        self.client = FakeRedis()
+        self.cache = RedisCache(self.client, ttl=120)
+
+    def test_round_trip(self):
+        """Test that values survive serialization with the default TTL"""
+        self.cache.set('quote:AAPL', {'name': 'Apple', 'current_price': 190.5})
+
+        self.assertEqual(self.cache.get('quote:AAPL'), {'name': 'Apple', 'current_price': 190.5})
+        self.assertEqual(self.client.expiries['stock_aggregator:quote:AAPL'], 120)
+
+    def test_large_values_compressed(self):
+        """Test that large payloads are stored compressed"""
+        records = [{'strike': float(i), 'lastPrice': 1.0} for i in range(200)]
+        self.cache.set('chain:SPY:2025-08-29', {'calls': records, 'puts': []})
+
+        payload = self.client.store['stock_aggregator:chain:SPY:2025-08-29']
+        self.assertTrue(payload.startswith(b'z'))
+        self.assertEqual(self.cache.get('chain:SPY:2025-08-29')['calls'], records)
+
+    def test_errors_are_misses(self):
+        """Test that Redis failures fall back to a cache miss"""
+        client = MagicMock()
+        client.get.side_effect = ConnectionError('down')
+        cache = RedisCache(client)
+
+        self.assertIsNone(cache.get('quote:AAPL'))
+        self.assertEqual(cache.stats()['errors'], 1)
+
+
+class TestMarketDataRedisTier(unittest.TestCase):
+    def setUp(self):
+        self.remote = RedisCache(FakeRedis())
+
+    def make_service(self):
+        """Simulate a separate worker: fresh local caches, shared Redis"""
+        return MarketDataService(cache=TTLCache(), chain_cache=TTLCache(), price_cache=TTLCache(ttl=10),
+                                 remote_cache=self.remote, negative_cache=NegativeCache())
+
+    @patch('stock_aggregator.services.market_data.yf.Ticker')
+    def test_quote_shared_across_workers(self, mock_ticker):
+        """Test that a quote fetched by one worker serves another"""
+        mock_ticker.return_value.info = {'longName': 'Apple Inc.', 'regularMarketPrice': 190.0}
+
+        self.assertEqual(self.make_service().get_current_price('AAPL'), 190.0)
+        self.assertEqual(self.make_service().get_current_price('AAPL'), 190.0)
+        self.assertEqual(mock_ticker.call_count, 1)
+
+    @patch('stock_aggregator.services.market_data.yf.download')
+    def test_refreshed_prices_shared_across_workers(self, mock_download):
+        """Test that a price refresh downloaded by one worker serves other workers' refreshes"""
+        mock_download.return_value = pd.DataFrame({'Close': [189.0, 190.0]})
+
+        first = self.make_service().get_quotes(['AAPL'], refresh=True)
+        second = self.make_service().get_quotes(['AAPL'], refresh=True)
+
+        self.assertEqual(first, second)
+        self.assertEqual(second, {'AAPL': 190.0})
+        self.assertEqual(mock_download.call_count, 1)
+
+    @patch('stock_aggregator.services.market_data.yf.Ticker')
+    def test_chain_shared_across_workers(self, mock_ticker):
+        """Test that option chains are shared and re-indexed after loading"""
+        options = MagicMock()
+        options.calls = pd.DataFrame({'strike': [585.0], 'lastPrice': [4.25]})
+        options.puts = pd.DataFrame({'strike': [585.0], 'lastPrice': [3.1]})
+        mock_ticker.return_value.option_chain.return_value = options
+
+        self.make_service()._get_option_price('SPY   250829C00585000')
+        price = self.make_service()._get_option_price('SPY   250829P00585000')
+
+        self.assertEqual(price, 3.1)
+        mock_ticker.return_value.option_chain.assert_called_once()
+
+    @patch('stock_aggregator.services.market_data.yf.Ticker')
+    def test_offline_reads_shared_chains(self, mock_ticker):
+        """Test that offline workers still price options from chains in Redis"""
+        self.remote.set('chain:SPY:2025-08-29', {'calls': [{'strike': 585.0, 'lastPrice': 4.25}], 'puts': []})
+        set_offline(True)
+        try:
+            price = self.make_service()._get_option_price('SPY   250829C00585000')
+        finally:
+            set_offline(False)
+
+        self.assertEqual(price, 4.25)
+        mock_ticker.assert_not_called()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,198 @@
+import unittest
+import asyncio
+import tempfile
+import os
+import yaml
+from unittest.mock import patch, MagicMock
+
+from stock_aggregator.brokers.http import DEFAULT_HTTP_SETTINGS
+from stock_aggregator.brokers.schwab import HTTPX_AVAILABLE, AsyncSchwabBroker, SchwabBroker
+
+
+ACCOUNTS_PAYLOAD = [
+    {
+        'securitiesAccount': {
+            'accountNumber': '12345678',
+            'type': 'MARGIN',
+            'currentBalances': {'cashBalance': 1000.0, 'liquidationValue': 21000.0},
+            'positions': [
+                {
+                    'instrument': {'symbol': 'AAPL', 'description': 'Apple Inc', 'assetType': 'EQUITY'},
+                    'longQuantity': 100.0,
+                    'shortQuantity': 0.0,
+                    'averagePrice': 150.0,
+                    'marketValue': 20000.0,
+                    'unrealizedGainLoss': 5000.0
+                }
+            ]
+        }
+    }
+]
+
+
+class TestSchwabAccountSnapshot(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.config_path = os.path.join(self.temp_dir.name, 'config.yml')
+        config_data = {
+            'brokers': [
+                {
+                    'type': 'schwab',
+                    'id': 'schwab_test',
+                    'enabled': True,
+                    'use_mock': False,
+                    'token_store_path': os.path.join(self.temp_dir.name, 'tokens.json'),
+                    'credentials': {
+                        'client_id': 'test_client_id',
+                        'client_secret': 'test_client_secret',
+                        'refresh_token': 'test_refresh_token'
+                    }
+                }
+            ]
+        }
+        with open(self.config_path, 'w') as f:
+            yaml.dump(config_data, f)
+        self.previous_config = os.environ.get('STOCK_AGGREGATOR_CONFIG')
+        os.environ['STOCK_AGGREGATOR_CONFIG'] = self.config_path
+
+        self.broker = SchwabBroker('schwab_test')
+        self.broker.get_access_token = MagicMock(return_value='token')
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+        if self.previous_config is None:
+            os.environ.pop('STOCK_AGGREGATOR_CONFIG', None)
+        else:
+            os.environ['STOCK_AGGREGATOR_CONFIG'] = self.previous_config
+
+    @patch('stock_aggregator.brokers.http.BrokerSession.get')
+    def test_positions_and_accounts_share_one_request(self, mock_get):
+        """Test that positions and accounts are derived from one /accounts call"""
+        mock_get.return_value.json.return_value = ACCOUNTS_PAYLOAD
+
+        positions = self.broker.get_all_positions()
+        accounts = self.broker.get_accounts()
+
+        self.assertEqual(mock_get.call_count, 1)
+        self.assertIn('fields=positions', mock_get.call_args[0][0])
+        self.assertEqual(self.broker.get_access_token.call_count, 1)
+        self.assertEqual(positions['equity'][0]['symbol'], 'AAPL')
+        self.assertEqual(positions['cash'][0]['market_value'], 1000.0)
+        self.assertEqual(accounts[0]['id'], '12345678')
+        self.assertEqual(accounts[0]['balance'], 21000.0)
+
+    @patch('stock_aggregator.brokers.http.BrokerSession.get')
+    def test_invalidate_cache_refetches(self, mock_get):
+        """Test that a new refresh cycle fetches a fresh snapshot"""
+        mock_get.return_value.json.return_value = ACCOUNTS_PAYLOAD
+
+        self.broker.get_all_positions()
+        self.broker.invalidate_cache()
+        self.broker.get_accounts()
+
+        self.assertEqual(mock_get.call_count, 2)
+
+    @patch('stock_aggregator.brokers.http.BrokerSession.get')
+    def test_api_errors_propagate(self, mock_get):
+        """Test that a failing /accounts call raises instead of looking like an empty book"""
+        mock_get.side_effect = ConnectionError('schwab down')
+
+        with self.assertRaises(ConnectionError):
+            self.broker.get_all_positions()
+        with self.assertRaises(ConnectionError):
+            self.broker.get_accounts()
+
+    def test_close_stops_token_refresher(self):
+        """Test that closing a connection ends its token refresh thread"""
+        self.broker._start_token_refresher()
+
+        self.broker.close()
+        self.broker._refresher.join(timeout=5)
+
+        self.assertFalse(self.broker._refresher.is_alive())
+
+    @patch('stock_aggregator.config.RELOAD_CHECK_INTERVAL', 0)
+    def test_picks_up_config_changes(self):
+        """Test that edited connection settings apply without a restart"""
+        with open(self.config_path) as f:
+            config_data = yaml.safe_load(f)
+        config_data['brokers'][0]['snapshot_ttl_seconds'] = 5
+        with open(self.config_path, 'w') as f:
+            yaml.dump(config_data, f)
+        stat = os.stat(self.config_path)
+        os.utime(self.config_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+        self.assertTrue(self.broker.is_enabled())
+        self.assertEqual(self.broker.snapshot_ttl.total_seconds(), 5)
+        self.assertEqual(self.broker.refresh_token, 'test_refresh_token')
+
+    @unittest.skipUnless(HTTPX_AVAILABLE, "httpx is not installed")
+    def test_async_broker_shares_snapshot(self):
+        """Test that the async broker fetches once and shares the snapshot with the sync broker"""
+        import httpx
+        requests_seen = []
+
+        def handler(request):
+            requests_seen.append(request)
+            return httpx.Response(200, json=ACCOUNTS_PAYLOAD)
+
+        self.broker.access_token = 'token'
+        self.broker.has_valid_token = MagicMock(return_value=True)
+        async_broker = AsyncSchwabBroker(self.broker)
+        async_broker._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        async_broker._client_settings = dict(DEFAULT_HTTP_SETTINGS)
+
+        async def fetch():
+            try:
+                return await async_broker.get_all_positions(), await async_broker.get_accounts()
+            finally:
+                await async_broker.aclose()
+
+        positions, accounts = asyncio.run(fetch())
+
+        self.assertEqual(len(requests_seen), 1)
+        self.assertEqual(requests_seen[0].headers['Authorization'], 'Bearer token')
+        self.assertEqual(positions['equity'][0]['symbol'], 'AAPL')
+        self.assertEqual(accounts[0]['id'], '12345678')
+        self.assertEqual(self.broker.get_accounts()[0]['id'], '12345678')
+
+    @unittest.skipUnless(HTTPX_AVAILABLE, "httpx is not installed")
+    def test_async_client_closed_on_settings_change(self):
+        """Test that changing http settings closes the old async client before building a new one"""
+        async_broker = AsyncSchwabBroker(self.broker)
+
+        async def rebuild():
+            first = await async_broker._get_client()
+            self.broker.connection = dict(self.broker.connection or {}, http={'pool_maxsize': 3})
+            second = await async_broker._get_client()
+            await async_broker.aclose()
+            return first, second
+
+        first, second = asyncio.run(rebuild())
+
+        self.assertIsNot(first, second)
+        self.assertTrue(first.is_closed)
+        self.assertTrue(second.is_closed)
+
+    @patch('stock_aggregator.brokers.http.BrokerSession.post')
+    def test_token_shared_between_workers(self, mock_post):
+        """Test that a token refreshed by one worker is reused by another"""
+        mock_post.return_value.json.return_value = {
+            'access_token': 'shared_access',
+            'refresh_token': 'rotated_refresh',
+            'expires_in': 1800
+        }
+        first = SchwabBroker('schwab_test')
+        second = SchwabBroker('schwab_test')
+        try:
+            self.assertEqual(first.get_access_token(), 'shared_access')
+            self.assertEqual(second.get_access_token(), 'shared_access')
+        finally:
+            first.stop_token_refresher()
+            second.stop_token_refresher()
+
+        self.assertEqual(mock_post.call_count, 1)
+        self.assertEqual(second.refresh_token, 'rotated_refresh')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,130 @@
+import unittest
+import threading
+import time
+from unittest.mock import MagicMock
+
+from stock_aggregator.services.snapshot import SnapshotScheduler
+
+
+class FakeBrokersData:
+    """BrokersDataService stand-in that counts rebuilds."""
+
+    def __init__(self):
+        self.config = MagicMock()
+        self.config.config = {'app': {'snapshot_interval_seconds': 60}}
+        self.calls = 0
+        self.revaluations = 0
+        self.invalidations = 0
+        self.repriced = ['AAPL']
+
+    def get_positions(self):
+        self.calls += 1
+        return {'positions_by_type': {}, 'total_market_value': float(self.calls)}
+
+    def revalue_positions(self):
+        self.revaluations += 1
+        return {'positions_by_type': {}, 'total_market_value': 100.0 + self.revaluations,
+                'repriced': list(self.repriced)}
+
+    def get_accounts(self):
+        return []
+
+    def invalidate_caches(self):
+        self.invalidations += 1
+
+
+class TestSnapshotScheduler(unittest.TestCase):
+    def setUp(self):
+        self.brokers_data = FakeBrokersData()
+        self.scheduler = SnapshotScheduler(self.brokers_data)
+
+    def tearDown(self):
+        self.scheduler.stop()
+
+    def test_background_refresh_publishes_snapshot(self):
+        """Test that starting the scheduler publishes a first snapshot"""
+        self.scheduler.start()
+
+        snapshot = self.scheduler.latest(timeout=5)
+
+        self.assertEqual(snapshot.version, 1)
+        self.assertEqual(snapshot.positions['total_market_value'], 1.0)
+        self.assertGreaterEqual(snapshot.age_seconds(), 0)
+
+    def test_latest_does_not_rebuild(self):
+        """Test that reading the snapshot never calls the brokers"""
+        self.scheduler.refresh()
+
+        for _ in range(5):
+            self.scheduler.latest(timeout=0)
+
+        self.assertEqual(self.brokers_data.calls, 1)
+
+    def test_refresh_publishes_new_version(self):
+        """Test that each refresh publishes a new immutable snapshot"""
+        first = self.scheduler.refresh()
+        second = self.scheduler.refresh(invalidate=True)
+
+        self.assertEqual((first.version, second.version), (1, 2))
+        self.assertEqual(first.positions['total_market_value'], 1.0)
+        self.assertIs(self.scheduler.latest(timeout=0), second)
+        self.assertEqual(self.brokers_data.invalidations, 1)
+        with self.assertRaises(AttributeError):
+            second.version = 3
+
+    def test_revalue_keeps_accounts_and_skips_sync(self):
+        """Test that a price-only update publishes a new version without a broker sync"""
+        first = self.scheduler.refresh()
+
+        revalued = self.scheduler.revalue()
+
+        self.assertEqual(revalued.version, 2)
+        self.assertEqual(self.brokers_data.calls, 1)
+        self.assertEqual(revalued.positions['total_market_value'], 101.0)
+        self.assertIs(revalued.accounts, first.accounts)
+
+    def test_flat_revaluation_publishes_nothing(self):
+        """Test that a price-only update that moved nothing keeps the current snapshot"""
+        first = self.scheduler.refresh()
+        self.brokers_data.repriced = []
+
+        revalued = self.scheduler.revalue()
+
+        self.assertIs(revalued, first)
+        self.assertIs(self.scheduler.latest(timeout=0), first)
+
+    def test_background_loop_revalues_between_syncs(self):
+        """Test that the scheduler reprices on the fast interval and syncs on the slow one"""
+        scheduler = SnapshotScheduler(self.brokers_data, interval=60, price_interval=0.01)
+        scheduler.start()
+        try:
+            for _ in range(200):
+                if self.brokers_data.revaluations >= 2:
+                    break
+                time.sleep(0.01)
+        finally:
+            scheduler.stop()
+
+        self.assertGreaterEqual(self.brokers_data.revaluations, 2)
+        self.assertEqual(self.brokers_data.calls, 1)
+
+    def test_request_refresh_wakes_scheduler(self):
+        """Test that a manual trigger rebuilds before the interval elapses"""
+        self.scheduler.start()
+        self.scheduler.latest(timeout=5)
+        published = threading.Event()
+        original_refresh = self.scheduler.refresh
+
+        def refresh(invalidate=False):
+            snapshot = original_refresh(invalidate)
+            published.set()
+            return snapshot
+
+        self.scheduler.refresh = refresh
+        self.scheduler.request_refresh()
+
+        self.assertTrue(published.wait(5))
+        self.assertEqual(self.scheduler.latest(timeout=0).version, 2)
+
+if __name__ == '__main__':
+    unittest.main()
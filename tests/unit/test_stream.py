@@ -0,0 +1,153 @@
+import unittest
+import json
+import threading
+
+from stock_aggregator.records import AccountBreakdown, AggregatedPosition
+from stock_aggregator.services.changes import ChangeHistory
+from stock_aggregator.services.snapshot import PortfolioSnapshot
+from stock_aggregator.services.stream import PriceStream
+
+
+def make_snapshot(history, prices, epoch='e1', quantity=10.0):
+    """Record a portfolio in the change history and wrap it in a snapshot of that version"""
+    positions = []
+    for symbol, price in prices.items():
+        positions.append(AggregatedPosition(
+            symbol=symbol, name=symbol, sector='', total_quantity=quantity, average_cost_basis=50.0,
+            current_price=price, total_market_value=quantity * price, total_unrealized_pl=quantity * (price - 50.0),
+            unrealized_pl_percent=(price / 50.0 - 1) * 100,
+            accounts=(AccountBreakdown(account_id='acct-1', quantity=quantity, average_price=50.0,
+                                       market_value=quantity * price, total_cost=quantity * 50.0,
+                                       unrealized_pl=quantity * (price - 50.0)),)
+        ))
+    market_value = sum(position.total_market_value for position in positions)
+    version = history.record({'equity': positions, 'cash': []})
+    return PortfolioSnapshot(
+        version=version, created_at=0.0, accounts=[], duration_ms=0.0, epoch=epoch,
+        positions={
+            'positions_by_type': {'equity': positions, 'cash': []},
+            'totals': {'equity': {'market_value': market_value, 'unrealized_pl': market_value - quantity * 50.0 * len(positions)}},
+            'total_market_value': market_value,
+            'total_unrealized_pl': market_value - quantity * 50.0 * len(positions),
+            'version': version
+        }
+    )
+
+
+def parse_event(payload):
+    fields = dict(line.split(': ', 1) for line in payload.decode().strip().split('\n'))
+    return fields['id'], fields['event'], json.loads(fields['data'])
+
+
+class TestPriceStream(unittest.TestCase):
+    def setUp(self):
+        self.history = ChangeHistory()
+        self.stream = PriceStream(self.history, backlog=3, heartbeat=0.05)
+        self.stream.publish(make_snapshot(self.history, {'AAPL': 100.0, 'MSFT': 200.0}))
+
+    def tearDown(self):
+        self.stream.close()
+
+    def test_price_event(self):
+        """Test that a repriced snapshot becomes one event with only the changed rows"""
+        events = self.stream.events('e1', 1)
+        self.assertEqual(next(events), b'retry: 5000\n\n')
+
+        self.stream.publish(make_snapshot(self.history, {'AAPL': 110.0, 'MSFT': 200.0}))
+        event_id, event, data = parse_event(next(events))
+
+        self.assertEqual((event_id, event), ('e1-2', 'prices'))
+        self.assertEqual([position['key'] for position in data['positions']], ['AAPL'])
+        self.assertEqual(data['positions'][0]['current_price'], 110.0)
+        self.assertEqual(data['positions'][0]['accounts'][0]['unrealized_pl'], 600.0)
+        self.assertEqual(data['total_market_value'], 3100.0)
+
+    def test_holdings_event(self):
+        """Test that added or removed positions ask clients to reload"""
+        self.stream.publish(make_snapshot(self.history, {'AAPL': 100.0}))
+
+        events = self.stream.events('e1', 2, last_event_id='e1-1')
+        next(events)
+        _, event, data = parse_event(next(events))
+
+        self.assertEqual(event, 'holdings')
+        self.assertEqual(data['version'], 2)
+
+    def test_quantity_change_reloads(self):
+        """Test that a row whose quantity changed asks clients to reload instead of patching prices"""
+        self.stream.publish(make_snapshot(self.history, {'AAPL': 100.0, 'MSFT': 200.0}, quantity=12.0))
+
+        events = self.stream.events('e1', 1)
+        next(events)
+        _, event, _ = parse_event(next(events))
+
+        self.assertEqual(event, 'holdings')
+
+    def test_one_event_shared_by_clients(self):
+        """Test that every client gets the same encoded event"""
+        clients = [self.stream.events('e1', 1) for _ in range(3)]
+        for client in clients:
+            next(client)
+        received = []
+
+        def read(client):
+            received.append(next(client))
+
+        threads = [threading.Thread(target=read, args=(client,)) for client in clients]
+        for thread in threads:
+            thread.start()
+        self.stream.publish(make_snapshot(self.history, {'AAPL': 120.0, 'MSFT': 200.0}))
+        for thread in threads:
+            thread.join(timeout=2)
+
+        self.assertEqual(len(received), 3)
+        self.assertTrue(all(payload is received[0] for payload in received))
+
+    def test_reconnect_outside_backlog_resets(self):
+        """Test that an unknown Last-Event-ID gets a reset event"""
+        for version in range(2, 7):
+            self.stream.publish(make_snapshot(self.history, {'AAPL': 100.0 + version, 'MSFT': 200.0}))
+
+        for last_event_id in ('e1-1', 'other-6'):
+            events = self.stream.events('e1', 6, last_event_id=last_event_id)
+            _, event, _ = parse_event(next(events))
+            self.assertEqual(event, 'reset')
+
+        # A Last-Event-ID still in the backlog replays what was missed
+        events = self.stream.events('e1', 6, last_event_id='e1-5')
+        next(events)
+        self.assertEqual(parse_event(next(events))[0], 'e1-6')
+
+    def test_aged_out_versions_reload(self):
+        """Test that a publish whose previous version left the change history asks clients to reload"""
+        history = ChangeHistory(max_versions=1)
+        stream = PriceStream(history, heartbeat=0.05)
+        stream.publish(make_snapshot(history, {'AAPL': 100.0}))
+        make_snapshot(history, {'AAPL': 101.0})
+        stream.publish(make_snapshot(history, {'AAPL': 102.0}))
+
+        events = stream.events('e1', 1)
+        next(events)
+        _, event, data = parse_event(next(events))
+        stream.close()
+
+        self.assertEqual((event, data['version']), ('holdings', 3))
+
+    def test_open_streams_counted(self):
+        """Test that a stream counts as open from its first event until it is closed"""
+        events = self.stream.events('e1', 1)
+        next(events)
+        self.assertEqual(self.stream.clients, 1)
+
+        events.close()
+        self.assertEqual(self.stream.clients, 0)
+
+    def test_keep_alive(self):
+        """Test that an idle stream sends keep-alive comments"""
+        events = self.stream.events('e1', 1)
+        next(events)
+        self.assertEqual(next(events), b': keep-alive\n\n')
+
+
+if __name__ == '__main__':
+    unittest.main()
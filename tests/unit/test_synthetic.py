@@ -0,0 +1,131 @@
+import unittest
+import tempfile
+import os
+import time
+import yaml
+from unittest.mock import patch
+
+from stock_aggregator.brokers.synthetic import SyntheticBroker
+from stock_aggregator.services.brokers_data import BrokersDataService
+from stock_aggregator.services.market_data import MarketDataService, is_offline, set_offline
+
+
+class TestSyntheticBroker(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.previous_config = os.environ.get('STOCK_AGGREGATOR_CONFIG')
+        self.write_config()
+
+    def tearDown(self):
+        set_offline(False)
+        self.temp_dir.cleanup()
+        if self.previous_config is None:
+            os.environ.pop('STOCK_AGGREGATOR_CONFIG', None)
+        else:
+            os.environ['STOCK_AGGREGATOR_CONFIG'] = self.previous_config
+
+    def write_config(self, **settings):
+        # A new file per call so the change is seen without waiting for the config reload check
+        self.config_path = os.path.join(self.temp_dir.name, f'config-{len(os.listdir(self.temp_dir.name))}.yml')
+        connection = {'type': 'synthetic', 'id': 'synthetic_test', 'enabled': True,
+                      'accounts': 4, 'positions_per_account': 50, 'symbols': 200, 'seed': 7}
+        connection.update(settings)
+        config_data = {
+            'brokers': [connection],
+            'market_data': {'offline': True},
+            'app': {'broker_workers': 2}
+        }
+        with open(self.config_path, 'w') as f:
+            yaml.dump(config_data, f)
+        os.environ['STOCK_AGGREGATOR_CONFIG'] = self.config_path
+
+    def test_book_shape(self):
+        """Test that the book has accounts x positions_per_account positions plus cash per account"""
+        broker = SyntheticBroker('synthetic_test')
+
+        accounts = broker.get_accounts()
+        positions = broker.get_all_positions()
+
+        self.assertEqual(len(accounts), 4)
+        self.assertEqual(sum(len(rows) for asset_type, rows in positions.items() if asset_type != 'cash'), 200)
+        self.assertEqual(len(positions['cash']), 4)
+        for asset_type in ('equity', 'option', 'fixed_income', 'collective_investment'):
+            self.assertTrue(positions[asset_type], asset_type)
+        self.assertEqual(len(broker.get_positions(accounts[0]['id'])), 50)
+
+    def test_same_seed_same_book(self):
+        """Test that the generated book is deterministic for a seed"""
+        first = SyntheticBroker('synthetic_test').get_all_positions()
+        second = SyntheticBroker('synthetic_test').get_all_positions()
+        self.assertEqual(first, second)
+
+        self.write_config(seed=8)
+        third = SyntheticBroker('synthetic_test').get_all_positions()
+        self.assertNotEqual(first['equity'], third['equity'])
+
+    def test_unknown_mix_types_ignored(self):
+        """Test that asset types outside the known buckets are dropped from the mix with an error"""
+        self.write_config(mix={'equity': 0.5, 'etf': 0.5})
+
+        with self.assertLogs('stock_aggregator.brokers.synthetic', level='ERROR') as logs:
+            broker = SyntheticBroker('synthetic_test')
+        positions = broker.get_all_positions()
+
+        self.assertIn('etf', logs.output[0])
+        self.assertEqual(len(positions['equity']), 200)
+        self.assertNotIn('etf', positions)
+
+    def test_symbols_are_recognized(self):
+        """Test that option and bond symbols use the formats market data parses"""
+        positions = SyntheticBroker('synthetic_test').get_all_positions()
+        market_data = MarketDataService()
+
+        for position in positions['option']:
+            self.assertIsNotNone(market_data._parse_option_symbol(position['symbol']), position['symbol'])
+        for position in positions['fixed_income']:
+            self.assertTrue(market_data._is_fixed_income(position['symbol']), position['symbol'])
+        for position in positions['equity'] + positions['collective_investment']:
+            self.assertFalse(market_data._is_fixed_income(position['symbol']))
+            self.assertIsNone(market_data._parse_option_symbol(position['symbol']))
+
+    def test_latency(self):
+        """Test that configured latency delays every call"""
+        self.write_config(latency_ms=50)
+        broker = SyntheticBroker('synthetic_test')
+
+        started = time.monotonic()
+        broker.get_accounts()
+        self.assertGreaterEqual(time.monotonic() - started, 0.05)
+
+    def test_disabled_connection(self):
+        """Test that a disabled connection returns nothing"""
+        self.write_config(enabled=False)
+        broker = SyntheticBroker('synthetic_test')
+
+        self.assertEqual(broker.get_accounts(), [])
+        self.assertEqual(broker.get_all_positions()['equity'], [])
+
+    def test_service_runs_offline(self):
+        """Test that a synthetic connection aggregates end to end without calling yfinance"""
+        service = BrokersDataService()
+        try:
+            self.assertTrue(is_offline())
+            with patch('stock_aggregator.services.market_data.yf.download') as download, \
+                    patch('stock_aggregator.services.market_data.yf.Ticker') as ticker:
+                positions = service.get_positions()
+                accounts = service.get_accounts()
+            download.assert_not_called()
+            ticker.assert_not_called()
+        finally:
+            service.close()
+
+        self.assertEqual(len(accounts), 4)
+        self.assertGreater(positions['total_market_value'], 0)
+        held = sum(len(rows) for asset_type, rows in positions['positions_by_type'].items() if asset_type != 'cash')
+        self.assertGreater(held, 0)
+        for position in positions['positions_by_type']['equity']:
+            self.assertGreater(position['current_price'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
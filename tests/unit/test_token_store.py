@@ -0,0 +1,85 @@
+import unittest
+import tempfile
+import os
+import time
+import threading
+
+from stock_aggregator.brokers.token_store import FileTokenStore
+
+
+class TestFileTokenStore(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.temp_dir.name, 'tokens.json')
+        self.store = FileTokenStore(self.path)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def make_refresh(self, calls):
+        def refresh(current):
+            calls.append(current)
+            time.sleep(0.05)
+            return {
+                'access_token': f"access-{len(calls)}",
+                'refresh_token': f"refresh-{len(calls)}",
+                'expires_at': time.time() + 1800
+            }
+        return refresh
+
+    def test_concurrent_callers_refresh_once(self):
+        """Test that concurrent callers share a single refresh"""
+        calls = []
+        results = []
+        refresh = self.make_refresh(calls)
+
+        def worker():
+            # Separate store instances stand in for separate worker processes
+            store = FileTokenStore(self.path)
+            results.append(store.get_or_refresh('schwab1', refresh, seed_refresh_token='seed'))
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual({result['access_token'] for result in results}, {'access-1'})
+
+    def test_refreshes_within_margin(self):
+        """Test that a token close to expiry is refreshed with the stored refresh token"""
+        self.store.save('schwab1', {
+            'access_token': 'old',
+            'refresh_token': 'rotated',
+            'expires_at': time.time() + 60,
+            'seed_refresh_token': 'seed'
+        })
+        calls = []
+
+        fresh = self.store.get_or_refresh('schwab1', self.make_refresh(calls), margin=10, seed_refresh_token='seed')
+        self.assertEqual(fresh['access_token'], 'old')
+        self.assertEqual(calls, [])
+
+        refreshed = self.store.get_or_refresh('schwab1', self.make_refresh(calls), margin=120, seed_refresh_token='seed')
+        self.assertEqual(refreshed['access_token'], 'access-1')
+        self.assertEqual(calls[0]['refresh_token'], 'rotated')
+        self.assertEqual(self.store.load('schwab1')['refresh_token'], 'refresh-1')
+
+    def test_new_seed_token_discards_stored_record(self):
+        """Test that changing the configured refresh token ignores tokens from the old one"""
+        self.store.save('schwab1', {
+            'access_token': 'old',
+            'refresh_token': 'rotated',
+            'expires_at': time.time() + 1800,
+            'seed_refresh_token': 'seed'
+        })
+        calls = []
+
+        record = self.store.get_or_refresh('schwab1', self.make_refresh(calls), seed_refresh_token='new-seed')
+
+        self.assertEqual(calls, [None])
+        self.assertEqual(record['seed_refresh_token'], 'new-seed')
+
+if __name__ == '__main__':
+    unittest.main()